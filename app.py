@@ -1,35 +1,97 @@
 # app.py
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, TclError
 import threading
+import collections
+import logging
+import logging.handlers
 import sys
 import io
 import os
-import pandas as pd
 
 # Módulos do Projeto
 import config
 import database as db
+import jornal
+import leitura
+import perfil
+import progresso as prog
 import import_produtos
 import import_clientes
 import import_financeiro
 import ui_mapeamento
 
-# --- REDIRECIONAMENTO DE LOG (Mantido Intacto) ---
-class TextRedirector(io.StringIO):
+# --- REDIRECIONAMENTO DE LOG ---
+def _criar_log_arquivo():
+    """Logger do arquivo rotativo; o MemoryHandler junta as linhas para não gravar uma a uma"""
+    logger = logging.getLogger('maximport')
+    if not logger.handlers:
+        os.makedirs(os.path.dirname(config.ARQUIVO_LOG), exist_ok=True)
+        arquivo = logging.handlers.RotatingFileHandler(
+            config.ARQUIVO_LOG, maxBytes=config.LOG_TAMANHO_MAX_MB * 1024 * 1024,
+            backupCount=config.LOG_BACKUPS, encoding='utf-8'
+        )
+        arquivo.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(logging.handlers.MemoryHandler(1000, flushLevel=logging.ERROR, target=arquivo))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+class ConsoleBufferizado(io.TextIOBase):
+    """
+    Destino do print na interface. Cada write só guarda o texto num buffer circular;
+    a cada config.LOG_INTERVALO_MS a thread da tela descarrega tudo com um único insert.
+    O console guarda no máximo config.LOG_LINHAS_TELA linhas; o arquivo recebe tudo.
+    """
     def __init__(self, text_widget):
         self.text_widget = text_widget
-    def write(self, str):
+        self.buffer = collections.deque(maxlen=config.LOG_BUFFER_MAX)
+        self.descartados = 0
+        self.linha_parcial = ''
+        self.lock = threading.Lock()
+        self.log = _criar_log_arquivo()
+        self.text_widget.after(config.LOG_INTERVALO_MS, self._descarregar)
+
+    def write(self, texto):
+        if not texto:
+            return 0
+        with self.lock:
+            if len(self.buffer) == self.buffer.maxlen:
+                self.descartados += 1
+            self.buffer.append(texto)
+            # O arquivo recebe linhas completas (o print manda o texto e o '\n' separados)
+            linhas = (self.linha_parcial + texto).split('\n')
+            self.linha_parcial = linhas.pop()
+        for linha in linhas:
+            self.log.info(linha)
+        return len(texto)
+
+    def flush(self):
+        pass
+
+    def _descarregar(self):
+        with self.lock:
+            texto = ''.join(self.buffer)
+            self.buffer.clear()
+            descartados, self.descartados = self.descartados, 0
         try:
-            self.text_widget.after(0, self._append_text, str)
-        except: pass
-    def _append_text(self, str):
-        try:
-            self.text_widget.insert(END, str)
-            self.text_widget.see(END)
-        except: pass
-    def flush(self): pass
+            if descartados:
+                self.text_widget.insert(END, f"[... {descartados} mensagens omitidas na tela, veja {config.ARQUIVO_LOG} ...]\n")
+            if texto:
+                self.text_widget.insert(END, texto)
+                excedente = int(self.text_widget.index('end-1c').split('.')[0]) - config.LOG_LINHAS_TELA
+                if excedente > 0:
+                    self.text_widget.delete('1.0', f"{excedente + 1}.0")
+                self.text_widget.see(END)
+            for handler in self.log.handlers:
+                handler.flush()
+            self.text_widget.after(config.LOG_INTERVALO_MS, self._descarregar)
+        except TclError:
+            pass  # Janela fechada
+
+# Opção do painel -> tipo de importação
+TIPOS_IMPORTACAO = {1: 'produtos', 2: 'clientes', 3: 'fornecedores', 4: 'financeiro'}
 
 # --- APP PRINCIPAL ---
 class MaxImportApp(ttk.Window):
@@ -49,6 +111,7 @@ class MaxImportApp(ttk.Window):
         self.db_server = ttk.StringVar(value=config.DB_SERVER)
         self.db_name = ttk.StringVar(value=config.DB_NAME)
         self.progress_val = ttk.DoubleVar(value=0)
+        self.progress_txt = ttk.StringVar(value="")
 
         # Estilos Customizados
         style = ttk.Style()
@@ -163,11 +226,13 @@ class MaxImportApp(ttk.Window):
         self.txt_log.pack(fill=BOTH, expand=True)
         
         # Redireciona print para o widget
-        sys.stdout = TextRedirector(self.txt_log)
+        sys.stdout = ConsoleBufferizado(self.txt_log)
 
         # Barra de Progresso Striped (Listrada)
-        self.barra_progresso = ttk.Progressbar(main_frame, variable=self.progress_val, bootstyle="success-striped", mode='indeterminate')
+        self.barra_progresso = ttk.Progressbar(main_frame, variable=self.progress_val, bootstyle="success-striped", mode='determinate', maximum=100)
         self.barra_progresso.pack(fill=X, pady=(15, 5), ipady=2)
+        # Etapa, linhas gravadas/total, linhas por segundo e ETA
+        ttk.Label(main_frame, textvariable=self.progress_txt, font=("Consolas", 9), bootstyle="secondary").pack(anchor=W)
         
         # Footer
         ttk.Label(self, text="  Maxdata Sistemas © 2025  ", font=("Segoe UI", 9), bootstyle="inverse-secondary").pack(side=BOTTOM, fill=X)
@@ -203,13 +268,13 @@ class MaxImportApp(ttk.Window):
         config.DB_NAME = self.db_name.get()
         print("--- Atualizando Conexão ---")
         try:
-            db.reconectar()
+            db.reconectar(forcar=True)
             messagebox.showinfo("Sucesso", f"Conectado com sucesso!\n\nServidor: {config.DB_SERVER}\nBanco: {config.DB_NAME}")
         except Exception as e:
             messagebox.showerror("Falha", f"Não foi possível conectar:\n{e}")
 
     def selecionar_arquivo(self):
-        arquivo = filedialog.askopenfilename(filetypes=[("Excel Files", "*.xlsx;*.xls")])
+        arquivo = filedialog.askopenfilename(filetypes=leitura.TIPOS_ARQUIVO)
         if arquivo:
             self.caminho_excel.set(arquivo)
             print(f"Arquivo selecionado: {os.path.basename(arquivo)}")
@@ -253,25 +318,34 @@ class MaxImportApp(ttk.Window):
         t.start()
 
     def _limpeza_worker(self, opcao):
+        # Limpeza não tem contagem de linhas: barra animada
+        self.barra_progresso.configure(mode='indeterminate')
         self.barra_progresso.start(10) # Velocidade da animação
         self.alternar_interface("disabled")
+
+        # Só as tabelas da limpeza (e as que têm FK para elas) ficam sem FKs/gatilhos
+        tabelas = []
+        if opcao == 1 or opcao == 99: tabelas += ['prolote', 'produto_empresa', 'produto', 'produtoUn']
+        if opcao == 2 or opcao == 99: tabelas += ['cliente']
+        if opcao == 3 or opcao == 99: tabelas += ['financeiro']
+
         try:
-            db.toggle_constraints(False)
-            if opcao == 1 or opcao == 99:
-                print("Limpando Produtos e Estoque...")
-                db.limpar_tabela('prolote', reset_identity=True)
-                db.executar_comando("DELETE FROM produto_empresa") 
-                db.executar_comando("DELETE FROM produto WHERE proId > 1") 
-                db.limpar_tabela('produtoUn', reset_identity=True)
-            
-            if opcao == 2 or opcao == 99:
-                print("Limpando Clientes (Preservando Admin e Sistema)...")
-                sql_delphi = "DELETE FROM cliente WHERE cliId <> 1 AND cliTipoCad <> 5 AND cliTipoCad <> 6"
-                db.executar_comando(sql_delphi)
-
-            if opcao == 3 or opcao == 99:
-                print("Limpando Financeiro...")
-                db.limpar_tabela('financeiro')
+            with db.constraints_desativadas(tabelas, incluir_dependentes=True):
+                if opcao == 1 or opcao == 99:
+                    print("Limpando Produtos e Estoque...")
+                    db.limpar_tabela('prolote', reset_identity=True)
+                    db.executar_comando("DELETE FROM produto_empresa") 
+                    db.executar_comando("DELETE FROM produto WHERE proId > 1") 
+                    db.limpar_tabela('produtoUn', reset_identity=True)
+                
+                if opcao == 2 or opcao == 99:
+                    print("Limpando Clientes (Preservando Admin e Sistema)...")
+                    sql_delphi = "DELETE FROM cliente WHERE cliId <> 1 AND cliTipoCad <> 5 AND cliTipoCad <> 6"
+                    db.executar_comando(sql_delphi)
+
+                if opcao == 3 or opcao == 99:
+                    print("Limpando Financeiro...")
+                    db.limpar_tabela('financeiro')
             
             print("--- Limpeza Concluída ---")
             messagebox.showinfo("Sucesso", "Limpeza realizada com sucesso!")
@@ -279,8 +353,8 @@ class MaxImportApp(ttk.Window):
             messagebox.showerror("Erro", f"Erro na limpeza: {e}")
             print(f"Erro: {e}")
         finally:
-            db.toggle_constraints(True)
             self.barra_progresso.stop()
+            self.barra_progresso.configure(mode='determinate')
             self.alternar_interface("normal")
 
     def preparar_importacao(self, opcao):
@@ -295,41 +369,76 @@ class MaxImportApp(ttk.Window):
         # Produtos (1) e Clientes (2) abrem mapa.
         if opcao in [1, 2]:
             try:
-                # Leitura rápida só do cabeçalho
-                df_header = pd.read_excel(arquivo, sheet_name=0, nrows=0)
-                colunas = list(df_header.columns)
+                # Leitura rápida só do cabeçalho + algumas linhas de exemplo
+                colunas, amostra = leitura.ler_cabecalho(arquivo, linhas_amostra=config.LINHAS_AMOSTRA)
                 tipo = "PRODUTO" if opcao == 1 else "CLIENTE"
                 
                 # Abre janela de mapeamento (agora estilizada)
-                dialogo = ui_mapeamento.DialogoMapeamento(self, colunas, tipo_importacao=tipo)
+                dialogo = ui_mapeamento.DialogoMapeamento(self, colunas, tipo_importacao=tipo, amostra=amostra)
                 self.wait_window(dialogo)
                 
                 if dialogo.resultado:
-                    t = threading.Thread(target=self.processar_thread, args=(opcao, dialogo.resultado))
+                    retomar = self.perguntar_retomada(arquivo, opcao, dialogo.resultado)
+                    # Reimportação periódica: grava só o que é novo ou mudou
+                    modo_delta = messagebox.askyesno(
+                        "Modo de Importação",
+                        "Atualizar apenas registros novos ou alterados (modo delta)?\n\n"
+                        "(Não = inserir todas as linhas da planilha)"
+                    )
+                    t = threading.Thread(target=self.processar_thread, args=(opcao, dialogo.resultado, retomar, modo_delta))
                     t.start()
             except Exception as e:
                 messagebox.showerror("Erro", f"Erro ao ler cabeçalho do Excel: {e}")
         else:
             if messagebox.askyesno("Confirmar Importação", "Deseja iniciar a importação direta dos dados?"):
-                t = threading.Thread(target=self.processar_thread, args=(opcao, None))
+                retomar = self.perguntar_retomada(arquivo, opcao, None)
+                t = threading.Thread(target=self.processar_thread, args=(opcao, None, retomar))
                 t.start()
 
-    def processar_thread(self, opcao, mapa_colunas):
-        self.barra_progresso.start(15)
+    def perguntar_retomada(self, arquivo, opcao, mapa_colunas):
+        """Se esta importação parou no meio antes, pergunta se continua de onde parou"""
+        try:
+            linhas = jornal.JornalImportacao(arquivo, TIPOS_IMPORTACAO[opcao], mapa_colunas).ultima_linha()
+        except Exception as e:
+            print(f"Aviso ao ler jornal de importação: {e}")
+            return False
+        if not linhas:
+            return False
+        return messagebox.askyesno(
+            "Importação Interrompida",
+            f"Uma importação anterior deste arquivo parou depois de gravar {linhas} linhas.\n\n"
+            "Deseja continuar de onde parou?\n(Não = importar tudo desde o início)"
+        )
+
+    def receber_progresso(self, info):
+        """Chamado pela thread da importação: repassa para a thread da interface"""
+        self.after(0, self.mostrar_progresso, info)
+
+    def mostrar_progresso(self, info):
+        if info.total:
+            self.progress_val.set(min(100.0 * info.feitos / info.total, 100.0))
+        elif info.etapa == 'concluido':
+            self.progress_val.set(100.0)
+        self.progress_txt.set(prog.formatar(info))
+
+    def processar_thread(self, opcao, mapa_colunas, retomar=False, modo_delta=False):
+        self.progress_val.set(0)
+        self.progress_txt.set("")
         self.alternar_interface("disabled")
         try:
-            db.reconectar()
-            db.toggle_constraints(False)
+            # A engine do banco atual já fica no pool: não precisa reconectar a cada importação
             arquivo = self.caminho_excel.get()
 
-            if opcao == 1:
-                import_produtos.executar_importacao(arquivo, mapa_colunas, limpar_base=False)
-            elif opcao == 2:
-                import_clientes.executar_importacao(arquivo, mapa_colunas=mapa_colunas, is_fornecedor=False, limpar_base=False)
-            elif opcao == 3:
-                import_clientes.executar_importacao(arquivo, mapa_colunas=None, is_fornecedor=True, limpar_base=False)
-            elif opcao == 4:
-                import_financeiro.executar_importacao(arquivo, limpar_base=False)
+            # O perfil abre aqui para medir também o liga/desliga das constraints
+            with perfil.execucao(TIPOS_IMPORTACAO[opcao], arquivo), db.constraints_desativadas(db.TABELAS_POR_IMPORTACAO[TIPOS_IMPORTACAO[opcao]]):
+                if opcao == 1:
+                    import_produtos.executar_importacao(arquivo, mapa_colunas, limpar_base=False, retomar=retomar, modo_delta=modo_delta, progresso=self.receber_progresso)
+                elif opcao == 2:
+                    import_clientes.executar_importacao(arquivo, mapa_colunas=mapa_colunas, is_fornecedor=False, limpar_base=False, retomar=retomar, modo_delta=modo_delta, progresso=self.receber_progresso)
+                elif opcao == 3:
+                    import_clientes.executar_importacao(arquivo, mapa_colunas=None, is_fornecedor=True, limpar_base=False, retomar=retomar, progresso=self.receber_progresso)
+                elif opcao == 4:
+                    import_financeiro.executar_importacao(arquivo, limpar_base=False, retomar=retomar, progresso=self.receber_progresso)
 
             messagebox.showinfo("Processo Finalizado", "A importação foi concluída com sucesso!")
 
@@ -337,8 +446,6 @@ class MaxImportApp(ttk.Window):
             print(f"ERRO FATAL: {e}")
             messagebox.showerror("Erro Crítico", f"Falha durante a importação:\n{e}")
         finally:
-            db.toggle_constraints(True)
-            self.barra_progresso.stop()
             self.alternar_interface("normal")
 
     def alternar_interface(self, estado):
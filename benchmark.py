@@ -0,0 +1,469 @@
+# benchmark.py
+"""
+Benchmarks do Max Import. Rodam contra um SQL Server local de testes (LocalDB / Express),
+NUNCA contra a base do cliente.
+
+insercao: vazão (linhas/s) de cada modo de inserção do database.inserir_bulk.
+suite:    gera planilhas sintéticas (1k / 100k / 1M linhas, formatos brasileiros) e roda as
+          importações de clientes, produtos e financeiro medindo cada etapa com o perfil.py.
+          Os resultados são acrescentados em um arquivo JSONL para comparar versões.
+          O banco precisa ter a estrutura do Max (cópia vazia); as tabelas são limpas a cada caso.
+memoria:  memória dos lotes lidos e tratados, com e sem config.TIPOS_COMPACTOS, em MB por 1M de linhas.
+          Não usa banco nem gera planilha: os lotes sintéticos vão direto para o tratamento.
+documentos: CPF/CNPJ de clientes (normalização, dígitos verificadores, índice e repetidos), em
+          segundos por 1M de linhas. Sem banco: os documentos "do banco" também são sintéticos.
+
+Exemplos:
+    python benchmark.py insercao --servidor "(localdb)\\MSSQLLocalDB" --banco maximport_bench --linhas 100000
+    python benchmark.py suite --servidor "(localdb)\\MSSQLLocalDB" --banco maximport_bench --tamanhos 1000 100000
+    python benchmark.py suite --sem-banco --tamanhos 1000000   (só leitura + tratamento)
+    python benchmark.py suite --sem-banco --tamanhos 1000000 --processos 8   (tratamento em 8 processos)
+    python benchmark.py memoria --linhas 1000000
+    python benchmark.py documentos --linhas 1000000
+"""
+import argparse
+import datetime
+import functools
+import json
+import multiprocessing
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+import config
+import database as db
+import documentos
+import import_clientes
+import import_financeiro
+import import_produtos
+import leitura
+import perfil
+import pipeline
+import utils
+
+TABELA_BENCH = 'bench_insercao'
+
+SQL_CRIAR_TABELA = f"""
+IF OBJECT_ID('{TABELA_BENCH}') IS NOT NULL DROP TABLE {TABELA_BENCH};
+CREATE TABLE {TABELA_BENCH} (
+    benchId INT IDENTITY(1,1) PRIMARY KEY,
+    descricao VARCHAR(50),
+    codigo VARCHAR(20),
+    valor FLOAT,
+    quantidade INT,
+    data DATETIME
+)
+"""
+
+def gerar_dados(qtd_linhas, com_id=False):
+    """DataFrame sintético no formato de uma tabela típica de importação"""
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame({
+        'descricao': [f"PRODUTO TESTE {i}" for i in range(qtd_linhas)],
+        'codigo': [f"REF{i:08d}" for i in range(qtd_linhas)],
+        'valor': rng.uniform(0, 10000, qtd_linhas).round(2),
+        'quantidade': rng.integers(0, 1000, qtd_linhas),
+        'data': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 3650, qtd_linhas), unit='D'),
+    })
+    if com_id:
+        df.insert(0, 'benchId', np.arange(1, qtd_linhas + 1))
+    return df
+
+def medir_insercao(qtd_linhas, modos, tamanho_chunk=None, com_id=False):
+    """Insere o mesmo DataFrame em cada modo e devolve {modo: linhas_por_segundo}"""
+    df = gerar_dados(qtd_linhas, com_id)
+    resultados = {}
+    for modo in modos:
+        db.executar_comando(SQL_CRIAR_TABELA)
+        inicio = time.perf_counter()
+        db.inserir_bulk(df, TABELA_BENCH, manter_id=com_id, modo=modo, tamanho_chunk=tamanho_chunk)
+        duracao = time.perf_counter() - inicio
+        resultados[modo] = qtd_linhas / duracao if duracao > 0 else float('inf')
+        print(f"{modo:>18}: {duracao:8.2f}s  {resultados[modo]:12,.0f} linhas/s")
+    db.executar_comando(f"DROP TABLE {TABELA_BENCH}")
+    return resultados
+
+# --- SUITE DE IMPORTAÇÃO ---
+
+TAMANHOS_PADRAO = [1000, 100000, 1000000]
+# Ordem de carga: o financeiro aponta para os clientes gerados antes
+TIPOS_SUITE = ['clientes', 'produtos', 'financeiro']
+
+MAPA_PRODUTOS = {
+    'proId': 'CODIGO', 'proDescricao': 'DESCRICAO', 'zzz_proCodigo': 'REFERENCIA',
+    'zzz_proCodigoNcm': 'NCM', 'proUn': 'UNIDADE', 'zzz_proCusto': 'CUSTO', 'zzz_proVenda': 'VENDA',
+    'proEstoqueAtual': 'ESTOQUE', 'zzz_proEstoqueMin': 'ESTOQUE MINIMO', 'proCodcst2': 'CST', 'proCodCSOSN': 'CSOSN',
+}
+MAPA_CLIENTES = {
+    'cliId': 'CODIGO', 'cliNome': 'NOME', 'cliCpfCgc': 'CPF/CNPJ', 'cliRgInsc': 'RG/IE', 'cliEmail': 'EMAIL',
+    'cliFatEnd': 'ENDERECO', 'cliFatEndNumero': 'NUMERO', 'cliFatBairro': 'BAIRRO', 'cliFatCidade': 'CIDADE',
+    'cliFatUf': 'UF', 'cliFatCep': 'CEP', 'CliFone': 'TELEFONE', 'cliCelular': 'CELULAR', 'CliLimitCred': 'LIMITE',
+}
+
+def _moeda_br(valores, prefixo=True):
+    """1234.5 -> 'R$ 1.234,50' (sem o prefixo em parte das linhas, como nas planilhas reais)"""
+    texto = pd.Series(valores).map('{:,.2f}'.format).str.translate(str.maketrans(',.', '.,'))
+    return np.where(prefixo, 'R$ ' + texto, texto)
+
+def _digitos_verificadores(base, pesos):
+    """Calcula um dígito verificador (regra do módulo 11) para cada linha da matriz 'base'"""
+    resto = (base * pesos).sum(axis=1) % 11
+    return np.where(resto < 2, 0, 11 - resto)
+
+def _cpfs(rng, n):
+    base = rng.integers(0, 10, (n, 9))
+    d1 = _digitos_verificadores(base, np.arange(10, 1, -1))
+    base = np.column_stack([base, d1])
+    d2 = _digitos_verificadores(base, np.arange(11, 1, -1))
+    d = np.column_stack([base, d2]).astype(str)
+    return pd.Series([f"{''.join(x[:3])}.{''.join(x[3:6])}.{''.join(x[6:9])}-{''.join(x[9:])}" for x in d])
+
+def _cnpjs(rng, n):
+    base = np.column_stack([rng.integers(0, 10, (n, 8)), np.tile([0, 0, 0, 1], (n, 1))])
+    pesos = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+    base = np.column_stack([base, _digitos_verificadores(base, pesos)])
+    base = np.column_stack([base, _digitos_verificadores(base, np.concatenate([[6], pesos]))])
+    d = base.astype(str)
+    return pd.Series([f"{''.join(x[:2])}.{''.join(x[2:5])}.{''.join(x[5:8])}/{''.join(x[8:12])}-{''.join(x[12:])}" for x in d])
+
+def _datas_br(rng, n, inicio='2020-01-01', dias=1800):
+    datas = pd.Timestamp(inicio) + pd.to_timedelta(rng.integers(0, dias, n), unit='D')
+    return pd.Series(datas.strftime('%d/%m/%Y'))
+
+def gerar_dados_planilha(tipo, linhas, seed=42):
+    """DataFrame (tudo texto) no formato que cada importação espera ler do Excel"""
+    rng = np.random.default_rng(seed)
+    if tipo == 'produtos':
+        ncms = np.array([f"{rng.integers(1000, 9999)}.{rng.integers(10, 99)}.{rng.integers(10, 99)}" for _ in range(500)])
+        df = pd.DataFrame({
+            # ~30% sem código (ID automático)
+            'CODIGO': np.where(rng.random(linhas) < 0.3, '', np.arange(2, linhas + 2).astype(str)),
+            'DESCRICAO': [f"PRODUTO TESTE {i} - {'ABCDEFGH'[i % 8]}" for i in range(linhas)],
+            'REFERENCIA': np.where(rng.random(linhas) < 0.1, '', pd.Series(np.arange(linhas)).map('REF{:08d}'.format)),
+            # Poucos NCMs distintos, muito repetidos (como em catálogos reais)
+            'NCM': rng.choice(ncms, linhas),
+            'UNIDADE': rng.choice(['UN', 'CX', 'KG', 'PC', 'LT'], linhas),
+            'CUSTO': _moeda_br(rng.uniform(0, 5000, linhas), rng.random(linhas) < 0.5),
+            'VENDA': _moeda_br(rng.uniform(0, 9000, linhas), rng.random(linhas) < 0.5),
+            'ESTOQUE': pd.Series(rng.uniform(0, 1000, linhas).round(3)).map(lambda v: f"{v:.3f}".replace('.', ',')),
+            'ESTOQUE MINIMO': rng.integers(0, 50, linhas).astype(str),
+            'CST': rng.choice(['000', '060', '040'], linhas),
+            'CSOSN': rng.choice(['101', '102', '500'], linhas),
+        })
+    elif tipo == 'clientes':
+        juridica = rng.random(linhas) < 0.2
+        documentos = _cpfs(rng, linhas).where(~juridica, _cnpjs(rng, linhas))
+        df = pd.DataFrame({
+            'CODIGO': np.arange(2, linhas + 2).astype(str),  # ID 1 é do ADMIN
+            'NOME': [f"CLIENTE TESTE {i}" for i in range(linhas)],
+            'CPF/CNPJ': documentos.where(rng.random(linhas) > 0.02, ''),
+            'RG/IE': rng.integers(10**7, 10**9, linhas).astype(str),
+            'EMAIL': [f"cliente{i}@exemplo.com.br" for i in range(linhas)],
+            'ENDERECO': [f"RUA DAS FLORES {i % 997}" for i in range(linhas)],
+            'NUMERO': rng.integers(1, 3000, linhas).astype(str),
+            'BAIRRO': rng.choice(['CENTRO', 'JARDIM AMERICA', 'VILA NOVA', 'BOA VISTA'], linhas),
+            'CIDADE': rng.choice(['SAO PAULO', 'CAMPINAS', 'BELO HORIZONTE', 'CURITIBA'], linhas),
+            'UF': rng.choice(['SP', 'MG', 'PR'], linhas),
+            'CEP': pd.Series(rng.integers(10**7, 10**8 - 1, linhas)).map(lambda v: f"{v // 1000:05d}-{v % 1000:03d}"),
+            'TELEFONE': pd.Series(rng.integers(10**9, 10**10 - 1, linhas)).map(lambda v: f"({v // 10**8}) {v // 10**4 % 10**4}-{v % 10**4:04d}"),
+            'CELULAR': pd.Series(rng.integers(10**10, 10**11 - 1, linhas)).map(lambda v: f"({v // 10**9}) {v // 10**4 % 10**5}-{v % 10**4:04d}"),
+            'LIMITE': _moeda_br(rng.uniform(0, 20000, linhas), rng.random(linhas) < 0.5),
+        })
+    elif tipo == 'financeiro':
+        pago = rng.random(linhas) < 0.6
+        df = pd.DataFrame({
+            'id_cliente': rng.integers(2, linhas + 2, linhas).astype(str),
+            'valor_original': _moeda_br(rng.uniform(10, 5000, linhas), rng.random(linhas) < 0.5),
+            'juros': _moeda_br(rng.uniform(0, 50, linhas), False),
+            'data_emissao': _datas_br(rng, linhas),
+            'data_vencimento': _datas_br(rng, linhas, '2020-02-01'),
+            'data_pagamento': _datas_br(rng, linhas, '2020-02-01').where(pago, ''),
+            'numero_doc': pd.Series(np.arange(linhas)).map('NF{:07d}'.format),
+            'nosso_numero': rng.integers(10**9, 10**10, linhas).astype(str),
+            'obs': np.where(rng.random(linhas) < 0.2, 'PARCELA REFERENTE A VENDA', ''),
+        })
+    else:
+        raise ValueError(f"Tipo desconhecido: {tipo}")
+    return df
+
+def gerar_planilha(tipo, linhas, diretorio):
+    """Grava (uma vez só) a planilha sintética .xlsx e devolve o caminho"""
+    caminho = os.path.join(diretorio, f"bench_{tipo}_{linhas}.xlsx")
+    if os.path.exists(caminho):
+        return caminho
+    os.makedirs(diretorio, exist_ok=True)
+    print(f"Gerando {caminho}...")
+    df = gerar_dados_planilha(tipo, linhas)
+    # write_only: grava linha a linha sem montar a planilha inteira na memória
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(df.columns))
+    for linha in df.itertuples(index=False):
+        ws.append([v if v != '' else None for v in linha])
+    wb.save(caminho + '.tmp')
+    wb.close()
+    os.replace(caminho + '.tmp', caminho)
+    return caminho
+
+def _versao():
+    """Commit atual do código (para comparar resultados entre versões)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except Exception:
+        return 'desconhecida'
+
+# partial (e não lambda): o tratamento em vários processos precisa enviar a função aos filhos
+TRANSFORMAR = {
+    'produtos': functools.partial(import_produtos.transformar_lote, mapa_colunas=MAPA_PRODUTOS),
+    'clientes': functools.partial(import_clientes.transformar_lote, mapa_colunas=MAPA_CLIENTES),
+    'financeiro': import_financeiro.transformar_lote,
+}
+
+def _somente_tratamento(tipo, caminho):
+    with pipeline.TransformacaoParalela(TRANSFORMAR[tipo]) as transformar:
+        tratar = perfil.medir('tratamento', transformar)
+        for lote in perfil.medir_lotes(leitura.ler_planilha_em_lotes(caminho)):
+            tratar(lote)
+
+def _importar(tipo, caminho):
+    with db.constraints_desativadas(db.TABELAS_POR_IMPORTACAO[tipo], incluir_dependentes=True):
+        if tipo == 'produtos':
+            import_produtos.executar_importacao(caminho, MAPA_PRODUTOS, limpar_base=True)
+        elif tipo == 'clientes':
+            import_clientes.executar_importacao(caminho, MAPA_CLIENTES, limpar_base=True)
+        else:
+            import_financeiro.executar_importacao(caminho, limpar_base=True)
+
+def executar_caso(tipo, linhas, diretorio, servidor=None, banco=None, com_banco=True, com_cache=False, processos=None):
+    """Roda uma importação completa (ou só leitura + tratamento) e devolve o resultado medido"""
+    config.DB_SERVER = servidor or config.DB_SERVER
+    config.DB_NAME = banco or config.DB_NAME
+    config.PROCESSOS_TRANSFORMACAO = processos or config.PROCESSOS_TRANSFORMACAO
+    # Sem cache, a leitura do Excel também é medida (como na primeira importação do cliente)
+    config.CACHE_ATIVO = com_cache
+    config.PERFIL_ATIVO = True
+
+    caminho = gerar_planilha(tipo, linhas, diretorio)
+    with perfil.execucao(f"bench_{tipo}", caminho) as medicao:
+        if com_banco:
+            _importar(tipo, caminho)
+        else:
+            _somente_tratamento(tipo, caminho)
+        relatorio = medicao.relatorio()
+
+    return {
+        'versao': _versao(),
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'tipo': tipo,
+        'linhas': linhas,
+        'com_banco': com_banco,
+        'com_cache': com_cache,
+        'modo_insercao': config.MODO_INSERCAO,
+        'duracao_s': relatorio['duracao_s'],
+        'linhas_por_segundo': round(linhas / relatorio['duracao_s'], 1) if relatorio['duracao_s'] else None,
+        'memoria_pico_mb': relatorio['memoria_pico_mb'],
+        'tipos_compactos': config.TIPOS_COMPACTOS,
+        'processos_transformacao': config.PROCESSOS_TRANSFORMACAO,
+        'etapas': relatorio['etapas'],
+    }
+
+def _executar_caso_isolado(argumentos):
+    return executar_caso(*argumentos)
+
+def _ultimo_resultado(arquivo, resultado):
+    """Resultado anterior mais recente do mesmo caso, para comparação"""
+    if not os.path.exists(arquivo):
+        return None
+    anterior = None
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        for linha in f:
+            r = json.loads(linha)
+            if all(r.get(k) == resultado[k] for k in ('tipo', 'linhas', 'com_banco', 'com_cache')):
+                anterior = r
+    return anterior
+
+def _imprimir_resultado(resultado, anterior):
+    def variacao(atual, antes):
+        if not atual or not antes:
+            return ''
+        return f" ({(atual / antes - 1):+.0%} vs {anterior['versao']})"
+
+    print(f"\n=== {resultado['tipo']} | {resultado['linhas']:,} linhas | {resultado['duracao_s']:.1f}s | "
+          f"{resultado['linhas_por_segundo'] or 0:,.0f} linhas/s{variacao(resultado['linhas_por_segundo'], anterior and anterior['linhas_por_segundo'])} | "
+          f"pico {resultado['memoria_pico_mb']} MB")
+    for nome, etapa in resultado['etapas'].items():
+        antes = anterior and anterior['etapas'].get(nome, {}).get('linhas_por_segundo')
+        print(f"  {nome:<22} {etapa['segundos']:9.2f}s  {etapa.get('linhas_por_segundo', 0):12,.0f} linhas/s"
+              f"  {etapa['idas_banco']:7} idas ao banco  {etapa['memoria_pico_mb']} MB{variacao(etapa.get('linhas_por_segundo'), antes)}")
+
+def rodar_suite(tamanhos, tipos, diretorio, arquivo_resultados, servidor=None, banco=None, com_banco=True, com_cache=False,
+                processos=None):
+    """
+    Cada caso roda num processo novo (spawn), assim o pico de memória de um
+    não contamina o do outro. Cada resultado é acrescentado ao arquivo JSONL.
+    processos: processos do tratamento (padrão: config.PROCESSOS_TRANSFORMACAO).
+    """
+    contexto = multiprocessing.get_context('spawn')
+    resultados = []
+    for linhas in tamanhos:
+        for tipo in [t for t in TIPOS_SUITE if t in tipos]:
+            # ProcessPoolExecutor (e não Pool): processo de Pool é daemon e não pode abrir os do tratamento
+            with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+                resultado = executor.submit(_executar_caso_isolado,
+                                            (tipo, linhas, diretorio, servidor, banco, com_banco, com_cache, processos)).result()
+            _imprimir_resultado(resultado, _ultimo_resultado(arquivo_resultados, resultado))
+            with open(arquivo_resultados, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+            resultados.append(resultado)
+    return resultados
+
+def _mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+def medir_memoria(linhas, tipos, arquivo_resultados=None):
+    """
+    Soma a memória (deep) de cada lote lido e tratado, como no pipeline, com os tipos
+    compactos desligados e ligados. Lote a lote: 1M de linhas não precisa caber inteiro na memória.
+    """
+    tamanho_lote = min(config.TAMANHO_LOTE, linhas)
+    original = config.TIPOS_COMPACTOS
+    resultados = []
+    try:
+        for tipo in [t for t in TIPOS_SUITE if t in tipos]:
+            medidas = {}
+            for compactos in (False, True):
+                config.TIPOS_COMPACTOS = compactos
+                lido = tratado = segundos = 0.0
+                for i, inicio in enumerate(range(0, linhas, tamanho_lote)):
+                    df = gerar_dados_planilha(tipo, min(tamanho_lote, linhas - inicio), seed=i).astype(object)
+                    # Como a leitura entrega: célula vazia é NaN, índice contínuo entre lotes
+                    df = df.where(df != '', np.nan).set_axis(pd.RangeIndex(inicio, inicio + len(df)))
+                    relogio = time.perf_counter()
+                    lote = utils.compactar_texto(df)
+                    df_tratado = TRANSFORMAR[tipo](lote)
+                    segundos += time.perf_counter() - relogio
+                    lido += _mb(lote)
+                    tratado += _mb(df_tratado)
+                fator = 1_000_000 / linhas
+                medidas['compactos' if compactos else 'object'] = {
+                    'lido_mb_por_milhao': round(lido * fator, 1),
+                    'tratado_mb_por_milhao': round(tratado * fator, 1),
+                    'tratamento_s_por_milhao': round(segundos * fator, 2),
+                }
+
+            resultado = {'versao': _versao(), 'data': datetime.datetime.now().isoformat(timespec='seconds'),
+                         'caso': 'memoria', 'tipo': tipo, 'linhas': linhas, **medidas}
+            a, c = medidas['object'], medidas['compactos']
+            print(f"\n=== {tipo} | MB por 1M de linhas (medido com {linhas:,}) ===")
+            for nome, chave in (('lido', 'lido_mb_por_milhao'), ('tratado', 'tratado_mb_por_milhao'),
+                                ('tratamento (s)', 'tratamento_s_por_milhao')):
+                print(f"  {nome:<15} object {a[chave]:10,.1f}   compactos {c[chave]:10,.1f}"
+                      f"   ({c[chave] / a[chave] if a[chave] else 0:.2f}x)")
+            if arquivo_resultados:
+                with open(arquivo_resultados, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+            resultados.append(resultado)
+    finally:
+        config.TIPOS_COMPACTOS = original
+    return resultados
+
+def medir_documentos(linhas, arquivo_resultados=None):
+    """
+    Tempo de cada etapa da conferência de CPF/CNPJ (import_clientes), em lotes como no pipeline.
+    A planilha vem formatada (123.456.789-09) ou só com dígitos; o banco tem outros 'linhas' documentos.
+    """
+    rng = np.random.default_rng(0)
+    juridica = rng.random(linhas) < 0.2
+    formatados = _cpfs(rng, linhas).where(~juridica, _cnpjs(rng, linhas)).astype(object)
+    digitos = formatados.str.replace(r'\D', '', regex=True)
+    # Metade da planilha já está no banco, o resto é novo
+    banco = pd.concat([digitos.sample(frac=0.5, random_state=0), _cpfs(rng, linhas // 2).str.replace(r'\D', '', regex=True)])
+    tamanho_lote = min(config.TAMANHO_LOTE, linhas)
+
+    tempos = {}
+    def medir(nome, funcao):
+        relogio = time.perf_counter()
+        resultado = funcao()
+        tempos[nome] = tempos.get(nome, 0.0) + time.perf_counter() - relogio
+        return resultado
+
+    indice = medir('indice_banco', lambda: documentos.IndiceDocumentos(banco))
+    for inicio in range(0, linhas, tamanho_lote):
+        lote = slice(inicio, inicio + tamanho_lote)
+        medir('normalizar_formatado', lambda: documentos.normalizar_serie(formatados.iloc[lote]))
+        docs = medir('normalizar_digitos', lambda: documentos.normalizar_serie(digitos.iloc[lote]))
+        medir('validar', lambda: documentos.validar_serie(docs))
+        medir('verificar', lambda: indice.verificar(docs))
+
+    fator = 1_000_000 / linhas
+    tempos = {nome: round(segundos * fator, 3) for nome, segundos in tempos.items()}
+    print(f"\n=== documentos | segundos por 1M de linhas (medido com {linhas:,}, lotes de {tamanho_lote:,}) ===")
+    for nome, segundos in tempos.items():
+        print(f"  {nome:<22} {segundos:8.3f}s")
+    por_lote = tempos['normalizar_formatado'] + tempos['validar'] + tempos['verificar']
+    print(f"  {'total dos lotes':<22} {por_lote:8.3f}s  (planilha formatada; índice do banco à parte)")
+
+    resultado = {'versao': _versao(), 'data': datetime.datetime.now().isoformat(timespec='seconds'),
+                 'caso': 'documentos', 'linhas': linhas, 'segundos_por_milhao': tempos}
+    if arquivo_resultados:
+        with open(arquivo_resultados, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+    return resultado
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do Max Import")
+    parser.add_argument('--servidor', default=config.DB_SERVER)
+    parser.add_argument('--banco', default=config.DB_NAME)
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_insercao = sub.add_parser('insercao', help="Compara os modos de inserção do inserir_bulk")
+    p_insercao.add_argument('--linhas', type=int, default=100000)
+    p_insercao.add_argument('--chunk', type=int, default=None)
+    p_insercao.add_argument('--modos', nargs='+', default=['to_sql', 'fast_executemany', 'json'])
+    p_insercao.add_argument('--com-id', action='store_true', help="Testa com IDENTITY_INSERT ligado")
+
+    p_suite = sub.add_parser('suite', help="Importações completas com planilhas sintéticas")
+    p_suite.add_argument('--tamanhos', type=int, nargs='+', default=TAMANHOS_PADRAO)
+    p_suite.add_argument('--tipos', nargs='+', default=TIPOS_SUITE, choices=TIPOS_SUITE)
+    p_suite.add_argument('--diretorio', default=os.path.join(os.path.expanduser('~'), '.maximport', 'bench'),
+                         help="Onde as planilhas geradas ficam guardadas (são reaproveitadas)")
+    p_suite.add_argument('--resultados', default='benchmark_resultados.jsonl')
+    p_suite.add_argument('--sem-banco', action='store_true', help="Mede só leitura + tratamento")
+    p_suite.add_argument('--com-cache', action='store_true', help="Lê pelo cache Parquet (a partir da 2ª execução)")
+    p_suite.add_argument('--processos', type=int, default=None, help="Processos do tratamento (padrão: config)")
+
+    p_memoria = sub.add_parser('memoria', help="Memória dos lotes com e sem os tipos compactos (sem banco)")
+    p_memoria.add_argument('--linhas', type=int, default=1_000_000)
+    p_memoria.add_argument('--tipos', nargs='+', default=TIPOS_SUITE, choices=TIPOS_SUITE)
+    p_memoria.add_argument('--resultados', default='benchmark_resultados.jsonl')
+
+    p_documentos = sub.add_parser('documentos', help="Conferência de CPF/CNPJ dos clientes (sem banco)")
+    p_documentos.add_argument('--linhas', type=int, default=1_000_000)
+    p_documentos.add_argument('--resultados', default='benchmark_resultados.jsonl')
+    args = parser.parse_args()
+
+    if args.comando == 'insercao':
+        config.DB_SERVER = args.servidor
+        config.DB_NAME = args.banco
+        db.reconectar()
+        print(f"--- Benchmark de inserção: {args.linhas} linhas ---")
+        medir_insercao(args.linhas, args.modos, args.chunk, args.com_id)
+    elif args.comando == 'documentos':
+        print(f"--- Documentos: {args.linhas:,} linhas ---")
+        medir_documentos(args.linhas, args.resultados)
+    elif args.comando == 'memoria':
+        print(f"--- Memória dos lotes: {args.linhas:,} linhas ---")
+        medir_memoria(args.linhas, args.tipos, args.resultados)
+    else:
+        print(f"--- Suite de importação: {args.tamanhos} linhas ---")
+        rodar_suite(args.tamanhos, args.tipos, args.diretorio, args.resultados,
+                    args.servidor, args.banco, not args.sem_banco, args.com_cache, args.processos)
+
+if __name__ == "__main__":
+    main()
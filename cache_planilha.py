@@ -0,0 +1,183 @@
+# cache_planilha.py
+"""
+Cache local das planilhas já lidas, em Parquet.
+A chave é caminho + tamanho + data de modificação + hash do conteúdo, então qualquer
+alteração no arquivo gera uma entrada nova. Entradas antigas são descartadas quando
+o cache passa de config.CACHE_TAMANHO_MAX_MB.
+"""
+import datetime
+import functools
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import config
+import utils
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Sem pyarrow o cache fica desligado e a leitura vai direto no Excel
+    pa = None
+    pq = None
+
+def disponivel():
+    return config.CACHE_ATIVO and pq is not None
+
+@functools.lru_cache(maxsize=64)
+def _hash_conteudo(caminho, tamanho, mtime):
+    # tamanho/mtime entram na chave do lru_cache: se o arquivo mudar, o hash é refeito
+    h = hashlib.sha1()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+def impressao_digital(caminho):
+    """Identificação única do arquivo: caminho, tamanho, mtime e hash do conteúdo"""
+    caminho = os.path.abspath(caminho)
+    st = os.stat(caminho)
+    conteudo = _hash_conteudo(caminho, st.st_size, st.st_mtime_ns)
+    chave = f"{caminho}|{st.st_size}|{st.st_mtime_ns}|{conteudo}"
+    return hashlib.sha1(chave.encode('utf-8')).hexdigest()
+
+def _arquivo_cache(caminho, aba):
+    nome = f"{impressao_digital(caminho)}_{aba}.parquet"
+    return os.path.join(config.DIRETORIO_CACHE, nome)
+
+def ler_lotes(caminho, aba=0, tamanho_lote=None):
+    """Gerador de lotes vindos do cache, ou None se essa planilha/aba ainda não está no cache"""
+    arquivo = _arquivo_cache(caminho, aba)
+    if not os.path.exists(arquivo):
+        return None
+    os.utime(arquivo)  # Marca como usado recentemente (para a limpeza por antiguidade)
+    return _gerar_lotes(arquivo, tamanho_lote or config.TAMANHO_LOTE)
+
+def contar_linhas(caminho, aba=0):
+    """Quantidade de linhas da planilha/aba no cache (None se ainda não está no cache)"""
+    arquivo = _arquivo_cache(caminho, aba)
+    if not os.path.exists(arquivo):
+        return None
+    return pq.ParquetFile(arquivo).metadata.num_rows
+
+def tabela_para_texto(tabela):
+    """
+    Tabela Arrow de texto -> DataFrame como o da leitura do Excel (nulos como NaN).
+    Com config.TIPOS_COMPACTOS as colunas continuam em Arrow (sem copiar para objetos Python).
+    """
+    if config.TIPOS_COMPACTOS and utils.TEXTO_ARROW is not None:
+        return tabela.to_pandas(types_mapper={pa.string(): utils.TEXTO_ARROW}.get)
+    df = tabela.to_pandas().astype(object)
+    return df.where(df.notna(), np.nan)
+
+# Cabeçalho com data (planilha com uma coluna por mês) não cabe no JSON: vai como [tipo, texto ISO]
+_TIPOS_COLUNA = {'datetime': datetime.datetime, 'date': datetime.date, 'time': datetime.time}
+
+def _coluna_para_json(coluna):
+    if coluna is None or isinstance(coluna, (str, int, float, bool)):
+        return coluna
+    for nome, tipo in _TIPOS_COLUNA.items():
+        if isinstance(coluna, tipo):
+            return [nome, coluna.isoformat()]
+    return ['str', str(coluna)]
+
+def _coluna_do_json(valor):
+    if not isinstance(valor, list):
+        return valor
+    nome, texto = valor
+    return _TIPOS_COLUNA[nome].fromisoformat(texto) if nome in _TIPOS_COLUNA else texto
+
+def _gerar_lotes(arquivo, tamanho_lote):
+    pf = pq.ParquetFile(arquivo)
+    colunas = [_coluna_do_json(c) for c in json.loads(pf.schema_arrow.metadata[b'colunas'])]
+    inicio = 0
+    for batch in pf.iter_batches(batch_size=tamanho_lote):
+        df = tabela_para_texto(pa.Table.from_batches([batch]))
+        df.columns = colunas
+        df.index = pd.RangeIndex(inicio, inicio + len(df))
+        inicio += len(df)
+        yield df
+
+class GravadorCache:
+    """
+    Grava os lotes em Parquet conforme vão sendo lidos; só publica no cache se chegar ao fim.
+    Erro ao gravar (disco cheio, coluna estranha...) desliga o cache desta leitura e apaga o
+    arquivo parcial: a importação continua com os lotes lidos normalmente.
+    """
+    def __init__(self, caminho, aba=0):
+        self.arquivo = _arquivo_cache(caminho, aba)
+        self.temporario = self.arquivo + '.tmp'
+        self.writer = None
+        self.falhou = False
+
+    def adicionar(self, df):
+        if self.falhou:
+            return
+        try:
+            if self.writer is None:
+                os.makedirs(config.DIRETORIO_CACHE, exist_ok=True)
+                schema = pa.schema(
+                    [(str(c), pa.string()) for c in df.columns],
+                    metadata={'colunas': json.dumps([_coluna_para_json(c) for c in df.columns])}
+                )
+                self.writer = pq.ParquetWriter(self.temporario, schema)
+            tabela = pa.Table.from_pandas(df.set_axis([str(c) for c in df.columns], axis=1),
+                                          schema=self.writer.schema, preserve_index=False)
+            self.writer.write_table(tabela)
+        except Exception as e:
+            self._desistir(e)
+
+    def concluir(self):
+        if self.falhou or self.writer is None:
+            return
+        try:
+            self.writer.close()
+            self.writer = None
+            os.replace(self.temporario, self.arquivo)
+        except Exception as e:
+            self._desistir(e)
+            return
+        limpar_excedente()
+
+    def descartar(self):
+        try:
+            if self.writer is not None:
+                self.writer.close()
+        except Exception:
+            pass
+        self.writer = None
+        try:
+            if os.path.exists(self.temporario):
+                os.remove(self.temporario)
+        except OSError:
+            pass
+
+    def _desistir(self, erro):
+        print(f"AVISO: Cache local desativado nesta leitura ({erro}). A importação continua sem cache.")
+        self.falhou = True
+        self.descartar()
+
+def limpar_excedente():
+    """Remove as entradas usadas há mais tempo até o cache caber no limite configurado"""
+    if not os.path.isdir(config.DIRETORIO_CACHE):
+        return
+    entradas = []
+    for nome in os.listdir(config.DIRETORIO_CACHE):
+        if nome.endswith('.parquet'):
+            caminho = os.path.join(config.DIRETORIO_CACHE, nome)
+            st = os.stat(caminho)
+            entradas.append((st.st_mtime, st.st_size, caminho))
+
+    limite = config.CACHE_TAMANHO_MAX_MB * 1024 * 1024
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite:
+            break
+        try:
+            os.remove(caminho)
+            total -= tamanho
+        except OSError:
+            pass
@@ -0,0 +1,128 @@
+# cli.py
+"""
+Importação sem interface (servidor, agendador, várias migrações em paralelo).
+Não abre janelas nem faz perguntas: tudo vem pelos parâmetros.
+
+Exemplo:
+    python cli.py --arquivo produtos.xlsx --tipo produtos --servidor SRV01 --banco cliente01 \\
+        --mapa mapa_produto.json --limpar
+
+O mapa é o JSON salvo pelo botão "Exportar mapeamento" da tela de mapeamento
+(obrigatório para produtos e clientes).
+
+Códigos de saída:
+    0 sucesso | 1 erro na importação | 2 parâmetros inválidos | 3 falha de conexão | 4 arquivo/mapa inválido
+"""
+import argparse
+import os
+import sys
+
+import config
+import database as db
+import import_clientes
+import import_financeiro
+import import_produtos
+import leitura
+import mapeamento
+import perfil
+
+SAIDA_OK = 0
+SAIDA_ERRO_IMPORTACAO = 1
+SAIDA_PARAMETROS = 2  # Mesmo código que o argparse usa
+SAIDA_CONEXAO = 3
+SAIDA_ARQUIVO = 4
+
+TIPOS = ['produtos', 'clientes', 'fornecedores', 'financeiro']
+TIPOS_COM_MAPA = ['produtos', 'clientes']
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Max Import - importação por linha de comando")
+    parser.add_argument('--arquivo', required=True, help="Arquivo de origem (.xlsx, .xls, .csv/.txt ou .parquet)")
+    parser.add_argument('--tipo', required=True, choices=TIPOS)
+    parser.add_argument('--aba', default='0', help="Nome ou posição da aba (padrão: a primeira)")
+    parser.add_argument('--mapa', help="Mapeamento de colunas (JSON exportado da tela de mapeamento)")
+    parser.add_argument('--servidor', default=config.DB_SERVER)
+    parser.add_argument('--banco', default=config.DB_NAME)
+    parser.add_argument('--usuario', default=config.DB_USER)
+    parser.add_argument('--senha', default=os.environ.get('MAXIMPORT_SENHA', config.DB_PASS),
+                        help="Também pode vir da variável de ambiente MAXIMPORT_SENHA")
+    parser.add_argument('--limpar', action='store_true', help="Limpa a base do tipo antes de importar")
+    parser.add_argument('--retomar', action='store_true', help="Continua de onde uma execução anterior parou")
+    parser.add_argument('--delta', action='store_true', help="Grava só os registros novos ou alterados")
+    parser.add_argument('--modo-insercao', choices=['fast_executemany', 'json', 'to_sql'], default=config.MODO_INSERCAO)
+    parser.add_argument('--jornal', help="Arquivo do jornal de retomada (padrão: um por banco, "
+                                         "para execuções em paralelo não disputarem o mesmo arquivo)")
+    return parser
+
+def _configurar(args):
+    config.DB_SERVER = args.servidor
+    config.DB_NAME = args.banco
+    config.DB_USER = args.usuario
+    config.DB_PASS = args.senha
+    config.MODO_INSERCAO = args.modo_insercao
+    config.ARQUIVO_JORNAL = args.jornal or os.path.join(
+        os.path.dirname(config.ARQUIVO_JORNAL), f"jornal_{args.banco}.json"
+    )
+
+def _validar_entrada(args, aba):
+    """Confere arquivo e mapa antes de conectar; devolve (mapa, código de saída ou None)"""
+    if not os.path.exists(args.arquivo):
+        print(f"ERRO: Arquivo não encontrado: {args.arquivo}")
+        return None, SAIDA_ARQUIVO
+
+    if args.tipo in TIPOS_COM_MAPA and not args.mapa:
+        print(f"ERRO: Importação de {args.tipo} exige --mapa.")
+        return None, SAIDA_PARAMETROS
+    if not args.mapa:
+        return None, None
+
+    try:
+        mapa = mapeamento.carregar_mapa(args.mapa)
+        if args.tipo == 'clientes' and 'cliId' not in mapa:
+            raise ValueError("Importação de clientes exige a coluna 'cliId' no mapa.")
+        colunas, _ = leitura.ler_cabecalho(args.arquivo, aba)
+    except Exception as e:
+        print(f"ERRO: {e}")
+        return None, SAIDA_ARQUIVO
+
+    # Sem interface ninguém vê o aviso: coluna do mapa que não existe na planilha é erro
+    ausentes = mapeamento.colunas_ausentes(mapa, colunas)
+    if ausentes:
+        print(f"ERRO: Colunas do mapa não encontradas na planilha: {', '.join(map(str, ausentes))}")
+        return None, SAIDA_ARQUIVO
+    return mapa, None
+
+def executar(args):
+    aba = int(args.aba) if args.aba.isdigit() else args.aba
+    mapa, codigo = _validar_entrada(args, aba)
+    if codigo is not None:
+        return codigo
+
+    _configurar(args)
+    try:
+        db.reconectar(forcar=True)
+    except Exception:
+        return SAIDA_CONEXAO
+
+    try:
+        with perfil.execucao(args.tipo, args.arquivo), \
+                db.constraints_desativadas(db.TABELAS_POR_IMPORTACAO[args.tipo], incluir_dependentes=args.limpar):
+            if args.tipo == 'produtos':
+                import_produtos.executar_importacao(args.arquivo, mapa, limpar_base=args.limpar, retomar=args.retomar,
+                                                    modo_delta=args.delta, aba=aba)
+            elif args.tipo in ('clientes', 'fornecedores'):
+                import_clientes.executar_importacao(args.arquivo, mapa_colunas=mapa, is_fornecedor=(args.tipo == 'fornecedores'),
+                                                    limpar_base=args.limpar, retomar=args.retomar,
+                                                    modo_delta=args.delta, aba=aba)
+            else:
+                import_financeiro.executar_importacao(args.arquivo, limpar_base=args.limpar, retomar=args.retomar, aba=aba)
+    except Exception as e:
+        print(f"ERRO NA IMPORTAÇÃO: {e}")
+        return SAIDA_ERRO_IMPORTACAO
+    return SAIDA_OK
+
+def main(argv=None):
+    return executar(criar_parser().parse_args(argv))
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 # config.py
+import os
 import urllib.parse
 
 # CONFIGURAÇÕES DO SQL SERVER (DESTINO)
@@ -11,6 +12,90 @@ DB_PASS = 'macro01'
 # Agora começa vazia ou None
 ARQUIVO_SELECIONADO = None
 
+# POOL DE CONEXÕES (por servidor/banco)
+POOL_TAMANHO = 5   # Conexões mantidas abertas
+POOL_EXTRA = 10    # Conexões extras em pico (threads paralelas)
+
+# Ao religar as FKs depois da importação, revalida os dados (WITH CHECK).
+# Mais lento, mas deixa as constraints marcadas como confiáveis para o otimizador.
+VALIDAR_CONSTRAINTS = False
+
+# LEITURA DA PLANILHA
+# Lê a planilha em lotes (openpyxl read-only) para manter a memória sob controle
+# e começar a inserir no banco antes do fim da leitura.
+LEITURA_STREAMING = True
+TAMANHO_LOTE = 50000  # Linhas por lote
+LINHAS_AMOSTRA = 50   # Linhas lidas para os exemplos da tela de mapeamento
+
+# TIPOS COMPACTOS (precisa do pyarrow)
+# Lotes lidos com o texto em Arrow e lotes tratados com categorias (UF, unidade, S/N...) e
+# inteiros menores. MB por 1M de linhas, object -> compactos (python benchmark.py memoria):
+#   clientes:   lido 917 -> 264, tratado 1635 -> 307
+#   produtos:   lido 666 -> 162, tratado  475 -> 120
+#   financeiro: lido 526 -> 134, tratado  528 -> 102
+TIPOS_COMPACTOS = True
+
+# CACHE DAS PLANILHAS JÁ LIDAS (Parquet, precisa do pyarrow)
+# Reimportar o mesmo arquivo (ou outra importação da mesma planilha) não relê o Excel.
+CACHE_ATIVO = True
+DIRETORIO_CACHE = os.path.join(os.path.expanduser('~'), '.maximport', 'cache')
+CACHE_TAMANHO_MAX_MB = 2048
+
+# JORNAL DE RETOMADA (até que linha cada importação já foi gravada no banco)
+ARQUIVO_JORNAL = os.path.join(os.path.expanduser('~'), '.maximport', 'jornal.json')
+
+# LOG DA INTERFACE
+# A tela recebe o texto em blocos (não a cada print); o log completo fica no arquivo rotativo.
+ARQUIVO_LOG = os.path.join(os.path.expanduser('~'), '.maximport', 'maximport.log')
+LOG_TAMANHO_MAX_MB = 10
+LOG_BACKUPS = 5
+LOG_INTERVALO_MS = 100    # Intervalo entre as atualizações da tela
+LOG_LINHAS_TELA = 5000    # Histórico máximo mantido no console da tela
+LOG_BUFFER_MAX = 20000    # Mensagens pendentes para a tela (as mais antigas são descartadas)
+
+# CPF/CNPJ DE CLIENTES E FORNECEDORES (conferidos nos dígitos verificadores e contra o banco)
+# 'marcar' -> importa mesmo assim e lista a linha no arquivo de rejeitados
+# 'pular'  -> não importa a linha (também listada no arquivo)
+DOCUMENTO_INVALIDO = 'marcar'
+# Documento compartilhado é comum em base legada: 'pular' só vale para cadastro com ID gerado pelo banco
+# (fornecedores); cliente com cliId da planilha é sempre importado, senão os títulos dele ficariam órfãos
+DOCUMENTO_DUPLICADO = 'marcar'
+
+# LINHAS REJEITADAS (ex: títulos do financeiro com cliente inexistente), em CSV por importação
+DIRETORIO_REJEITADOS = os.path.join(os.path.expanduser('~'), '.maximport', 'rejeitados')
+
+# PERFIL DE DESEMPENHO (relatório JSON por importação: tempo, linhas, memória e idas ao banco por etapa)
+PERFIL_ATIVO = True
+DIRETORIO_PERFIL = os.path.join(os.path.expanduser('~'), '.maximport', 'perfil')
+PERFIL_CPROFILE = False  # Grava também o cProfile da etapa de tratamento (deixa a importação mais lenta)
+
+# PIPELINE (leitura/tratamento em paralelo com a inserção)
+PIPELINE_ATIVO = True
+TAMANHO_FILA_PIPELINE = 2  # Lotes prontos esperando o banco (limita a memória)
+INTERVALO_LOG_PROGRESSO = 5  # Segundos entre linhas de progresso no console (sem interface)
+
+# TRATAMENTO EM VÁRIOS PROCESSOS (planilhas muito grandes)
+# Cada lote é dividido em faixas de linhas tratadas em paralelo; o resultado é o mesmo de 1 processo.
+PROCESSOS_TRANSFORMACAO = 1          # 1 = desligado | None = todos os núcleos
+LINHAS_MINIMAS_POR_PROCESSO = 5000   # Lotes menores não compensam o envio para os processos
+
+# IMPORTAÇÃO DE VÁRIAS ABAS (importacao_multipla.py)
+PROCESSOS_LEITURA = None  # Processos lendo abas em paralelo (None = todos os núcleos)
+
+# INSERÇÃO NO BANCO
+# 'fast_executemany' -> pyodbc com parâmetros em array (padrão)
+# 'json'             -> um INSERT ... SELECT FROM OPENJSON por chunk (SQL Server 2016+)
+# 'to_sql'           -> pandas.to_sql (modo antigo, mais lento)
+MODO_INSERCAO = 'fast_executemany'
+TAMANHO_CHUNK_PADRAO = 5000
+# Chunk por tabela (linhas enviadas por ida ao banco)
+TAMANHO_CHUNK_TABELA = {
+    'cliente': 5000,
+    'produto': 10000,
+    'produto_empresa': 10000,
+    'financeiro': 20000,
+}
+
 def get_connection_string():
     params = urllib.parse.quote_plus(
         f"DRIVER={{ODBC Driver 17 for SQL Server}};"
@@ -1,14 +1,24 @@
 # database.py
 from sqlalchemy import create_engine, text
+import numpy as np
+import pandas as pd
 import config
+import perfil
+import contextlib
+import functools
+import threading
 import urllib.parse
 import pyodbc
 
-# Variável global da conexão
-engine = None
+# Gerenciador de conexões: uma engine (com pool) por servidor/banco/autenticação.
+# As engines são reaproveitadas entre importações e compartilhadas entre threads;
+# cada thread pega sua própria conexão do pool com engine.connect().
+_engines = {}
+_lock_engines = threading.Lock()
 
+@functools.lru_cache(maxsize=1)
 def detectar_driver():
-    """Identifica o driver ODBC disponível"""
+    """Identifica o driver ODBC disponível (consultado uma vez só por execução)"""
     try:
         drivers = [d for d in pyodbc.drivers() if 'SQL Server' in d]
     except:
@@ -29,55 +39,81 @@ def detectar_driver():
     if drivers: return drivers[0]
     return 'SQL Server'
 
-def get_connection_string(banco=None):
+def _auth_padrao():
+    return f"UID={config.DB_USER};PWD={config.DB_PASS};"
+
+def get_connection_string(banco=None, servidor=None, auth=None):
     driver = detectar_driver()
     db_target = banco if banco else config.DB_NAME
+    servidor = servidor if servidor else config.DB_SERVER
+    auth = auth if auth else _auth_padrao()
     
     params = urllib.parse.quote_plus(
         f"DRIVER={{{driver}}};"
-        f"SERVER={config.DB_SERVER};"
+        f"SERVER={servidor};"
         f"DATABASE={db_target};"
-        f"UID={config.DB_USER};"
-        f"PWD={config.DB_PASS};"
+        f"{auth}"
         f"TrustServerCertificate=yes;"
     )
     return f"mssql+pyodbc:///?odbc_connect={params}"
 
+def obter_engine(servidor=None, banco=None, auth=None):
+    """Devolve a engine do pool para (servidor, banco, auth), criando na primeira vez"""
+    chave = (servidor or config.DB_SERVER, banco or config.DB_NAME, auth or _auth_padrao())
+    with _lock_engines:
+        eng = _engines.get(chave)
+        if eng is None:
+            # fast_executemany NÃO vai no engine (dava problema com IDENTITY no to_sql):
+            # ele é ligado só no cursor do modo 'fast_executemany' do inserir_bulk
+            eng = create_engine(
+                get_connection_string(banco=chave[1], servidor=chave[0], auth=chave[2]),
+                pool_pre_ping=True,  # descarta conexões que o servidor derrubou
+                pool_size=config.POOL_TAMANHO,
+                max_overflow=config.POOL_EXTRA,
+            )
+            _engines[chave] = eng
+    return eng
+
+def descartar_engine(servidor=None, banco=None, auth=None):
+    """Fecha o pool de (servidor, banco, auth); a próxima chamada cria um novo"""
+    chave = (servidor or config.DB_SERVER, banco or config.DB_NAME, auth or _auth_padrao())
+    with _lock_engines:
+        eng = _engines.pop(chave, None)
+    if eng is not None:
+        eng.dispose()
+
 def get_engine():
-    global engine
-    if engine is None:
-        reconectar()
-    return engine
+    return obter_engine()
 
-def reconectar():
-    global engine
+def reconectar(forcar=False):
+    """Valida a conexão com o banco atual do config (forcar=True recria o pool)"""
     try:
-        if engine:
-            engine.dispose()
-        conn_str = get_connection_string()
-        # Removido fast_executemany temporariamente se estiver causando problemas com IDENTITY
-        engine = create_engine(conn_str) 
+        if forcar:
+            descartar_engine()
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
         print(f"Conectado ao banco: {config.DB_NAME} em {config.DB_SERVER}")
     except Exception as e:
+        descartar_engine()
         print(f"Erro ao configurar conexão: {e}")
         raise e
 
 def listar_bancos_disponiveis(servidor):
     """Lista bancos usando método híbrido de autenticação"""
-    driver = detectar_driver()
     configs = [
-        f"UID={config.DB_USER};PWD={config.DB_PASS};TrustServerCertificate=yes;",
-        f"Trusted_Connection=yes;TrustServerCertificate=yes;"
+        _auth_padrao(),
+        "Trusted_Connection=yes;"
     ]
     
     for auth in configs:
         try:
-            params = urllib.parse.quote_plus(f"DRIVER={{{driver}}};SERVER={servidor};DATABASE=master;{auth}")
-            eng = create_engine(f"mssql+pyodbc:///?odbc_connect={params}")
+            eng = obter_engine(servidor, 'master', auth)
             with eng.connect() as conn:
                 result = conn.execute(text("SELECT name FROM sys.databases WHERE name NOT IN ('master','tempdb','model','msdb') AND state_desc='ONLINE' ORDER BY name"))
                 return [row[0] for row in result]
         except:
+            # Não deixa a engine com login inválido no cache
+            descartar_engine(servidor, 'master', auth)
             continue
     raise Exception("Não foi possível listar os bancos (Falha de Login).")
 
@@ -85,30 +121,73 @@ def executar_comando(sql_cmd):
     with get_engine().begin() as conn:
         conn.execute(text(sql_cmd))
 
-def toggle_constraints(enable=True):
-    tabelas_alvo = ['cliente', 'produto', 'produto_empresa', 'financeiro', 'fornecedor', 'ncm', 'proncm']
-    
+# Tabelas tocadas por cada tipo de importação (só elas têm FKs/gatilhos desligados)
+TABELAS_POR_IMPORTACAO = {
+    'produtos': ['produto', 'produto_empresa', 'proncm', 'produtoUn'],
+    'clientes': ['cliente'],
+    'fornecedores': ['cliente'],
+    'financeiro': ['financeiro'],
+}
+
+def _tabelas_dependentes(conn, tabelas):
+    """Tabelas com FK apontando para 'tabelas' (precisam ser liberadas antes de um DELETE)"""
+    params = {f"t{i}": tab for i, tab in enumerate(tabelas)}
+    lista = ', '.join(f"OBJECT_ID(:{p})" for p in params)
+    result = conn.execute(text(
+        f"SELECT DISTINCT OBJECT_NAME(parent_object_id) FROM sys.foreign_keys WHERE referenced_object_id IN ({lista})"
+    ), params)
+    return [row[0] for row in result]
+
+def _sql_alterar_tabelas(tabelas, enable, validar=False):
+    """Monta UM lote SQL que liga/desliga FKs e gatilhos de todas as tabelas"""
     if enable:
-        print("🔒 Reativando GATILHOS e CHECAGENS...")
-        cmd_fk = "CHECK CONSTRAINT ALL"
+        cmd_fk = "WITH CHECK CHECK CONSTRAINT ALL" if validar else "CHECK CONSTRAINT ALL"
         cmd_tr = "ENABLE TRIGGER ALL"
     else:
-        print("🔓 Desativando GATILHOS (Triggers) e FKs para importação...")
         cmd_fk = "NOCHECK CONSTRAINT ALL"
         cmd_tr = "DISABLE TRIGGER ALL"
 
-    with get_engine().begin() as conn:
-        try:
-            conn.execute(text(f"EXEC sp_msforeachtable 'ALTER TABLE ? {cmd_fk}'"))
-            conn.execute(text(f"EXEC sp_msforeachtable 'ALTER TABLE ? {cmd_tr}'"))
-        except Exception as e:
-            print(f"Aviso no método geral: {e}")
+    comandos = []
+    for tab in tabelas:
+        # Tabelas que não existem nesta versão do banco são ignoradas
+        comandos.append(
+            f"IF OBJECT_ID('{tab}', 'U') IS NOT NULL "
+            f"BEGIN ALTER TABLE [{tab}] {cmd_fk}; ALTER TABLE [{tab}] {cmd_tr}; END"
+        )
+    return "\n".join(comandos)
+
+@contextlib.contextmanager
+def constraints_desativadas(tabelas, validar=None, incluir_dependentes=False):
+    """
+    Desliga FKs e gatilhos SÓ das tabelas informadas durante o bloco 'with'
+    e religa tudo no final, mesmo se der erro.
+    validar=True religa com WITH CHECK (revalida os dados num passe só).
+    incluir_dependentes=True também libera as tabelas com FK para elas (usado em limpezas).
+    """
+    validar = config.VALIDAR_CONSTRAINTS if validar is None else validar
+    tabelas = list(dict.fromkeys(tabelas))
+
+    with perfil.etapa('constraints'), get_engine().begin() as conn:
+        if incluir_dependentes:
+            tabelas = list(dict.fromkeys(tabelas + _tabelas_dependentes(conn, tabelas)))
+        print(f"🔓 Desativando GATILHOS (Triggers) e FKs de: {', '.join(tabelas)}")
+        conn.execute(text(_sql_alterar_tabelas(tabelas, enable=False)))
 
-        for tab in tabelas_alvo:
+    try:
+        yield
+    finally:
+        print("🔒 Reativando GATILHOS e CHECAGENS...")
+        with perfil.etapa('constraints'):
             try:
-                conn.execute(text(f"ALTER TABLE {tab} {cmd_fk}"))
-                conn.execute(text(f"ALTER TABLE {tab} {cmd_tr}"))
-            except: pass
+                with get_engine().begin() as conn:
+                    conn.execute(text(_sql_alterar_tabelas(tabelas, enable=True, validar=validar)))
+            except Exception as e:
+                if not validar:
+                    raise
+                # Dados violam alguma FK: religa sem validar para não deixar o banco desprotegido
+                print(f"AVISO: Validação WITH CHECK falhou ({e}). Religando sem revalidar...")
+                with get_engine().begin() as conn:
+                    conn.execute(text(_sql_alterar_tabelas(tabelas, enable=True)))
 
 def limpar_tabela(nome_tabela, reset_identity=False):
     try:
@@ -121,26 +200,259 @@ def limpar_tabela(nome_tabela, reset_identity=False):
     except Exception as e:
         print(f"Erro ao limpar {nome_tabela}: {e}")
 
-def inserir_bulk(df, nome_tabela, manter_id=True):
+def _linhas_python(df):
+    """Converte o DataFrame em tuplas de tipos nativos (NaN/NaT -> None), como o pyodbc espera"""
+    colunas = []
+    for col in df.columns:
+        serie = df[col]
+        # astype(object) devolve int/float nativos e Timestamp (subclasse de datetime)
+        valores = serie.astype(object).to_numpy()
+        valores[pd.isna(serie).to_numpy()] = None
+        colunas.append(valores)
+    return list(zip(*colunas))
+
+def _inserir_executemany(conn, df, nome_tabela, tamanho_chunk, progresso=None):
+    """INSERT parametrizado com fast_executemany no MESMO cursor/sessão do IDENTITY_INSERT"""
+    colunas = ', '.join(f"[{c}]" for c in df.columns)
+    marcadores = ', '.join('?' for _ in df.columns)
+    sql = f"INSERT INTO {nome_tabela} ({colunas}) VALUES ({marcadores})"
+
+    cursor = conn.connection.cursor()
+    try:
+        cursor.fast_executemany = True
+        linhas = _linhas_python(df)
+        for inicio in range(0, len(linhas), tamanho_chunk):
+            chunk = linhas[inicio:inicio + tamanho_chunk]
+            cursor.executemany(sql, chunk)
+            perfil.contar_ida_banco()
+            if progresso:
+                progresso('insercao', len(chunk))
+    finally:
+        cursor.close()
+
+# Cache dos tipos das colunas por tabela (usado no modo 'json')
+_tipos_colunas = {}
+
+def _tipos_sql(conn, nome_tabela):
+    """Lê do INFORMATION_SCHEMA o tipo SQL de cada coluna da tabela"""
+    chave = (config.DB_SERVER, config.DB_NAME, nome_tabela.lower())
+    if chave in _tipos_colunas:
+        return _tipos_colunas[chave]
+
+    result = conn.execute(text(
+        "SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE "
+        "FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = :tabela"
+    ), {"tabela": nome_tabela})
+
+    tipos = {}
+    for nome, tipo, tamanho, precisao, escala in result:
+        if tipo in ('varchar', 'nvarchar', 'char', 'nchar', 'varbinary', 'binary'):
+            tipo = f"{tipo}({'max' if tamanho == -1 else tamanho})"
+        elif tipo in ('decimal', 'numeric'):
+            tipo = f"{tipo}({precisao},{escala})"
+        elif tipo in ('text', 'ntext'):
+            tipo = 'nvarchar(max)'
+        tipos[nome.lower()] = tipo
+
+    _tipos_colunas[chave] = tipos
+    return tipos
+
+def _inserir_openjson(conn, df, nome_tabela, tamanho_chunk, progresso=None):
+    """Envia cada chunk como UM parâmetro JSON e insere tudo com um único INSERT ... SELECT"""
+    tipos = _tipos_sql(conn, nome_tabela)
+    colunas = ', '.join(f"[{c}]" for c in df.columns)
+    esquema = ', '.join(f"[{c}] {tipos.get(c.lower(), 'nvarchar(max)')} '$.\"{c}\"'" for c in df.columns)
+    sql = f"INSERT INTO {nome_tabela} ({colunas}) SELECT {colunas} FROM OPENJSON(?) WITH ({esquema})"
+
+    cursor = conn.connection.cursor()
+    try:
+        for inicio in range(0, len(df), tamanho_chunk):
+            chunk = df.iloc[inicio:inicio + tamanho_chunk]
+            payload = chunk.to_json(orient='records', date_format='iso', force_ascii=False)
+            cursor.execute(sql, payload)
+            perfil.contar_ida_banco()
+            if progresso:
+                progresso('insercao', len(chunk))
+    finally:
+        cursor.close()
+
+def criar_temporaria(conn, nome_temp, definicao):
+    """Cria (ou recria) uma tabela temporária #nome nesta sessão"""
+    conn.execute(text(f"IF OBJECT_ID('tempdb..{nome_temp}') IS NOT NULL DROP TABLE {nome_temp}"))
+    conn.execute(text(f"CREATE TABLE {nome_temp} ({definicao})"))
+
+def criar_temporaria_como(conn, nome_temp, nome_tabela, colunas):
+    """Cria #nome com as mesmas colunas/tipos de 'nome_tabela' (o UNION ALL tira o IDENTITY)"""
+    lista = ', '.join(f"[{c}]" for c in colunas)
+    conn.execute(text(f"IF OBJECT_ID('tempdb..{nome_temp}') IS NOT NULL DROP TABLE {nome_temp}"))
+    conn.execute(text(
+        f"SELECT TOP 0 {lista} INTO {nome_temp} FROM {nome_tabela} "
+        f"UNION ALL SELECT TOP 0 {lista} FROM {nome_tabela}"
+    ))
+
+def carregar_temporaria(conn, df, nome_temp, tamanho_chunk=None):
+    """Carrega o DataFrame na temporária com fast_executemany (mesma sessão que a criou)"""
     if df.empty: return
+    _inserir_executemany(conn, df, nome_temp, tamanho_chunk or config.TAMANHO_CHUNK_PADRAO)
 
-    # Usa .connect() com controle manual de transação para garantir IDENTITY_INSERT
-    with get_engine().connect() as conn:
-        transaction = conn.begin()
-        try:
+def transacao(conn=None):
+    """Usa a transação de quem chamou (conn) ou abre uma nova conexão/transação do pool"""
+    return contextlib.nullcontext(conn) if conn is not None else get_engine().begin()
+
+def inserir_bulk(df, nome_tabela, manter_id=True, modo=None, tamanho_chunk=None, conn=None, progresso=None):
+    """
+    Insere o DataFrame numa única transação.
+    modo: 'fast_executemany', 'json' ou 'to_sql' (padrão: config.MODO_INSERCAO).
+    tamanho_chunk: linhas por ida ao banco (padrão: config.TAMANHO_CHUNK_TABELA).
+    conn: conexão com transação aberta por quem chamou (o commit fica com ele).
+    progresso: callable(etapa, linhas), chamado a cada chunk com as linhas gravadas nele
+               (ex: Medidor.somar, que acumula sobre as linhas da planilha já contadas).
+    """
+    if df.empty: return
+
+    modo = modo or config.MODO_INSERCAO
+    tamanho_chunk = tamanho_chunk or config.TAMANHO_CHUNK_TABELA.get(nome_tabela, config.TAMANHO_CHUNK_PADRAO)
+
+    try:
+        # Tudo na mesma conexão/transação para garantir o IDENTITY_INSERT
+        with transacao(conn) as conn:
             if manter_id:
                 # O comando SET IDENTITY_INSERT precisa estar na mesma sessão
                 conn.execute(text(f"SET IDENTITY_INSERT {nome_tabela} ON"))
             
-            # chunksize ajustado para estabilidade
-            df.to_sql(nome_tabela, con=conn, if_exists='append', index=False, chunksize=200)
+            try:
+                if modo == 'fast_executemany':
+                    _inserir_executemany(conn, df, nome_tabela, tamanho_chunk, progresso)
+                elif modo == 'json':
+                    _inserir_openjson(conn, df, nome_tabela, tamanho_chunk, progresso)
+                elif modo == 'to_sql':
+                    df.to_sql(nome_tabela, con=conn, if_exists='append', index=False, chunksize=tamanho_chunk)
+                    if progresso:
+                        progresso('insercao', len(df))
+                else:
+                    raise ValueError(f"Modo de inserção desconhecido: {modo}")
+            except Exception:
+                # A conexão volta para o pool: não deixa o IDENTITY_INSERT ligado na sessão
+                if manter_id:
+                    try: conn.execute(text(f"SET IDENTITY_INSERT {nome_tabela} OFF"))
+                    except: pass
+                raise
             
             if manter_id:
                 conn.execute(text(f"SET IDENTITY_INSERT {nome_tabela} OFF"))
-            
-            transaction.commit()
-            print(f"Importado: {len(df)} registros em {nome_tabela}")
-        except Exception as e:
-            transaction.rollback()
-            print(f"ERRO AO INSERIR EM {nome_tabela}: {e}")
-            raise e
\ No newline at end of file
+        
+        print(f"Importado: {len(df)} registros em {nome_tabela}")
+    except Exception as e:
+        print(f"ERRO AO INSERIR EM {nome_tabela}: {e}")
+        raise e
+
+def inserir_capturando_ids(df, nome_tabela, coluna_id, conn=None):
+    """
+    Insere o DataFrame deixando o banco gerar o IDENTITY e devolve os IDs gerados
+    como uma Series alinhada ao índice do df (sem reconsultar a tabela depois).
+    O MERGE com 'ON 1 = 0' só insere, mas permite o OUTPUT levar junto o número da
+    linha de origem, então cada ID volta para a linha certa mesmo com códigos repetidos.
+    """
+    if df.empty:
+        return pd.Series(dtype='int64')
+
+    colunas = list(df.columns)
+    lista = ', '.join(f"[{c}]" for c in colunas)
+    valores = ', '.join(f"origem.[{c}]" for c in colunas)
+
+    stage = df.copy()
+    stage['_linha'] = range(len(stage))
+
+    with transacao(conn) as conn:
+        criar_temporaria_como(conn, '#ids_stage', nome_tabela, colunas)
+        conn.execute(text("ALTER TABLE #ids_stage ADD _linha INT"))
+        carregar_temporaria(conn, stage, '#ids_stage')
+
+        criar_temporaria(conn, '#ids_gerados', '_linha INT, id INT')
+        conn.execute(text(f"""
+            MERGE INTO {nome_tabela} AS destino
+            USING #ids_stage AS origem ON 1 = 0
+            WHEN NOT MATCHED THEN INSERT ({lista}) VALUES ({valores})
+            OUTPUT origem._linha, INSERTED.[{coluna_id}] INTO #ids_gerados (_linha, id);
+        """))
+        result = conn.execute(text("SELECT _linha, id FROM #ids_gerados"))
+        gerados = dict(result.fetchall())
+        conn.execute(text("DROP TABLE #ids_stage; DROP TABLE #ids_gerados"))
+
+    print(f"Importado: {len(gerados)} registros em {nome_tabela}")
+    ids = [gerados.get(i) for i in range(len(df))]
+    return pd.Series(ids, index=df.index, name=coluna_id)
+
+def ler_por_chaves(nome_tabela, colunas, chaves, df_chaves, conn=None):
+    """
+    Lê do banco as 'colunas' das linhas cujas 'chaves' aparecem em df_chaves.
+    As chaves vão para uma temporária e a busca é um único JOIN (sem IN gigante).
+    """
+    colunas = list(dict.fromkeys(list(chaves) + list(colunas)))
+    if df_chaves.empty:
+        return pd.DataFrame(columns=colunas)
+
+    juncao = ' AND '.join(f"t.[{c}] = k.[{c}]" for c in chaves)
+    lista = ', '.join(f"t.[{c}]" for c in colunas)
+
+    with transacao(conn) as conn:
+        criar_temporaria_como(conn, '#chaves_stage', nome_tabela, chaves)
+        carregar_temporaria(conn, df_chaves[list(chaves)].drop_duplicates(), '#chaves_stage')
+        df = pd.read_sql(text(f"SELECT {lista} FROM {nome_tabela} t JOIN #chaves_stage k ON {juncao}"), conn)
+        conn.execute(text("DROP TABLE #chaves_stage"))
+    return df
+
+def ler_ids(nome_tabela, coluna, conn=None):
+    """Todos os valores de uma coluna de IDs, num array ordenado e sem repetição (uma única consulta)"""
+    with transacao(conn) as conn:
+        result = conn.execute(text(f"SELECT [{coluna}] FROM {nome_tabela} WHERE [{coluna}] IS NOT NULL"))
+        ids = np.fromiter((linha[0] for linha in result), dtype=np.int64)
+    return np.unique(ids)
+
+def ler_colunas(nome_tabela, colunas, filtro=None, parametros=None, conn=None):
+    """Lê 'colunas' de todas as linhas da tabela (ou das que atendem 'filtro', SQL com :parametros)"""
+    lista = ', '.join(f"[{c}]" for c in colunas)
+    sql = f"SELECT {lista} FROM {nome_tabela}" + (f" WHERE {filtro}" if filtro else '')
+    with transacao(conn) as conn:
+        return pd.read_sql(text(sql), conn, params=parametros)
+
+def mesclar_bulk(df, nome_tabela, chaves, colunas_update=None, manter_id=False, conn=None):
+    """
+    Upsert em lote: carrega o DataFrame numa temporária e aplica um único MERGE.
+    Linhas com chave existente atualizam só 'colunas_update' (padrão: todas menos as chaves);
+    as demais são inseridas com todas as colunas.
+    """
+    if df.empty: return
+
+    if df.duplicated(subset=list(chaves)).any():
+        print(f"AVISO: Chaves repetidas no lote para {nome_tabela}; vale a última ocorrência.")
+        df = df.drop_duplicates(subset=list(chaves), keep='last')
+
+    colunas = list(df.columns)
+    colunas_update = [c for c in (colunas_update or colunas) if c in colunas and c not in chaves]
+    juncao = ' AND '.join(f"destino.[{c}] = origem.[{c}]" for c in chaves)
+    lista = ', '.join(f"[{c}]" for c in colunas)
+    valores = ', '.join(f"origem.[{c}]" for c in colunas)
+
+    sql = f"MERGE INTO {nome_tabela} AS destino USING #merge_stage AS origem ON {juncao}\n"
+    if colunas_update:
+        atribuicoes = ', '.join(f"destino.[{c}] = origem.[{c}]" for c in colunas_update)
+        sql += f"WHEN MATCHED THEN UPDATE SET {atribuicoes}\n"
+    sql += f"WHEN NOT MATCHED BY TARGET THEN INSERT ({lista}) VALUES ({valores});"
+
+    try:
+        with transacao(conn) as conn:
+            criar_temporaria_como(conn, '#merge_stage', nome_tabela, colunas)
+            carregar_temporaria(conn, df, '#merge_stage')
+            if manter_id:
+                conn.execute(text(f"SET IDENTITY_INSERT {nome_tabela} ON"))
+            try:
+                conn.execute(text(sql))
+            finally:
+                if manter_id:
+                    conn.execute(text(f"SET IDENTITY_INSERT {nome_tabela} OFF"))
+            conn.execute(text("DROP TABLE #merge_stage"))
+        print(f"Mesclado: {len(df)} registros novos/alterados em {nome_tabela}")
+    except Exception as e:
+        print(f"ERRO AO MESCLAR EM {nome_tabela}: {e}")
+        raise e
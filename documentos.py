@@ -0,0 +1,225 @@
+# documentos.py
+"""
+CPF/CNPJ das importações de clientes e fornecedores:
+dígitos verificadores conferidos na coluna inteira com NumPy (sem laço por linha)
+e documentos repetidos na planilha ou já cadastrados no banco.
+
+O CNPJ alfanumérico (letras nas 12 primeiras posições) também é aceito:
+cada caractere vale o seu código ASCII - 48, como no cálculo oficial.
+"""
+import numpy as np
+import pandas as pd
+
+# Código ASCII normalizado de cada byte: dígitos e letras maiúsculas ficam, minúsculas
+# viram maiúsculas e o resto (pontuação, espaços, acentos) vira 0 = descartado
+_TABELA = np.zeros(256, dtype=np.uint8)
+_TABELA[48:58] = np.arange(48, 58)
+_TABELA[65:91] = np.arange(65, 91)
+_TABELA[97:123] = np.arange(65, 91)
+_LARGURA = 20  # Tamanho do campo cliCpfCgc
+
+_PESOS_CPF_1 = np.arange(10, 1, -1)
+_PESOS_CPF_2 = np.arange(11, 1, -1)
+_PESOS_CNPJ_1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+_PESOS_CNPJ_2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+def _matriz(serie):
+    """
+    Coluna de texto -> (matriz linhas x _LARGURA com os códigos normalizados, tamanho normalizado de cada linha).
+    A coluna inteira vira um único buffer de bytes: sem regex nem laço por linha.
+    """
+    textos = serie.astype(str).mask(serie.isna(), '').tolist()
+    buffer = np.frombuffer('\x00'.join(textos).encode('utf-8'), dtype=np.uint8)
+    separador = buffer == 0
+    if separador.sum() != max(len(textos) - 1, 0):
+        # Texto com \x00 dentro (só em CSV muito estranho): tira antes de separar
+        return _matriz(pd.Series([t.replace('\x00', '') for t in textos]))
+
+    linha = np.cumsum(separador)
+    codigos = _TABELA[buffer]
+    manter = codigos != 0
+    linha, codigos = linha[manter], codigos[manter]
+
+    tamanhos = np.bincount(linha, minlength=len(textos))
+    coluna = np.arange(len(codigos)) - (np.cumsum(tamanhos) - tamanhos)[linha]
+    cabe = coluna < _LARGURA
+    matriz = np.zeros((len(textos), _LARGURA), dtype=np.uint8)
+    matriz[linha[cabe], coluna[cabe]] = codigos[cabe]
+    return matriz, tamanhos
+
+def _digito(codigos, pesos):
+    """Dígito verificador como código ASCII; o '- 48' de cada posição sai de uma vez (sem converter a matriz)"""
+    resto = (codigos[:, :len(pesos)] @ pesos - 48 * pesos.sum()) % 11
+    return np.where(resto < 2, 0, 11 - resto) + 48
+
+def _cpf_valido(codigos):
+    c = codigos[:, :11]
+    ok = (c[:, 9] == _digito(c, _PESOS_CPF_1)) & (c[:, 10] == _digito(c, _PESOS_CPF_2))
+    ok &= (c <= 57).all(axis=1)
+    # 111.111.111-11 e afins passam na conta, mas não são CPF
+    return ok & (c != c[:, :1]).any(axis=1)
+
+def _cnpj_valido(codigos):
+    # Letras valem o código ASCII - 48 ('A' = 17), como no CNPJ alfanumérico; verificadores só dígitos
+    c = codigos[:, :14]
+    ok = (c[:, 12] == _digito(c, _PESOS_CNPJ_1)) & (c[:, 13] == _digito(c, _PESOS_CNPJ_2))
+    ok &= (c[:, 12:] <= 57).all(axis=1)
+    return ok & (c != c[:, :1]).any(axis=1)
+
+_CONFERIR = {11: _cpf_valido, 14: _cnpj_valido}
+
+def _validos(matriz, tamanhos):
+    validos = np.zeros(len(tamanhos), dtype=bool)
+    for qtd, conferir in _CONFERIR.items():
+        linhas = tamanhos == qtd
+        if linhas.any():
+            validos[linhas] = conferir(matriz[linhas])
+    return validos
+
+def _matriz_direta(textos):
+    """
+    Atalho do _matriz para coluna já normalizada (só dígitos e maiúsculas, como vem do banco ou de
+    planilha com o CPF/CNPJ como número): usa os bytes direto, sem juntar e separar o texto.
+    None se algum valor precisa do caminho completo (pontuação, minúscula, acento, mais de _LARGURA).
+    """
+    # Amostra primeiro: coluna formatada (o comum na planilha) desiste sem converter tudo
+    for parte in (textos[:1000], textos):
+        try:
+            codigos = parte.astype(f'S{_LARGURA + 1}')
+        except (UnicodeEncodeError, TypeError, ValueError):
+            return None
+        matriz = codigos.view(np.uint8).reshape(len(parte), _LARGURA + 1)
+        if matriz[:, _LARGURA].any() or not (_TABELA[matriz] == matriz).all():
+            return None
+    return matriz[:, :_LARGURA], np.char.str_len(codigos)
+
+def validar_serie(docs):
+    """Máscara dos documentos válidos (CPF com 11 caracteres ou CNPJ com 14; pontuação é ignorada)"""
+    return _validos(*(_matriz_direta(docs.to_numpy(dtype=object)) or _matriz(docs)))
+
+def normalizar_serie(serie):
+    """
+    Deixa só letras e dígitos (pontuação, espaços e Nulos saem).
+    Letras só ficam em CNPJ alfanumérico válido; nos demais valores saem como antes ('ISENTO' -> '').
+    Número que perdeu os zeros à esquerda no Excel (CPF com 9-10 dígitos, CNPJ com 12-13)
+    ganha os zeros de volta, se assim os dígitos verificadores baterem.
+    Coluna já normalizada não é remontada: só as linhas alteradas voltam a ser texto.
+    """
+    textos = serie.to_numpy(dtype=object)  # Nulo ('nan', 'None') não passa no atalho
+    direta = _matriz_direta(textos)
+    if direta is not None and pd.api.types.infer_dtype(textos, skipna=False) not in ('string', 'empty'):
+        direta = None  # Números numa coluna object: o caminho completo devolve tudo como texto
+    matriz, tamanhos = direta or _matriz(serie)
+    alteradas = np.zeros(len(tamanhos), dtype=bool)
+
+    com_letra = (matriz >= 65).any(axis=1) & ~_validos(matriz, tamanhos)
+    if com_letra.any():
+        # Tira as letras e encosta os dígitos que sobraram à esquerda
+        trecho = matriz[com_letra]
+        digitos = (trecho != 0) & (trecho < 65)
+        ordem = np.argsort(~digitos, axis=1, kind='stable')
+        matriz[com_letra] = np.take_along_axis(np.where(digitos, trecho, 0), ordem, axis=1)
+        tamanhos[com_letra] = digitos.sum(axis=1)
+        alteradas |= com_letra
+
+    for qtd, conferir in _CONFERIR.items():
+        linhas = np.flatnonzero((tamanhos >= qtd - 2) & (tamanhos < qtd))
+        if len(linhas):
+            falta = qtd - tamanhos[linhas]
+            posicao = np.arange(qtd) - falta[:, None]
+            preenchido = np.where(posicao >= 0, np.take_along_axis(matriz[linhas], posicao.clip(0), axis=1), 48)
+            ok = conferir(preenchido.astype(np.uint8))
+            matriz[linhas[ok], :qtd] = preenchido[ok]
+            tamanhos[linhas[ok]] = qtd
+            alteradas[linhas[ok]] = True
+
+    if direta is None:
+        textos, alteradas = None, slice(None)
+    else:
+        textos = textos.copy()
+    novos = np.ascontiguousarray(matriz[alteradas]).view(f'S{_LARGURA}').ravel().astype(f'U{_LARGURA}').astype(object)
+    if textos is None:
+        textos = novos
+    else:
+        textos[alteradas] = novos
+    return pd.Series(textos, index=serie.index)
+
+# Chave inteira do documento normalizado: os dígitos (até 17) alinhados à esquerda e o tamanho
+# junto, para '0123' e '123' não se confundirem. Cabe em int64 sem colisão (< 10^17 * 32).
+_DIGITOS_CHAVE = 17
+_POTENCIAS = 10 ** np.arange(_DIGITOS_CHAVE - 1, -1, -1, dtype=np.int64)
+# Conta direto nos códigos ASCII: o '- 48' de cada dígito sai de uma vez pelo tamanho do documento
+_DESCONTO = 48 * np.concatenate([[0], np.cumsum(_POTENCIAS), np.full(_LARGURA - _DIGITOS_CHAVE, _POTENCIAS.sum())])
+_NUMERICO = np.zeros(256, dtype=bool)
+_NUMERICO[0] = True
+_NUMERICO[48:58] = True
+
+class IndiceDocumentos:
+    """
+    Documentos já conhecidos numa importação: os do banco (lidos uma vez só) e os das
+    linhas já tratadas. Cada documento vira uma chave int64 e as consultas são vetorizadas
+    (hash do pandas), sem ida ao banco por lote nem laço por linha.
+    """
+    def __init__(self, docs_banco, ids_banco=None):
+        # Documento com letra (CNPJ alfanumérico) ou comprido demais -> chave negativa sequencial
+        self.chaves_texto = {}
+        docs_banco = normalizar_serie(pd.Series(docs_banco, dtype=object))
+        preenchidos = (docs_banco != '').to_numpy()
+        chaves = self._chaves(docs_banco[preenchidos])
+        # Index único: o hash é montado uma vez e reaproveitado em todos os lotes (get_indexer)
+        self.banco = pd.Index(pd.unique(chaves))
+        # Documento + cliId do banco, para o modo delta reconhecer o próprio cadastro
+        self.pares = None
+        if ids_banco is not None:
+            ids_banco = np.asarray(ids_banco, dtype=np.int64)[preenchidos]
+            self.pares = pd.MultiIndex.from_arrays([chaves, ids_banco]).unique()
+        # Documentos das linhas já tratadas: o hash do Index é remontado só quando os recentes
+        # alcançam o tamanho dele (dobra), e os recentes são conferidos à parte
+        self.vistos = pd.Index([], dtype=np.int64)
+        self.recentes = np.empty(0, dtype=np.int64)
+
+    def _chaves(self, docs):
+        textos = docs.to_numpy(dtype=object)
+        chaves = np.full(len(textos), -1, dtype=np.int64)
+        try:
+            codigos = textos.astype(f'S{_LARGURA}')
+        except (UnicodeEncodeError, TypeError, ValueError):
+            codigos = None
+        numerico = np.zeros(len(textos), dtype=bool)
+        if codigos is not None:
+            matriz = codigos.view(np.uint8).reshape(len(textos), _LARGURA)
+            tamanhos = np.char.str_len(codigos)
+            numerico = _NUMERICO[matriz].all(axis=1) & (tamanhos <= _DIGITOS_CHAVE)
+            chaves = (matriz[:, :_DIGITOS_CHAVE] @ _POTENCIAS - _DESCONTO[tamanhos]) * 32 + tamanhos
+        if not numerico.all():
+            outros = np.flatnonzero(~numerico)
+            chaves[outros] = [self.chaves_texto.setdefault(t, -1 - len(self.chaves_texto)) for t in textos[outros]]
+        return chaves
+
+    def verificar(self, docs, ids=None):
+        """
+        Retorna (repetido_na_planilha, ja_cadastrado) para o lote e registra os documentos dele.
+        Com 'ids' (cliId da planilha), o documento do próprio cadastro no banco não conta como repetido (modo delta).
+        Documentos vazios nunca são repetidos.
+        """
+        chaves = self._chaves(docs)
+        preenchido = chaves != 0  # Só o documento vazio tem chave 0
+        no_banco = preenchido & (self.banco.get_indexer(chaves) >= 0)
+        if ids is not None and self.pares is not None and no_banco.any():
+            posicoes = np.flatnonzero(no_banco)
+            consulta = pd.MultiIndex.from_arrays([chaves[posicoes], np.asarray(ids, dtype=np.int64)[posicoes]])
+            no_banco[posicoes[self.pares.get_indexer(consulta) >= 0]] = False
+
+        serie = pd.Series(chaves)
+        repetido = serie.duplicated().to_numpy() | (self.vistos.get_indexer(chaves) >= 0)
+        if len(self.recentes):
+            # O hash é do lote: os recentes só são percorridos
+            comuns = self.recentes[pd.Series(self.recentes).isin(serie).to_numpy()]
+            repetido |= serie.isin(comuns).to_numpy()
+        repetido &= preenchido
+
+        self.recentes = np.concatenate([self.recentes, chaves[preenchido & ~repetido]])
+        if len(self.recentes) >= len(self.vistos):
+            self.vistos = self.vistos.append(pd.Index(self.recentes))
+            self.recentes = self.recentes[:0]
+        return repetido, no_banco & ~repetido
@@ -1,33 +1,28 @@
 # import_clientes.py
+import functools
+import os
+import numpy as np
 import pandas as pd
+import config
 import database as db
+import documentos
+import jornal
+import leitura
+import perfil
+import pipeline
+import progresso as prog
 import utils
 import datetime
 
-def executar_importacao(caminho_excel, mapa_colunas=None, is_fornecedor=False, limpar_base=False):
-    # Define o rótulo apenas para o log
-    tipo_str = "Fornecedor" if is_fornecedor else "Cliente"
-    print(f"--- Iniciando Importação de {tipo_str} (Modo Delphi) ---")
-
-    try:
-        # Lê o Excel como texto para evitar problemas de formatação
-        df_origem = pd.read_excel(caminho_excel, sheet_name=0, dtype=str)
-    except Exception as e:
-        print(f"Erro leitura Excel: {e}")
-        return
-
-    # ---------------------------------------------------------
-    # 1. LIMPEZA SEGURA (Igual ao Delphi)
-    # ---------------------------------------------------------
-    if limpar_base and not is_fornecedor:
-        print("Limpando clientes antigos (PRESERVANDO USUÁRIO ADMIN E SISTEMA)...")
-        # SQL exato do Delphi para não travar o sistema:
-        # Mantém cliId 1 (Admin) e tipos 5/6 (Usuários internos)
-        db.executar_comando("DELETE FROM cliente WHERE cliId <> 1 AND cliTipoCad <> 5 AND cliTipoCad <> 6")
-
-    # ---------------------------------------------------------
-    # 2. PREPARAÇÃO DOS DADOS
-    # ---------------------------------------------------------
+# Colunas com poucos valores distintos: guardadas como categoria no lote tratado
+CATEGORIAS_CLIENTE = ['cliFatUf', 'cliFatCidade', 'cliFatBairro', 'cliCobUf', 'cliCobCidade', 'cliCobBairro']
+
+def transformar_lote(df_origem, mapa_colunas=None, is_fornecedor=False, data_cadastro=None):
+    """
+    Converte um lote da planilha no formato da tabela 'cliente'.
+    Retorna None se a importação de CLIENTE não tiver a coluna cliId.
+    data_cadastro: cliDatCad de todas as linhas (padrão: agora); a importação passa a mesma para todos os lotes.
+    """
     df_cli = pd.DataFrame()
 
     def pegar_valor(campo_db, default=''):
@@ -38,7 +33,7 @@ def executar_importacao(caminho_excel, mapa_colunas=None, is_fornecedor=False, l
         
         if col_excel and col_excel in df_origem.columns:
             return df_origem[col_excel].fillna(default)
-        return pd.Series([default] * len(df_origem))
+        return pd.Series([default] * len(df_origem), index=df_origem.index)
 
     # --- A. TRATAMENTO DO ID (cliId) ---
     
@@ -60,59 +55,62 @@ def executar_importacao(caminho_excel, mapa_colunas=None, is_fornecedor=False, l
                 df_cli = df_cli[df_cli['cliId'] != 1]
         else:
             print("AVISO CRÍTICO: Importação de CLIENTE exige coluna 'cliId' mapeada!")
-            return
+            return None
     
     # --- B. CAMPOS PRINCIPAIS ---
 
     # cliTipo (Pessoa Física=0 / Jurídica=1 - Exemplo genérico, ajuste conforme necessidade)
     # Se for fornecedor, o Delphi tende a usar padrão 1, mas aqui tentamos pegar do Excel
     if is_fornecedor:
-        df_cli['cliTipo'] = pegar_valor('cliTipo', '1').apply(lambda x: int(x) if str(x).isdigit() else 1)
+        df_cli['cliTipo'] = utils.converter_inteiro_serie(pegar_valor('cliTipo', '1'), 1)
     else:
-        df_cli['cliTipo'] = pegar_valor('cliTipo', '0').apply(lambda x: int(x) if str(x).isdigit() else 0)
+        df_cli['cliTipo'] = utils.converter_inteiro_serie(pegar_valor('cliTipo', '0'), 0)
 
-    df_cli['cliNome']     = pegar_valor('cliNome').apply(lambda x: utils.tratar_string(x, 50))
-    df_cli['cliCpfCgc']   = pegar_valor('cliCpfCgc').apply(lambda x: utils.tratar_string(utils.remove_char(str(x)), 20))
-    df_cli['cliRgInsc']   = pegar_valor('cliRgInsc').apply(lambda x: utils.tratar_string(x, 20))
-    df_cli['cliFantasia'] = pegar_valor('cliFantasia').apply(lambda x: utils.tratar_string(x, 50))
-    df_cli['cliEmail']    = pegar_valor('cliEmail').apply(lambda x: utils.tratar_string(x, 50))
+    df_cli['cliNome']     = utils.tratar_string_serie(pegar_valor('cliNome'), 50)
+    # Dígitos verificadores e repetidos são conferidos depois, em separar_documentos
+    df_cli['cliCpfCgc']   = utils.tratar_string_serie(documentos.normalizar_serie(pegar_valor('cliCpfCgc')), 20)
+    df_cli['cliRgInsc']   = utils.tratar_string_serie(pegar_valor('cliRgInsc'), 20)
+    df_cli['cliFantasia'] = utils.tratar_string_serie(pegar_valor('cliFantasia'), 50)
+    df_cli['cliEmail']    = utils.tratar_string_serie(pegar_valor('cliEmail'), 50)
 
     # --- C. ENDEREÇOS ---
-    df_cli['cliFatEnd']       = pegar_valor('cliFatEnd').apply(lambda x: utils.tratar_string(x, 50))
-    df_cli['cliFatBairro']    = pegar_valor('cliFatBairro').apply(lambda x: utils.tratar_string(x, 20))
-    df_cli['cliFatEndNumero'] = pegar_valor('cliFatEndNumero').apply(lambda x: utils.tratar_string(x, 10))
-    df_cli['cliFatCidade']    = pegar_valor('cliFatCidade').apply(lambda x: utils.tratar_string(x, 30))
-    df_cli['cliFatUf']        = pegar_valor('cliFatUf').apply(lambda x: utils.tratar_string(x, 2))
-    df_cli['cliFatCep']       = pegar_valor('cliFatCep').apply(lambda x: utils.tratar_string(utils.remove_char(str(x)), 9))
+    df_cli['cliFatEnd']       = utils.tratar_string_serie(pegar_valor('cliFatEnd'), 50)
+    df_cli['cliFatBairro']    = utils.tratar_string_serie(pegar_valor('cliFatBairro'), 20)
+    df_cli['cliFatEndNumero'] = utils.tratar_string_serie(pegar_valor('cliFatEndNumero'), 10)
+    df_cli['cliFatCidade']    = utils.tratar_string_serie(pegar_valor('cliFatCidade'), 30)
+    df_cli['cliFatUf']        = utils.tratar_string_serie(pegar_valor('cliFatUf'), 2)
+    df_cli['cliFatCep']       = utils.tratar_string_serie(utils.remove_char_serie(pegar_valor('cliFatCep')), 9)
     
     # IBGE (Opcional, mas bom ter)
     df_cli['cliFatCidCodIBGE']= pegar_valor('cliFatCidCodIBGE', None) 
 
     # Cobrança (Copia dados se necessário ou pega do Excel)
-    df_cli['cliCobEnd']       = pegar_valor('cliCobEnd').apply(lambda x: utils.tratar_string(x, 50))
-    df_cli['cliCobBairro']    = pegar_valor('cliCobBairro').apply(lambda x: utils.tratar_string(x, 20))
-    df_cli['cliCobEndNumero'] = pegar_valor('cliCobEndNumero').apply(lambda x: utils.tratar_string(x, 10))
-    df_cli['cliCobCidade']    = pegar_valor('cliCobCidade').apply(lambda x: utils.tratar_string(x, 30))
-    df_cli['cliCobUf']        = pegar_valor('cliCobUf').apply(lambda x: utils.tratar_string(x, 2))
-    df_cli['cliCobCep']       = pegar_valor('cliCobCep').apply(lambda x: utils.tratar_string(utils.remove_char(str(x)), 9))
+    df_cli['cliCobEnd']       = utils.tratar_string_serie(pegar_valor('cliCobEnd'), 50)
+    df_cli['cliCobBairro']    = utils.tratar_string_serie(pegar_valor('cliCobBairro'), 20)
+    df_cli['cliCobEndNumero'] = utils.tratar_string_serie(pegar_valor('cliCobEndNumero'), 10)
+    df_cli['cliCobCidade']    = utils.tratar_string_serie(pegar_valor('cliCobCidade'), 30)
+    df_cli['cliCobUf']        = utils.tratar_string_serie(pegar_valor('cliCobUf'), 2)
+    df_cli['cliCobCep']       = utils.tratar_string_serie(utils.remove_char_serie(pegar_valor('cliCobCep')), 9)
     df_cli['cliCobCidCodIBGE']= pegar_valor('cliCobCidCodIBGE', None)
 
     # --- D. FINANCEIRO E OBS ---
-    df_cli['CliLimitCred']    = pegar_valor('CliLimitCred', '0').apply(lambda x: float(str(x).replace(',','.')) if x else 0)
-    df_cli['zzz_CliObsVend']  = pegar_valor('zzz_CliObsVend').apply(lambda x: utils.tratar_string(x, 255))
+    # Mesmo tratamento de moeda do produto/financeiro ('R$ 1.234,56', '1234.56', ...)
+    df_cli['CliLimitCred'], invalidos_limite = utils.tratar_moeda_serie(pegar_valor('CliLimitCred', '0'))
+    utils.avisar_invalidos('CliLimitCred', invalidos_limite)
+    df_cli['zzz_CliObsVend']  = utils.tratar_string_serie(pegar_valor('zzz_CliObsVend'), 255)
     
     # --- E. CONTATO ---
-    df_cli['CliFone']    = pegar_valor('CliFone').apply(lambda x: utils.tratar_string(utils.remove_char(str(x)), 10))
-    df_cli['CliFax']     = pegar_valor('CliFax').apply(lambda x: utils.tratar_string(utils.remove_char(str(x)), 10))
-    df_cli['cliCelular'] = pegar_valor('cliCelular').apply(lambda x: utils.tratar_string(utils.remove_char(str(x)), 10))
+    df_cli['CliFone']    = utils.tratar_string_serie(utils.remove_char_serie(pegar_valor('CliFone')), 10)
+    df_cli['CliFax']     = utils.tratar_string_serie(utils.remove_char_serie(pegar_valor('CliFax')), 10)
+    df_cli['cliCelular'] = utils.tratar_string_serie(utils.remove_char_serie(pegar_valor('cliCelular')), 10)
 
-    df_cli['CliContNome1']  = pegar_valor('CliContNome1').apply(lambda x: utils.tratar_string(x, 50))
-    df_cli['CliContDepto1'] = pegar_valor('CliContDepto1').apply(lambda x: utils.tratar_string(x, 20))
-    df_cli['CliContFone1']  = pegar_valor('CliContFone1').apply(lambda x: utils.tratar_string(utils.remove_char(str(x)), 10))
+    df_cli['CliContNome1']  = utils.tratar_string_serie(pegar_valor('CliContNome1'), 50)
+    df_cli['CliContDepto1'] = utils.tratar_string_serie(pegar_valor('CliContDepto1'), 20)
+    df_cli['CliContFone1']  = utils.tratar_string_serie(utils.remove_char_serie(pegar_valor('CliContFone1')), 10)
     
     # Filiação (Pai/Mãe)
-    df_cli['CliCadNomePai'] = pegar_valor('CliCadNomePai').apply(lambda x: utils.tratar_string(x, 50))
-    df_cli['CliCadNomeMae'] = pegar_valor('CliCadNomeMae').apply(lambda x: utils.tratar_string(x, 50))
+    df_cli['CliCadNomePai'] = utils.tratar_string_serie(pegar_valor('CliCadNomePai'), 50)
+    df_cli['CliCadNomeMae'] = utils.tratar_string_serie(pegar_valor('CliCadNomeMae'), 50)
 
     # --- F. CAMPOS DE CONTROLE (REGRA DE NEGÓCIO IMPORTANTE) ---
     
@@ -121,36 +119,162 @@ def executar_importacao(caminho_excel, mapa_colunas=None, is_fornecedor=False, l
     # 1 = FORNECEDOR
     df_cli['cliTipoCad'] = 1 if is_fornecedor else 0
     
-    df_cli['cliDatCad']  = datetime.datetime.now()
+    df_cli['cliDatCad']  = data_cadastro or datetime.datetime.now()
 
     df_cli['cliempidcad'] = 1
 
     # Validação final: Remove linhas sem Nome
     df_cli = df_cli[df_cli['cliNome'] != '']
 
-    # ---------------------------------------------------------
-    # 3. LÓGICA DE INSERÇÃO (IDENTITY_INSERT)
-    # ---------------------------------------------------------
-    
-    manter_id_original = False
+    # Se é Fornecedor, removemos o cliId para o banco gerar (Auto Incremento)
+    if is_fornecedor and 'cliId' in df_cli.columns:
+        df_cli = df_cli.drop(columns=['cliId'])
 
-    if not is_fornecedor:
+    return utils.compactar_tipos(df_cli, CATEGORIAS_CLIENTE)
+
+_MOTIVOS_DOCUMENTO = np.array([
+    ', '.join(texto for bit, texto in enumerate(['documento inválido', 'repetido na planilha', 'já cadastrado']) if codigo >> bit & 1)
+    for codigo in range(8)
+], dtype=object)
+
+def separar_documentos(df_cli, indice, comparar_ids=False):
+    """
+    Confere o CPF/CNPJ do lote inteiro: dígitos verificadores, repetidos na planilha
+    e já cadastrados no banco (indice: documentos.IndiceDocumentos).
+    Conforme config.DOCUMENTO_INVALIDO / DOCUMENTO_DUPLICADO, a linha é só marcada ou pulada.
+    Repetido com cliId da planilha nunca é pulado: o financeiro aponta para esse ID.
+    Retorna (df_importar, marcados): marcados tem 'motivo' e 'acao', indexado pelas linhas da planilha.
+    """
+    docs = df_cli['cliCpfCgc']
+    invalido = (docs != '').to_numpy() & ~documentos.validar_serie(docs)
+    repetido, cadastrado = indice.verificar(docs, df_cli['cliId'] if comparar_ids else None)
+
+    pular_duplicado = config.DOCUMENTO_DUPLICADO == 'pular' and 'cliId' not in df_cli.columns
+    pular = (invalido & (config.DOCUMENTO_INVALIDO == 'pular')) | ((repetido | cadastrado) & pular_duplicado)
+
+    # Combinação dos 3 problemas (bits) -> texto do motivo
+    codigo = invalido * 1 + repetido * 2 + cadastrado * 4
+    marcar = codigo > 0
+    marcados = pd.DataFrame({
+        'motivo': _MOTIVOS_DOCUMENTO[codigo[marcar]],
+        'acao': np.where(pular[marcar], 'não importado', 'importado'),
+    }, index=df_cli.index[marcar])
+    return df_cli[~pular], marcados
+
+def carregar_delta(df_cli, mapa_colunas):
+    """
+    Modo incremental: compara o hash dos campos mapeados com o que já está no banco
+    e só grava (MERGE por cliId) os clientes novos ou alterados.
+    Campos não mapeados não são sobrescritos nos clientes que já existem.
+    """
+    colunas = [c for c in (mapa_colunas or {}) if c in df_cli.columns and c != 'cliId']
+    existentes = db.ler_por_chaves('cliente', colunas, ['cliId'], df_cli)
+    df_alterados = utils.filtrar_alterados(df_cli, existentes, ['cliId'], colunas)
+    print(f"Delta: {len(df_alterados)} de {len(df_cli)} clientes novos ou alterados.")
+    db.mesclar_bulk(df_alterados, 'cliente', ['cliId'], colunas_update=colunas, manter_id=True)
+    return len(df_alterados)
+
+def executar_importacao(caminho_excel, mapa_colunas=None, is_fornecedor=False, limpar_base=False, retomar=False, modo_delta=False, aba=0, progresso=None):
+    # Mede cada etapa (leitura, tratamento, carga...) e grava o relatório de desempenho
+    with perfil.execucao('fornecedores' if is_fornecedor else 'clientes', caminho_excel):
+        # Define o rótulo apenas para o log
+        tipo_str = "Fornecedor" if is_fornecedor else "Cliente"
+        print(f"--- Iniciando Importação de {tipo_str} (Modo Delphi) ---")
+
+        # O delta compara pelo cliId; fornecedor não traz ID, então é sempre inserção
+        if modo_delta and is_fornecedor:
+            print("AVISO: Modo delta não se aplica a fornecedores (sem cliId). Fazendo inserção normal.")
+            modo_delta = False
+        if modo_delta and limpar_base:
+            print("Modo delta: a limpeza da base foi ignorada.")
+            limpar_base = False
+
+        # Ponto de retomada: cada lote gravado fica registrado no jornal local
+        registro = jornal.JornalImportacao(caminho_excel, 'fornecedores' if is_fornecedor else 'clientes', mapa_colunas, aba=aba, tabela='cliente')
+        if retomar and registro.ultima_linha() and limpar_base:
+            print("Retomando importação: a limpeza da base foi ignorada para não apagar o que já foi gravado.")
+            limpar_base = False
+
+        # ---------------------------------------------------------
+        # 1. LIMPEZA SEGURA (Igual ao Delphi)
+        # ---------------------------------------------------------
+        if limpar_base and not is_fornecedor:
+            print("Limpando clientes antigos (PRESERVANDO USUÁRIO ADMIN E SISTEMA)...")
+            # SQL exato do Delphi para não travar o sistema:
+            # Mantém cliId 1 (Admin) e tipos 5/6 (Usuários internos)
+            db.executar_comando("DELETE FROM cliente WHERE cliId <> 1 AND cliTipoCad <> 5 AND cliTipoCad <> 6")
+
+        # ---------------------------------------------------------
+        # 2. LÓGICA DE INSERÇÃO (IDENTITY_INSERT)
+        # ---------------------------------------------------------
         # Se é Cliente, ativamos o IDENTITY_INSERT para usar os IDs do Excel
-        manter_id_original = True
-        
-        # Verificação final de segurança
-        if 'cliId' not in df_cli.columns:
-            print("Erro: ID não encontrado no DataFrame.")
-            return
-    else:
-        # Se é Fornecedor, removemos o cliId para o banco gerar (Auto Incremento)
-        if 'cliId' in df_cli.columns:
-            df_cli = df_cli.drop(columns=['cliId'])
+        manter_id_original = not is_fornecedor
+        print(f"Manter ID original: {manter_id_original}")
+        print(f"Tipo de Cadastro (cliTipoCad) definido como: {1 if is_fornecedor else 0}")
 
-    print(f"Inserindo {len(df_cli)} registros... (Manter ID original: {manter_id_original})")
-    print(f"Tipo de Cadastro (cliTipoCad) definido como: {1 if is_fornecedor else 0}")
-    
-    # Chama a função de inserção no banco
-    db.inserir_bulk(df_cli, 'cliente', manter_id=manter_id_original)
-    
-    print(f"--- Fim Importação {tipo_str} ---")
\ No newline at end of file
+        # ---------------------------------------------------------
+        # 3. DOCUMENTOS JÁ CADASTRADOS (lidos uma vez só, para conferir todos os lotes)
+        # ---------------------------------------------------------
+        with perfil.etapa('documentos_banco') as medida:
+            existentes = db.ler_colunas('cliente', ['cliCpfCgc', 'cliId'], "cliTipoCad = :tipo AND cliCpfCgc <> ''",
+                                        {'tipo': 1 if is_fornecedor else 0})
+            # No delta o documento do próprio cliId não é repetido (a linha vai atualizar o cadastro)
+            indice = documentos.IndiceDocumentos(existentes['cliCpfCgc'], existentes['cliId'] if modo_delta else None)
+            medida.linhas = len(existentes)
+        arquivo_rejeitados = os.path.join(
+            config.DIRETORIO_REJEITADOS,
+            f"{datetime.datetime.now():%Y%m%d_%H%M%S}_{'fornecedores' if is_fornecedor else 'clientes'}_documentos.csv"
+        )
+
+        # ---------------------------------------------------------
+        # 4. LEITURA + PREPARAÇÃO EM PARALELO COM A INSERÇÃO, LOTE A LOTE
+        # ---------------------------------------------------------
+        total = 0
+        marcados = 0
+        medidor = prog.criar_medidor(progresso, leitura.contar_linhas(caminho_excel, aba))
+        # Tratamento das colunas dividido em processos (config.PROCESSOS_TRANSFORMACAO); documentos conferidos aqui
+        transformar = pipeline.TransformacaoParalela(functools.partial(
+            transformar_lote, mapa_colunas=mapa_colunas, is_fornecedor=is_fornecedor, data_cadastro=datetime.datetime.now()
+        ))
+
+        def tratar(df_origem):
+            nonlocal marcados
+            df_cli = transformar(df_origem)
+            if df_cli is None:
+                return None
+            df_cli, df_marcados = separar_documentos(df_cli, indice, comparar_ids=modo_delta)
+            if len(df_marcados):
+                # Linha original da planilha, para corrigir e reimportar
+                df_rej = df_origem.loc[df_marcados.index].copy()
+                df_rej.insert(0, 'acao', df_marcados['acao'])
+                df_rej.insert(0, 'motivo', df_marcados['motivo'])
+                df_rej.insert(0, 'indice', df_marcados.index)
+                utils.gravar_rejeitados(df_rej, arquivo_rejeitados)
+                marcados += len(df_marcados)
+            return df_cli
+
+        def carregar(df_cli):
+            nonlocal total
+            if modo_delta:
+                total += carregar_delta(df_cli, mapa_colunas)
+                return
+            print(f"Inserindo {len(df_cli)} registros...")
+            # Chama a função de inserção no banco
+            db.inserir_bulk(df_cli, 'cliente', manter_id=manter_id_original, progresso=medidor.somar)
+            total += len(df_cli)
+
+        with transformar:
+            pipeline.executar_em_pipeline(
+                perfil.medir_lotes(leitura.ler_planilha_em_lotes(caminho_excel, aba)),
+                perfil.medir('tratamento', tratar, cprofile=True),
+                perfil.medir('carga', carregar),
+                jornal=registro,
+                retomar=retomar,
+                progresso=medidor
+            )
+        registro.concluir()
+
+        print(f"Total importado: {total} registros")
+        if marcados:
+            print(f"AVISO: {marcados} registro(s) com CPF/CNPJ inválido ou repetido: {arquivo_rejeitados}")
+        print(f"--- Fim Importação {tipo_str} ---")
@@ -1,73 +1,77 @@
 # import_financeiro.py
+import functools
+import os
 import pandas as pd
+import config
 import database as db
+import jornal
+import leitura
+import perfil
+import pipeline
+import progresso as prog
 import utils
 import datetime
 
-def executar_importacao(caminho_excel, limpar_base=False):
-    print("--- Iniciando Importação do FINANCEIRO ---")
-
-    # 1. LEITURA DO EXCEL
-    # Ajuste 'sheet_name' se os dados financeiros estiverem em outra aba
-    try:
-        df_origem = pd.read_excel(caminho_excel, sheet_name=0, dtype=str)
-    except Exception as e:
-        print(f"Erro ao ler Excel: {e}")
-        return
-
-    # 2. LIMPEZA DA BASE (Opcional)
-    if limpar_base:
-        # CUIDADO: Isso apaga todo o histórico financeiro
-        print("Limpando tabela FINANCEIRO...")
-        db.executar_comando("DELETE FROM financeiro")
-        # Se tiver tabela filha (ex: financeiro_baixa), limpar aqui também
+# Colunas com poucos valores distintos: guardadas como categoria no lote tratado
+CATEGORIAS_FINANCEIRO = ['pgtTipoConta', 'pgtPago', 'pgtBanco', 'pgtAgencia']
 
+def transformar_lote(df_origem, data_atual=None):
+    """
+    Converte um lote da planilha no formato da tabela 'financeiro'.
+    data_atual: data dos títulos sem emissão válida (padrão: agora); a importação passa a mesma para todos os lotes.
+    """
     df_fin = pd.DataFrame()
 
-    # 3. MAPEAMENTO E TRATAMENTO
+    # MAPEAMENTO E TRATAMENTO
     # Adapte as chaves do df_origem['...'] para os nomes do SEU Excel
 
     # Link com Cliente/Fornecedor (Essencial)
     df_fin['pgtClienteId'] = df_origem['id_cliente'].fillna(0).astype(int)
     
     # Valores Monetários
-    df_fin['pgtValor'] = df_origem['valor_original'].apply(utils.tratar_moeda)
-    df_fin['pgtValorJuros'] = df_origem['juros'].apply(utils.tratar_moeda)
+    df_fin['pgtValor'], invalidos_valor = utils.tratar_moeda_serie(df_origem['valor_original'])
+    df_fin['pgtValorJuros'], invalidos_juros = utils.tratar_moeda_serie(df_origem['juros'])
+    utils.avisar_invalidos('valor_original', invalidos_valor)
+    utils.avisar_invalidos('juros', invalidos_juros)
     
     # Tratamento de Datas (Crucial para o Financeiro)
-    # dayfirst=True garante que 01/02 seja 1º de Fev, não 2 de Jan
-    df_fin['pgtData'] = pd.to_datetime(df_origem['data_emissao'], dayfirst=True, errors='coerce').fillna(datetime.datetime.now())
+    # Formato fixo detectado na coluna (dd/mm/aaaa, ISO, serial do Excel...): 01/02 é 1º de Fev, não 2 de Jan
+    emissao, invalidos_emissao = utils.converter_data_serie(df_origem['data_emissao'])
+    df_fin['pgtData'] = emissao.fillna(data_atual or datetime.datetime.now())
+    utils.avisar_invalidos('data_emissao', invalidos_emissao, destino='substituídos pela data atual')
     
     # Nota: No seu Delphi estava escrito 'pgtVecmto' (possível erro de digitação no legado)
     # Verifique no SQL se a coluna é 'pgtVencimento' ou 'pgtVecmto'. Mantive a do Delphi.
-    df_fin['pgtVecmto'] = pd.to_datetime(df_origem['data_vencimento'], dayfirst=True, errors='coerce')
-    df_fin['pgtDataQuitou'] = pd.to_datetime(df_origem['data_pagamento'], dayfirst=True, errors='coerce')
+    df_fin['pgtVecmto'], invalidos_vencimento = utils.converter_data_serie(df_origem['data_vencimento'])
+    df_fin['pgtDataQuitou'], invalidos_pagamento = utils.converter_data_serie(df_origem['data_pagamento'])
+    utils.avisar_invalidos('data_vencimento', invalidos_vencimento, destino='descartados (sem vencimento)')
+    utils.avisar_invalidos('data_pagamento', invalidos_pagamento, destino='tratados como não pagos')
 
     # Identificação do Documento
-    df_fin['pgtNumDoc'] = df_origem['numero_doc'].apply(lambda x: utils.tratar_string(x, 20))
-    df_fin['pgtNossoNumero'] = df_origem['nosso_numero'].apply(lambda x: utils.tratar_string(x, 20))
-    df_fin['pgtObs'] = df_origem['obs'].apply(lambda x: utils.tratar_string(x, 100)) # Ajuste tamanho se precisar
+    df_fin['pgtNumDoc'] = utils.tratar_string_serie(df_origem['numero_doc'], 20)
+    df_fin['pgtNossoNumero'] = utils.tratar_string_serie(df_origem['nosso_numero'], 20)
+    df_fin['pgtObs'] = utils.tratar_string_serie(df_origem['obs'], 100) # Ajuste tamanho se precisar
 
     # Tipos e Status (Regras de Negócio)
     
     # Tipo Conta: 'R' = Receber, 'P' = Pagar
     # Se não tiver no Excel, assume 'R' (padrão do seu Delphi)
     if 'tipo_conta' in df_origem.columns:
-        df_fin['pgtTipoConta'] = df_origem['tipo_conta'].apply(lambda x: utils.tratar_string(x, 1).upper())
+        df_fin['pgtTipoConta'] = utils.tratar_string_serie(df_origem['tipo_conta'], 1).str.upper()
     else:
         df_fin['pgtTipoConta'] = 'R'
 
     # Pago: 'S' = Sim, 'N' = Não
     if 'pago' in df_origem.columns:
-        df_fin['pgtPago'] = df_origem['pago'].apply(lambda x: utils.tratar_string(x, 1).upper())
+        df_fin['pgtPago'] = utils.tratar_string_serie(df_origem['pago'], 1).str.upper()
     else:
         # Lógica inteligente: Se tem data de quitação, está pago
-        df_fin['pgtPago'] = df_fin['pgtDataQuitou'].apply(lambda x: 'S' if pd.notnull(x) else 'N')
+        df_fin['pgtPago'] = df_fin['pgtDataQuitou'].notnull().map({True: 'S', False: 'N'})
 
     # Dados Bancários (Opcional)
-    df_fin['pgtBanco'] = df_origem['banco'].apply(lambda x: utils.tratar_string(x, 10)) if 'banco' in df_origem else ''
-    df_fin['pgtAgencia'] = df_origem['agencia'].apply(lambda x: utils.tratar_string(x, 10)) if 'agencia' in df_origem else ''
-    df_fin['pgtContaC'] = df_origem['conta'].apply(lambda x: utils.tratar_string(x, 15)) if 'conta' in df_origem else ''
+    df_fin['pgtBanco'] = utils.tratar_string_serie(df_origem['banco'], 10) if 'banco' in df_origem else ''
+    df_fin['pgtAgencia'] = utils.tratar_string_serie(df_origem['agencia'], 10) if 'agencia' in df_origem else ''
+    df_fin['pgtContaC'] = utils.tratar_string_serie(df_origem['conta'], 15) if 'conta' in df_origem else ''
 
     # Campos Padrão do Legado
     df_fin['empId'] = 1
@@ -75,15 +79,94 @@ def executar_importacao(caminho_excel, limpar_base=False):
     df_fin['pgtTipoVista'] = 0 
     df_fin['pgtTipoPrazo'] = 3 # Ex: 3 = Boleto (conforme seu btnInfo do Delphi)
 
-    # 4. INSERÇÃO NO BANCO
-    # Financeiro geralmente tem autoincremento no ID principal (ex: pgtId), 
-    # então NÃO enviamos o ID, deixamos o SQL Server gerar.
-    print(f"Inserindo {len(df_fin)} registros financeiros...")
-    
-    # Removendo linhas onde Cliente é 0 ou Data de Vencimento é NaT (Not a Time) para evitar erro
-    df_fin = df_fin[df_fin['pgtClienteId'] > 0]
+    # Removendo linhas sem Data de Vencimento (NaT) para evitar erro.
+    # O cliente é conferido depois, em separar_orfaos (as linhas sem cliente vão para o arquivo de rejeitados)
     df_fin = df_fin[df_fin['pgtVecmto'].notnull()]
 
-    db.inserir_bulk(df_fin, 'financeiro', manter_id=False)
+    return utils.compactar_tipos(df_fin, CATEGORIAS_FINANCEIRO)
+
+def separar_orfaos(df_fin, ids_clientes):
+    """
+    Confere a coluna pgtClienteId inteira contra os cliIds do banco (array ordenado, sem consultas por linha).
+    Com as FKs desligadas na carga, é o que impede títulos apontando para cliente inexistente.
+    Retorna (df_validos, motivos): motivos é uma Series indexada pelas linhas rejeitadas.
+    """
+    ids = df_fin['pgtClienteId'].to_numpy()
+    sem_cliente = ids <= 0
+    inexistente = ~sem_cliente & ~utils.contidos_em(ids, ids_clientes)
+    rejeitados = sem_cliente | inexistente
+    motivos = pd.Series(
+        pd.Categorical.from_codes(inexistente[rejeitados].astype(int), ['cliente não informado', 'cliente inexistente']),
+        index=df_fin.index[rejeitados]
+    )
+    return df_fin[~rejeitados], motivos
+
+def executar_importacao(caminho_excel, limpar_base=False, retomar=False, aba=0, progresso=None):
+    # Mede cada etapa (leitura, tratamento, carga...) e grava o relatório de desempenho
+    with perfil.execucao('financeiro', caminho_excel):
+        print("--- Iniciando Importação do FINANCEIRO ---")
+
+        # Ponto de retomada: cada lote gravado fica registrado no jornal local
+        registro = jornal.JornalImportacao(caminho_excel, 'financeiro', aba=aba, tabela='financeiro')
+        if retomar and registro.ultima_linha() and limpar_base:
+            print("Retomando importação: a limpeza da base foi ignorada para não apagar o que já foi gravado.")
+            limpar_base = False
+
+        # 1. LIMPEZA DA BASE (Opcional)
+        if limpar_base:
+            # CUIDADO: Isso apaga todo o histórico financeiro
+            print("Limpando tabela FINANCEIRO...")
+            db.executar_comando("DELETE FROM financeiro")
+            # Se tiver tabela filha (ex: financeiro_baixa), limpar aqui também
+
+        # 2. CLIENTES EXISTENTES: lidos uma vez só, para validar o pgtClienteId de todos os lotes
+        with perfil.etapa('ids_clientes') as medida:
+            ids_clientes = db.ler_ids('cliente', 'cliId')
+            medida.linhas = len(ids_clientes)
+        print(f"{len(ids_clientes)} clientes no banco para validar os títulos.")
+        arquivo_rejeitados = os.path.join(
+            config.DIRETORIO_REJEITADOS, f"{datetime.datetime.now():%Y%m%d_%H%M%S}_financeiro_orfaos.csv"
+        )
+
+        # 3. LEITURA EM LOTES -> TRATAMENTO, EM PARALELO COM A INSERÇÃO
+        total = 0
+        rejeitados = 0
+        medidor = prog.criar_medidor(progresso, leitura.contar_linhas(caminho_excel, aba))
+        # Tratamento das colunas dividido em processos (config.PROCESSOS_TRANSFORMACAO); órfãos separados aqui
+        transformar = pipeline.TransformacaoParalela(functools.partial(transformar_lote, data_atual=datetime.datetime.now()))
+
+        def tratar(df_origem):
+            nonlocal rejeitados
+            df_fin, motivos = separar_orfaos(transformar(df_origem), ids_clientes)
+            if len(motivos):
+                # Linha original da planilha, para corrigir e reimportar
+                df_rej = df_origem.loc[motivos.index].copy()
+                df_rej.insert(0, 'motivo', motivos)
+                df_rej.insert(0, 'indice', motivos.index)
+                utils.gravar_rejeitados(df_rej, arquivo_rejeitados)
+                rejeitados += len(motivos)
+            return df_fin
+
+        def carregar(df_fin):
+            nonlocal total
+            # Financeiro geralmente tem autoincremento no ID principal (ex: pgtId), 
+            # então NÃO enviamos o ID, deixamos o SQL Server gerar.
+            print(f"Inserindo {len(df_fin)} registros financeiros...")
+            db.inserir_bulk(df_fin, 'financeiro', manter_id=False, progresso=medidor.somar)
+            total += len(df_fin)
+
+        with transformar:
+            pipeline.executar_em_pipeline(
+                perfil.medir_lotes(leitura.ler_planilha_em_lotes(caminho_excel, aba)),
+                perfil.medir('tratamento', tratar, cprofile=True),
+                perfil.medir('carga', carregar),
+                jornal=registro,
+                retomar=retomar,
+                progresso=medidor
+            )
+        registro.concluir()
 
-    print("--- Fim Importação Financeira ---")
\ No newline at end of file
+        print(f"Total importado: {total} registros financeiros")
+        if rejeitados:
+            print(f"AVISO: {rejeitados} título(s) sem cliente válido não foram importados: {arquivo_rejeitados}")
+        print("--- Fim Importação Financeira ---")
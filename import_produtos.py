@@ -1,191 +1,284 @@
 # import_produtos.py
+import functools
 import pandas as pd
 import numpy as np
 import database as db
+import jornal
+import leitura
+import perfil
+import pipeline
+import progresso as prog
 import utils
 from sqlalchemy import text
 
 def sincronizar_ncms(df_base):
     """
-    1. Verifica os NCMs que estão no Excel.
-    2. Insere os inexistentes na tabela 'proncm'.
+    1. Carrega os NCMs distintos do Excel numa tabela temporária (#ncm_stage).
+    2. Insere os inexistentes na tabela 'proncm' com um único INSERT ... SELECT.
     3. Retorna um dicionário { 'NCM_CODIGO': NCM_ID } para vincular no produto.
     """
     print("--- Sincronizando Tabela de NCMs (proncm) ---")
     
     # Pega lista única de NCMs da planilha (remove vazios)
     ncms_excel = df_base['zzz_proCodigoNcm'].dropna().unique()
-    ncms_excel = [str(x).strip() for x in ncms_excel if str(x).strip() != '']
+    ncms_excel = list(dict.fromkeys(str(x).strip() for x in ncms_excel if str(x).strip() != ''))
     
     if not ncms_excel:
         return {}
 
-    engine = db.get_engine()
-    
-    # 1. Busca NCMs já existentes no banco para não duplicar
-    lista_sql = str(tuple(ncms_excel)).replace(',)', ')') 
-    if len(ncms_excel) == 1: 
-        lista_sql = f"('{ncms_excel[0]}')"
-
-    sql_busca = f"SELECT NCMcodigoNCM, ncmid FROM proncm WHERE NCMcodigoNCM IN {lista_sql}"
-    
     try:
-        df_existentes = pd.read_sql(sql_busca, engine)
-        ncms_banco = set(df_existentes['NCMcodigoNCM'].astype(str).str.strip())
-    except Exception as e:
-        print(f"Erro ao buscar NCMs: {e}")
-        ncms_banco = set()
-
-    # 2. Identifica quais são novos
-    ncms_novos = [n for n in ncms_excel if n not in ncms_banco]
-
-    # 3. Insere os novos (se houver)
-    if ncms_novos:
-        print(f"Cadastrando {len(ncms_novos)} novos NCMs...")
-        with engine.begin() as conn:
-            for codigo in ncms_novos:
-                try:
-                    # Inserindo apenas o código. 
-                    sql_insert = "INSERT INTO proncm (NCMcodigoNCM) VALUES (:cod)"
-                    conn.execute(text(sql_insert), {"cod": codigo})
-                except Exception as e:
-                    print(f"Erro ao inserir NCM {codigo}: {e}")
-
-    # 4. Busca tudo novamente para gerar o dicionário de IDs atualizado
-    try:
-        df_final = pd.read_sql(sql_busca, engine)
-        # Cria dicionário: Chave = Código NCM, Valor = ID (ncmid)
-        mapa_ids = dict(zip(df_final['NCMcodigoNCM'].astype(str).str.strip(), df_final['ncmid']))
+        # Tudo na mesma conexão: a #temporária só existe nesta sessão
+        with db.get_engine().begin() as conn:
+            db.criar_temporaria(conn, '#ncm_stage', 'codigo VARCHAR(8) COLLATE DATABASE_DEFAULT PRIMARY KEY')
+            db.carregar_temporaria(conn, pd.DataFrame({'codigo': ncms_excel}), '#ncm_stage')
+
+            # Insere de uma vez os que ainda não existem
+            result = conn.execute(text("""
+                INSERT INTO proncm (NCMcodigoNCM)
+                SELECT s.codigo FROM #ncm_stage s
+                WHERE NOT EXISTS (SELECT 1 FROM proncm p WHERE p.NCMcodigoNCM = s.codigo)
+            """))
+            if result.rowcount and result.rowcount > 0:
+                print(f"Cadastrados {result.rowcount} novos NCMs.")
+
+            # Mapa completo código -> ncmid num único SELECT
+            result = conn.execute(text("""
+                SELECT p.NCMcodigoNCM, p.ncmid
+                FROM proncm p JOIN #ncm_stage s ON p.NCMcodigoNCM = s.codigo
+            """))
+            # Cria dicionário: Chave = Código NCM, Valor = ID (ncmid)
+            mapa_ids = {str(codigo).strip(): ncmid for codigo, ncmid in result}
+            conn.execute(text("DROP TABLE #ncm_stage"))
         return mapa_ids
     except Exception as e:
-        print(f"Erro ao mapear IDs de NCM: {e}")
+        print(f"Erro ao sincronizar NCMs: {e}")
         return {}
 
-def executar_importacao(caminho_excel, mapa_colunas, limpar_base=False):
-    print("--- Iniciando Importação (Produto + Empresa + Fiscal) ---")
-    
-    try:
-        df_origem = pd.read_excel(caminho_excel, sheet_name=0, dtype=str)
-    except Exception as e:
-        print(f"Erro ao ler Excel: {e}")
-        return
-
-    # 1. LIMPEZA
-    if limpar_base:
-        print("Limpando tabelas...")
-        try:
-            db.limpar_tabela('prolote', reset_identity=True)
-            db.executar_comando("DELETE FROM produto_empresa")
-            db.executar_comando("DELETE FROM produto WHERE proId > 1") 
-            db.executar_comando("DBCC CHECKIDENT ('produto', RESEED, 1)")
-            db.limpar_tabela('produtoUn', reset_identity=True)
-        except Exception as e:
-            print(f"Erro limpeza: {e}")
-
-    # 2. PREPARAÇÃO DOS DADOS
-    def pegar_valor(campo_db, funcao_tratamento=None, valor_padrao=''):
+# Colunas com poucos valores distintos: guardadas como categoria no lote tratado
+CATEGORIAS_PRODUTO = ['proUn', 'proCodcst2', 'proCodCSOSN']
+
+def transformar_lote(df_origem, mapa_colunas):
+    """
+    Converte um lote da planilha nos campos de 'produto' / 'produto_empresa'.
+    A coluna 'proId' vem numérica quando o Excel traz ID fixo e NaN quando será automático.
+    Não acessa o banco: o NCM é resolvido depois, em carregar_lote.
+    """
+    def pegar_texto(campo_db, tamanho_max, valor_padrao='', somente_digitos=False):
         col_excel = mapa_colunas.get(campo_db)
         if col_excel and col_excel in df_origem.columns:
             serie = df_origem[col_excel]
-            if funcao_tratamento:
-                return serie.apply(lambda x: funcao_tratamento(x) if pd.notnull(x) else valor_padrao)
-            return serie.fillna(valor_padrao)
-        return pd.Series([valor_padrao] * len(df_origem))
+            tratado = utils.remove_char_serie(serie) if somente_digitos else serie
+            return utils.tratar_string_serie(tratado, tamanho_max).mask(serie.isna(), valor_padrao)
+        return pd.Series([valor_padrao] * len(df_origem), index=df_origem.index)
+
+    def pegar_moeda(campo_db):
+        col_excel = mapa_colunas.get(campo_db)
+        if col_excel and col_excel in df_origem.columns:
+            valores, invalidos = utils.tratar_moeda_serie(df_origem[col_excel])
+            utils.avisar_invalidos(campo_db, invalidos)
+            return valores
+        return pd.Series(0.0, index=df_origem.index)
 
     df_base = pd.DataFrame()
     
     # Campos Universais
-    df_base['proDescricao'] = pegar_valor('proDescricao', lambda x: utils.tratar_string(x, 50))
-    df_base['zzz_proCodigo'] = pegar_valor('zzz_proCodigo', lambda x: utils.tratar_string(x, 20))
+    df_base['proDescricao'] = pegar_texto('proDescricao', 50)
+    df_base['zzz_proCodigo'] = pegar_texto('zzz_proCodigo', 20)
     
     # NCM: Lemos o CÓDIGO do Excel para uma coluna temporária
-    df_base['zzz_proCodigoNcm'] = pegar_valor('zzz_proCodigoNcm', lambda x: utils.tratar_string(utils.remove_char(x), 8))
+    df_base['zzz_proCodigoNcm'] = pegar_texto('zzz_proCodigoNcm', 8, somente_digitos=True)
 
-    # --- PROCESSAMENTO NCM ---
+    # Campos Comerciais
+    df_base['proUn'] = pegar_texto('proUn', 2, valor_padrao='UN')
+    df_base['proCusto'] = pegar_moeda('zzz_proCusto')
+    df_base['proVenda'] = pegar_moeda('zzz_proVenda')
+    df_base['proEstoqueAtual'] = pegar_moeda('proEstoqueAtual')
+    df_base['proEstoqueMin'] = pegar_moeda('zzz_proEstoqueMin')
+    
+    # --- CST e CSOSN (Nomes Corrigidos) ---
+    df_base['proCodcst2'] = pegar_texto('proCodcst2', 3)
+    df_base['proCodCSOSN'] = pegar_texto('proCodCSOSN', 4)
+
+    df_base['proCodigoEmpresa'] = df_base['zzz_proCodigo'] 
+
+    # ID do Excel (FIXO vs AUTOMÁTICO é decidido no carregamento)
+    col_id_excel = mapa_colunas.get('proId')
+    ids_originais = df_origem[col_id_excel] if (col_id_excel and col_id_excel in df_origem.columns) else pd.Series([np.nan] * len(df_origem), index=df_origem.index)
+    df_base['proId'] = pd.to_numeric(ids_originais, errors='coerce')
+
+    return utils.compactar_tipos(df_base, CATEGORIAS_PRODUTO)
+
+# LISTA DE COLUNAS PARA INSERT NA TABELA produto_empresa
+# Agora incluindo proCodcst2 e proCodCSOSN
+COLUNAS_EMPRESA = [
+    'proId', 'proUn', 'proCusto', 'proVenda', 'proEstoqueAtual', 
+    'proEstoqueMin', 'proCodigoEmpresa', 'proCodcst2', 'proCodCSOSN'
+]
+
+# Campo do mapeamento -> coluna gravada, usados na comparação do modo delta
+CAMPOS_DELTA_PRODUTO = {'proDescricao': 'proDescricao', 'zzz_proCodigo': 'zzz_proCodigo', 'zzz_proCodigoNcm': 'proncmid'}
+CAMPOS_DELTA_EMPRESA = {
+    'proUn': 'proUn', 'zzz_proCusto': 'proCusto', 'zzz_proVenda': 'proVenda',
+    'proEstoqueAtual': 'proEstoqueAtual', 'zzz_proEstoqueMin': 'proEstoqueMin',
+    'zzz_proCodigo': 'proCodigo', 'proCodcst2': 'proCodcst2', 'proCodCSOSN': 'proCodCSOSN'
+}
+
+def _vincular_ncm(df_base):
     # Sincroniza com a tabela 'proncm' e pega os IDs
     mapa_ncm_ids = sincronizar_ncms(df_base)
     
     # Cria a coluna de ID (FK) mapeando o código. Se não achar, fica 0.
     df_base['proncmid'] = df_base['zzz_proCodigoNcm'].map(mapa_ncm_ids).fillna(0).astype(int)
 
-    # Campos Comerciais
-    df_base['proUn'] = pegar_valor('proUn', lambda x: utils.tratar_string(x, 2), valor_padrao='UN')
-    df_base['proCusto'] = pegar_valor('zzz_proCusto', utils.tratar_moeda, valor_padrao=0)
-    df_base['proVenda'] = pegar_valor('zzz_proVenda', utils.tratar_moeda, valor_padrao=0)
-    df_base['proEstoqueAtual'] = pegar_valor('proEstoqueAtual', utils.tratar_moeda, valor_padrao=0)
-    df_base['proEstoqueMin'] = pegar_valor('zzz_proEstoqueMin', utils.tratar_moeda, valor_padrao=0)
-    
-    # --- CST e CSOSN (Nomes Corrigidos) ---
-    df_base['proCodcst2'] = pegar_valor('proCodcst2', lambda x: utils.tratar_string(x, 3), valor_padrao='')
-    df_base['proCodCSOSN'] = pegar_valor('proCodCSOSN', lambda x: utils.tratar_string(x, 4), valor_padrao='')
+def _montar_empresa(df):
+    df_emp = df[COLUNAS_EMPRESA].rename(columns={'proCodigoEmpresa': 'proCodigo'})
+    df_emp['empId'] = 1
+    return df_emp
 
-    df_base['proCodigoEmpresa'] = df_base['zzz_proCodigo'] 
+def carregar_lote(df_base, progresso=None):
+    """
+    Sincroniza os NCMs do lote e insere em 'produto' e 'produto_empresa'.
+    As inserções do lote vão numa única transação: ou o lote entra inteiro, ou nada entra.
+    """
+    # --- PROCESSAMENTO NCM ---
+    if progresso: progresso('ncm')
+    with perfil.etapa('ncm', linhas=len(df_base)):
+        _vincular_ncm(df_base)
+    if progresso: progresso('insercao')
 
-    # 3. SEPARAÇÃO (FIXO vs AUTOMÁTICO)
-    col_id_excel = mapa_colunas.get('proId')
-    ids_originais = df_origem[col_id_excel] if (col_id_excel and col_id_excel in df_origem.columns) else pd.Series([np.nan] * len(df_origem))
-    ids_numericos = pd.to_numeric(ids_originais, errors='coerce')
-    mask_numerico = ids_numericos.notnull()
+    # SEPARAÇÃO (FIXO vs AUTOMÁTICO)
+    mask_numerico = df_base['proId'].notnull()
     
-    # LISTA DE COLUNAS PARA INSERT NA TABELA produto_empresa
-    # Agora incluindo proCodcst2 e proCodCSOSN
-    cols_empresa = [
-        'proId', 'proUn', 'proCusto', 'proVenda', 'proEstoqueAtual', 
-        'proEstoqueMin', 'proCodigoEmpresa', 'proCodcst2', 'proCodCSOSN'
-    ]
+    # Uma linha da planilha = uma linha em produto_empresa: é ela que avança a barra dentro do lote
+    somar = progresso.somar if progresso else None
+    with db.get_engine().begin() as conn:
+        _inserir_fixos(df_base[mask_numerico].copy(), conn, somar)
+        _inserir_automaticos(df_base[~mask_numerico].drop(columns=['proId']), conn, somar)
+
+def carregar_lote_delta(df_base, mapa_colunas, progresso=None):
+    """
+    Modo incremental: produtos já cadastrados (pelo proId ou, sem ID, pela referência)
+    só são gravados se algum campo mapeado mudou, via MERGE em 'produto' e 'produto_empresa'.
+    Campos não mapeados não são sobrescritos. Produtos novos seguem o caminho normal.
+    """
+    if progresso: progresso('ncm')
+    with perfil.etapa('ncm', linhas=len(df_base)):
+        _vincular_ncm(df_base)
+    if progresso: progresso('insercao')
+    cols_produto = [col for campo, col in CAMPOS_DELTA_PRODUTO.items() if campo in mapa_colunas]
+    cols_empresa = [col for campo, col in CAMPOS_DELTA_EMPRESA.items() if campo in mapa_colunas]
 
+    with db.get_engine().begin() as conn:
+        # Sem ID no Excel: procura o produto existente pela referência
+        sem_id = df_base['proId'].isna() & (df_base['zzz_proCodigo'] != '')
+        if sem_id.any():
+            existentes = db.ler_por_chaves('produto', ['proId'], ['zzz_proCodigo'], df_base[sem_id], conn=conn)
+            ids_por_codigo = existentes.groupby(existentes['zzz_proCodigo'].astype(str).str.strip())['proId'].min()
+            df_base.loc[sem_id, 'proId'] = df_base.loc[sem_id, 'zzz_proCodigo'].map(ids_por_codigo)
+
+        mask_id = df_base['proId'].notnull()
+        df_com_id = df_base[mask_id].astype({'proId': int})
+        if not df_com_id.empty:
+            df_prod = df_com_id[['proId', 'proDescricao', 'zzz_proCodigo', 'proncmid']]
+            atuais = db.ler_por_chaves('produto', cols_produto, ['proId'], df_prod, conn=conn)
+            alterados = utils.filtrar_alterados(df_prod, atuais, ['proId'], cols_produto)
+            print(f"Delta: {len(alterados)} de {len(df_prod)} produtos novos ou alterados.")
+            db.mesclar_bulk(alterados, 'produto', ['proId'], colunas_update=cols_produto, manter_id=True, conn=conn)
+
+            df_emp = _montar_empresa(df_com_id)
+            atuais = db.ler_por_chaves('produto_empresa', cols_empresa, ['proId', 'empId'], df_emp, conn=conn)
+            alterados = utils.filtrar_alterados(df_emp, atuais, ['proId', 'empId'], cols_empresa)
+            db.mesclar_bulk(alterados, 'produto_empresa', ['proId', 'empId'], colunas_update=cols_empresa, conn=conn)
+
+        # Não encontrados no banco: inserção com ID gerado, igual ao modo normal
+        _inserir_automaticos(df_base[~mask_id].drop(columns=['proId']), conn, progresso.somar if progresso else None)
+
+def _inserir_fixos(df_fixo, conn, progresso=None):
     # --- GRUPO 1: IDs FIXOS ---
-    df_fixo = df_base[mask_numerico].copy()
     if not df_fixo.empty:
-        df_fixo['proId'] = ids_numericos[mask_numerico].astype(int)
+        df_fixo['proId'] = df_fixo['proId'].astype(int)
         
         # Ajuste: Inserimos 'proncmid'
         df_prod_fixo = df_fixo[['proId', 'proDescricao', 'zzz_proCodigo', 'proncmid']].copy()
         
         print(f"Inserindo {len(df_prod_fixo)} produtos FIXOS...")
-        db.inserir_bulk(df_prod_fixo, 'produto', manter_id=True)
+        db.inserir_bulk(df_prod_fixo, 'produto', manter_id=True, conn=conn)
         
         # Dados Comerciais
-        df_emp_fixo = df_fixo[cols_empresa].copy()
-        df_emp_fixo.rename(columns={'proCodigoEmpresa': 'proCodigo'}, inplace=True)
-        df_emp_fixo['empId'] = 1 
-        db.inserir_bulk(df_emp_fixo, 'produto_empresa', manter_id=False)
+        df_emp_fixo = _montar_empresa(df_fixo)
+        db.inserir_bulk(df_emp_fixo, 'produto_empresa', manter_id=False, conn=conn, progresso=progresso)
 
+def _inserir_automaticos(df_auto, conn, progresso=None):
     # --- GRUPO 2: IDs AUTOMÁTICOS ---
-    df_auto = df_base[~mask_numerico].copy()
     if not df_auto.empty:
-        df_auto['zzz_proCodigo'] = df_auto['zzz_proCodigo'].replace('', 'AUTO_' + df_auto.index.astype(str))
+        # Referência vazia vira AUTO_<linha da planilha>
+        refs_auto = pd.Series('AUTO_' + df_auto.index.astype(str), index=df_auto.index)
+        df_auto['zzz_proCodigo'] = df_auto['zzz_proCodigo'].mask(df_auto['zzz_proCodigo'] == '', refs_auto)
         
         # Ajuste: Inserimos 'proncmid'
         df_prod_auto = df_auto[['proDescricao', 'zzz_proCodigo', 'proncmid']].copy()
         
         print(f"Inserindo {len(df_prod_auto)} produtos AUTOMÁTICOS...")
-        db.inserir_bulk(df_prod_auto, 'produto', manter_id=False)
-        
-        print("Sincronizando IDs gerados...")
-        lista_refs = tuple(df_auto['zzz_proCodigo'].unique())
-        if len(lista_refs) > 0:
-            query = f"SELECT zzz_proCodigo, proId FROM produto WHERE zzz_proCodigo IN {lista_refs}"
+        # O proId gerado volta direto do INSERT (OUTPUT INSERTED), linha a linha
+        df_auto['proId'] = db.inserir_capturando_ids(df_prod_auto, 'produto', 'proId', conn=conn)
+        df_auto = df_auto[df_auto['proId'].notnull()].astype({'proId': int})
+
+        df_emp_auto = _montar_empresa(df_auto)
+        db.inserir_bulk(df_emp_auto, 'produto_empresa', manter_id=False, conn=conn, progresso=progresso)
+
+def executar_importacao(caminho_excel, mapa_colunas, limpar_base=False, retomar=False, modo_delta=False, aba=0, progresso=None):
+    # Mede cada etapa (leitura, tratamento, carga...) e grava o relatório de desempenho
+    with perfil.execucao('produtos', caminho_excel):
+        print("--- Iniciando Importação (Produto + Empresa + Fiscal) ---")
+        if modo_delta and limpar_base:
+            print("Modo delta: a limpeza da base foi ignorada.")
+            limpar_base = False
+
+        # Ponto de retomada: cada lote gravado fica registrado no jornal local
+        registro = jornal.JornalImportacao(caminho_excel, 'produtos', mapa_colunas, aba=aba, tabela='produto')
+        if retomar and registro.ultima_linha() and limpar_base:
+            print("Retomando importação: a limpeza da base foi ignorada para não apagar o que já foi gravado.")
+            limpar_base = False
+
+        # 1. LIMPEZA
+        if limpar_base:
+            print("Limpando tabelas...")
             try:
-                df_ids_gerados = pd.read_sql(query, db.get_engine())
-                df_auto_final = pd.merge(df_auto, df_ids_gerados, on='zzz_proCodigo', how='inner')
-                
-                df_emp_auto = df_auto_final[cols_empresa].copy()
-                df_emp_auto.rename(columns={'proCodigoEmpresa': 'proCodigo'}, inplace=True)
-                df_emp_auto['empId'] = 1
-                
-                db.inserir_bulk(df_emp_auto, 'produto_empresa', manter_id=False)
+                db.limpar_tabela('prolote', reset_identity=True)
+                db.executar_comando("DELETE FROM produto_empresa")
+                db.executar_comando("DELETE FROM produto WHERE proId > 1") 
+                db.executar_comando("DBCC CHECKIDENT ('produto', RESEED, 1)")
+                db.limpar_tabela('produtoUn', reset_identity=True)
             except Exception as e:
-                print(f"Erro ao sincronizar IDs automáticos: {e}")
-
-    # 4. AUXILIARES
-    print("Processando Unidades...")
-    sql_unidades = """
-    INSERT INTO produtoUn (unpUn, unpDescricao)
-    SELECT DISTINCT proUn, proUn FROM produto_empresa 
-    WHERE proUn IS NOT NULL AND proUn <> '' 
-    AND proUn NOT IN (SELECT unpUn FROM produtoUn)
-    """
-    db.executar_comando(sql_unidades)
+                print(f"Erro limpeza: {e}")
+
+        # 2. LEITURA EM LOTES -> PREPARAÇÃO, EM PARALELO COM NCM + INSERÇÃO
+        medidor = prog.criar_medidor(progresso, leitura.contar_linhas(caminho_excel, aba))
+        if modo_delta:
+            carregar = lambda df_base: carregar_lote_delta(df_base, mapa_colunas, medidor)
+        else:
+            carregar = lambda df_base: carregar_lote(df_base, medidor)
+
+        # Tratamento das colunas dividido em processos (config.PROCESSOS_TRANSFORMACAO)
+        with pipeline.TransformacaoParalela(functools.partial(transformar_lote, mapa_colunas=mapa_colunas)) as transformar:
+            pipeline.executar_em_pipeline(
+                perfil.medir_lotes(leitura.ler_planilha_em_lotes(caminho_excel, aba)),
+                perfil.medir('tratamento', transformar, cprofile=True),
+                perfil.medir('carga', carregar),
+                jornal=registro,
+                retomar=retomar,
+                progresso=medidor
+            )
+
+        # 3. AUXILIARES
+        print("Processando Unidades...")
+        sql_unidades = """
+        INSERT INTO produtoUn (unpUn, unpDescricao)
+        SELECT DISTINCT proUn, proUn FROM produto_empresa 
+        WHERE proUn IS NOT NULL AND proUn <> '' 
+        AND proUn NOT IN (SELECT unpUn FROM produtoUn)
+        """
+        db.executar_comando(sql_unidades)
+        registro.concluir()
 
-    print("--- Fim Importação ---")
\ No newline at end of file
+        print("--- Fim Importação ---")
@@ -0,0 +1,125 @@
+# importacao_multipla.py
+"""
+Importa uma pasta de trabalho inteira (várias abas) numa única execução.
+
+1. Leitura: cada aba é lida num processo separado (todos os núcleos) e vai para o cache Parquet.
+2. Carga: as abas são importadas na ordem das dependências, lendo do cache:
+   clientes/fornecedores -> produtos (NCMs sincronizados antes de cada lote) -> financeiro.
+
+Exemplo:
+    python importacao_multipla.py migracao.xlsx --aba Clientes=clientes --aba Produtos=produtos \\
+        --aba Receber=financeiro --mapa Produtos=mapa_produtos.json --mapa Clientes=mapa_clientes.json
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cache_planilha
+import config
+import database as db
+import import_clientes
+import import_financeiro
+import import_produtos
+import leitura
+import mapeamento
+
+# Financeiro depende dos clientes; produto_empresa depende do produto e do NCM
+ORDEM_CARGA = ['clientes', 'fornecedores', 'produtos', 'financeiro']
+
+def _ler_aba(caminho_excel, aba):
+    """Executado no processo filho: lê a aba inteira (gravando no cache) e devolve as linhas lidas"""
+    linhas = 0
+    for lote in leitura.ler_planilha_em_lotes(caminho_excel, aba):
+        linhas += len(lote)
+    return linhas
+
+def ler_abas_em_paralelo(caminho_excel, abas, processos=None):
+    """
+    Lê as abas em processos paralelos, deixando cada uma no cache local.
+    Sem cache (pyarrow ausente ou CACHE_ATIVO desligado) não há o que aproveitar, então não faz nada.
+    """
+    if not cache_planilha.disponivel():
+        print("AVISO: Cache de planilhas indisponível; as abas serão lidas durante a carga.")
+        return
+    processos = min(len(abas), processos or config.PROCESSOS_LEITURA or os.cpu_count() or 1)
+
+    print(f"Lendo {len(abas)} abas em {processos} processos...")
+    inicio = time.perf_counter()
+    # spawn também no Linux, como no pipeline: fork copiaria as threads e conexões abertas
+    with ProcessPoolExecutor(max_workers=processos, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futuros = {executor.submit(_ler_aba, caminho_excel, aba): aba for aba in abas}
+        for futuro in as_completed(futuros):
+            aba = futuros[futuro]
+            try:
+                print(f"Aba '{aba}': {futuro.result()} linhas lidas.")
+            except Exception as e:
+                # A carga dessa aba lê direto do Excel; se o erro for do arquivo, ele aparece lá
+                print(f"AVISO: Falha ao ler a aba '{aba}' em paralelo: {e}")
+    print(f"Leitura concluída em {time.perf_counter() - inicio:.1f}s")
+
+def _importar_aba(caminho_excel, aba, tipo, mapa_colunas, limpar_base, retomar, modo_delta, progresso):
+    if tipo == 'produtos':
+        import_produtos.executar_importacao(caminho_excel, mapa_colunas, limpar_base=limpar_base,
+                                            retomar=retomar, modo_delta=modo_delta, aba=aba, progresso=progresso)
+    elif tipo in ('clientes', 'fornecedores'):
+        import_clientes.executar_importacao(caminho_excel, mapa_colunas=mapa_colunas,
+                                            is_fornecedor=(tipo == 'fornecedores'), limpar_base=limpar_base,
+                                            retomar=retomar, modo_delta=modo_delta, aba=aba, progresso=progresso)
+    elif tipo == 'financeiro':
+        import_financeiro.executar_importacao(caminho_excel, limpar_base=limpar_base, retomar=retomar, aba=aba, progresso=progresso)
+
+def executar_importacao(caminho_excel, atribuicoes, mapas=None, limpar_base=False, retomar=False, modo_delta=False, progresso=None):
+    """
+    atribuicoes: { aba (nome ou posição): tipo de importação ('produtos', 'clientes', 'fornecedores', 'financeiro') }
+    mapas: { aba: mapa_colunas } para as abas de produtos/clientes
+    A limpeza (se pedida) vale só para a primeira aba de cada tipo.
+    progresso: callback de progresso (progresso.InfoProgresso), chamado para cada aba.
+    """
+    mapas = mapas or {}
+    invalidos = {aba: tipo for aba, tipo in atribuicoes.items() if tipo not in ORDEM_CARGA}
+    if invalidos:
+        raise ValueError(f"Tipo de importação inválido: {invalidos}")
+
+    print(f"--- Importação de {len(atribuicoes)} abas: {os.path.basename(caminho_excel)} ---")
+    ler_abas_em_paralelo(caminho_excel, list(atribuicoes))
+
+    for tipo in ORDEM_CARGA:
+        abas = [aba for aba, t in atribuicoes.items() if t == tipo]
+        if not abas:
+            continue
+        with db.constraints_desativadas(db.TABELAS_POR_IMPORTACAO[tipo], incluir_dependentes=limpar_base):
+            for i, aba in enumerate(abas):
+                print(f"\n>>> Aba '{aba}' -> {tipo.upper()}")
+                _importar_aba(caminho_excel, aba, tipo, mapas.get(aba), limpar_base and i == 0, retomar, modo_delta, progresso)
+
+    print("--- Fim da Importação de Várias Abas ---")
+
+def _par(texto):
+    aba, sep, valor = texto.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Use ABA=VALOR (recebido: {texto})")
+    # Abas podem ser indicadas pela posição (0, 1, ...)
+    return (int(aba) if aba.isdigit() else aba), valor
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa várias abas de uma planilha numa única execução")
+    parser.add_argument('arquivo')
+    parser.add_argument('--aba', type=_par, action='append', required=True, metavar='ABA=TIPO',
+                        help=f"Tipo de cada aba: {', '.join(ORDEM_CARGA)}")
+    parser.add_argument('--mapa', type=_par, action='append', default=[], metavar='ABA=ARQUIVO.json',
+                        help="Mapeamento de colunas (JSON) das abas de produtos/clientes")
+    parser.add_argument('--limpar', action='store_true')
+    parser.add_argument('--retomar', action='store_true')
+    parser.add_argument('--delta', action='store_true')
+    args = parser.parse_args()
+
+    mapas = {aba: mapeamento.carregar_mapa(arquivo) for aba, arquivo in args.mapa}
+
+    executar_importacao(args.arquivo, dict(args.aba), mapas,
+                        limpar_base=args.limpar, retomar=args.retomar, modo_delta=args.delta)
+
+# O __main__ é obrigatório no Windows: os processos de leitura reimportam este módulo
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# jornal.py
+import datetime
+import hashlib
+import json
+import os
+import threading
+
+import config
+
+# O jornal é gravado pela thread de carga do pipeline
+_lock = threading.Lock()
+
+def _ler():
+    if not os.path.exists(config.ARQUIVO_JORNAL):
+        return {}
+    try:
+        with open(config.ARQUIVO_JORNAL, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print("AVISO: Jornal de importação ilegível, começando do zero.")
+        return {}
+
+def _gravar(dados):
+    os.makedirs(os.path.dirname(config.ARQUIVO_JORNAL), exist_ok=True)
+    temporario = config.ARQUIVO_JORNAL + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, ensure_ascii=False, indent=2)
+    # Troca atômica: uma queda no meio não corrompe o jornal
+    os.replace(temporario, config.ARQUIVO_JORNAL)
+
+class JornalImportacao:
+    """
+    Registra até qual linha da planilha uma importação já foi gravada (commit) no banco.
+    A chave junta o arquivo (caminho, tamanho e data de modificação), o tipo, a aba e o mapeamento:
+    rodar de novo o mesmo arquivo com o mesmo mapeamento continua de onde parou.
+    Sem hash do conteúdo (fica para o cache): a tela consulta o jornal antes de importar e
+    ler uma planilha de vários GB ali travaria a interface.
+    """
+    def __init__(self, caminho, tipo, mapa_colunas=None, aba=0, tabela=None):
+        self.caminho = os.path.abspath(caminho)
+        self.tipo = tipo
+        self.tabela = tabela
+        st = os.stat(self.caminho)
+        mapa = json.dumps(mapa_colunas or {}, sort_keys=True, default=str)
+        base = f"{self.caminho}|{st.st_size}|{st.st_mtime_ns}|{tipo}|{aba}|{mapa}"
+        self.chave = hashlib.sha1(base.encode('utf-8')).hexdigest()
+
+    def ultima_linha(self):
+        """Quantidade de linhas da planilha já confirmadas no banco (0 se nada)"""
+        with _lock:
+            return _ler().get(self.chave, {}).get('ultima_linha', 0)
+
+    def registrar(self, ultima_linha):
+        with _lock:
+            dados = _ler()
+            dados[self.chave] = {
+                'arquivo': self.caminho,
+                'tipo': self.tipo,
+                'tabela': self.tabela,
+                'ultima_linha': int(ultima_linha),
+                'atualizado': datetime.datetime.now().isoformat(timespec='seconds'),
+            }
+            _gravar(dados)
+
+    def concluir(self):
+        """Importação terminou: o ponto de retomada não é mais necessário"""
+        with _lock:
+            dados = _ler()
+            if dados.pop(self.chave, None) is not None:
+                _gravar(dados)
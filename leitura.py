@@ -0,0 +1,326 @@
+# leitura.py
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+import cache_planilha
+import config
+import utils
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:  # Sem pyarrow: CSV pelo leitor do pandas e Parquet indisponível
+    pa = None
+    pa_csv = None
+    pq = None
+
+EXTENSOES_CSV = ('.csv', '.txt')
+EXTENSOES_PARQUET = ('.parquet',)
+# Filtro dos diálogos de arquivo
+TIPOS_ARQUIVO = [
+    ("Planilhas e Exportações", "*.xlsx *.xls *.csv *.txt *.parquet"),
+    ("Arquivos Excel", "*.xlsx *.xls"),
+    ("CSV", "*.csv *.txt"),
+    ("Parquet", "*.parquet"),
+    ("Todos os arquivos", "*.*"),
+]
+
+def _formato(caminho):
+    extensao = os.path.splitext(str(caminho))[1].lower()
+    if extensao in EXTENSOES_CSV:
+        return 'csv'
+    if extensao in EXTENSOES_PARQUET:
+        return 'parquet'
+    return 'xls' if extensao == '.xls' else 'xlsx'
+
+def _nomes_colunas(cabecalho):
+    """Gera os nomes das colunas igual ao pandas (Unnamed: N e sufixo .1, .2 nas repetidas)"""
+    nomes = []
+    vistos = {}
+    for i, valor in enumerate(cabecalho):
+        nome = f"Unnamed: {i}" if valor is None or valor == '' else valor
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+def _valor_texto(valor):
+    """Converte a célula para texto, como o pd.read_excel(dtype=str) faria"""
+    if valor is None or valor == '':
+        return np.nan
+    # O Excel guarda números inteiros como float (ex: 123.0 -> '123')
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor)
+
+def _texto_serie(serie):
+    """Versão por coluna do _valor_texto (para dados que já vêm tipados, como o Parquet)"""
+    if serie.dtype == object or pd.api.types.is_string_dtype(serie):
+        return serie.astype(object).where(serie.notna(), np.nan)
+    return serie.astype(object).map(_valor_texto).where(serie.notna(), np.nan)
+
+def _montar_lote(linhas, colunas, inicio):
+    # Índice contínuo entre lotes: a linha 0 do 2º lote continua a numeração do 1º
+    indice = pd.RangeIndex(inicio, inicio + len(linhas))
+    return utils.compactar_texto(pd.DataFrame(linhas, columns=colunas, index=indice, dtype=object))
+
+def ler_planilha_em_lotes(caminho_excel, aba=0, tamanho_lote=None):
+    """
+    Lê a planilha em lotes de 'tamanho_lote' linhas, tudo como texto.
+    Usa o modo read-only do openpyxl, então a memória fica limitada a um lote por vez.
+    Arquivos .xls (ou LEITURA_STREAMING desligado) caem no pd.read_excel tradicional.
+    Se a mesma planilha já foi lida antes, os lotes vêm do cache local (Parquet).
+    """
+    tamanho_lote = tamanho_lote or config.TAMANHO_LOTE
+
+    # CSV e Parquet já são rápidos de ler: vão direto, sem passar pelo cache
+    formato = _formato(caminho_excel)
+    if formato == 'csv':
+        yield from _ler_csv_em_lotes(caminho_excel, tamanho_lote)
+        return
+    if formato == 'parquet':
+        yield from _ler_parquet_em_lotes(caminho_excel, tamanho_lote)
+        return
+
+    if not cache_planilha.disponivel():
+        yield from _ler_excel_em_lotes(caminho_excel, aba, tamanho_lote)
+        return
+
+    lotes_cache = cache_planilha.ler_lotes(caminho_excel, aba, tamanho_lote)
+    if lotes_cache is not None:
+        print("Planilha carregada do cache local.")
+        yield from lotes_cache
+        return
+
+    # Primeira leitura: grava no cache enquanto entrega os lotes
+    gravador = cache_planilha.GravadorCache(caminho_excel, aba)
+    concluido = False
+    try:
+        for lote in _ler_excel_em_lotes(caminho_excel, aba, tamanho_lote):
+            gravador.adicionar(lote)
+            yield lote
+        gravador.concluir()
+        concluido = True
+    finally:
+        # Leitura interrompida (erro ou importação cancelada): não deixa cache pela metade
+        if not concluido:
+            gravador.descartar()
+
+def _ler_excel_em_lotes(caminho_excel, aba, tamanho_lote):
+    if not config.LEITURA_STREAMING or str(caminho_excel).lower().endswith('.xls'):
+        df = utils.compactar_texto(pd.read_excel(caminho_excel, sheet_name=aba, dtype=str))
+        for inicio in range(0, len(df), tamanho_lote):
+            yield df.iloc[inicio:inicio + tamanho_lote]
+        return
+
+    wb = load_workbook(caminho_excel, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[aba] if isinstance(aba, int) else wb[aba]
+        linhas = ws.iter_rows(values_only=True)
+
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        colunas = _nomes_colunas(cabecalho)
+        qtd_colunas = len(colunas)
+
+        buffer = []
+        inicio = 0
+        vazias_pendentes = 0
+        for linha in linhas:
+            linha = linha[:qtd_colunas]
+            # Linhas vazias no fim da aba são descartadas (mesmo comportamento do pandas);
+            # as do meio só entram quando aparece uma linha com dados depois delas.
+            if all(v is None or v == '' for v in linha):
+                vazias_pendentes += 1
+                continue
+
+            for _ in range(vazias_pendentes):
+                buffer.append([np.nan] * qtd_colunas)
+            vazias_pendentes = 0
+
+            valores = [_valor_texto(v) for v in linha]
+            if len(valores) < qtd_colunas:
+                valores += [np.nan] * (qtd_colunas - len(valores))
+            buffer.append(valores)
+
+            if len(buffer) >= tamanho_lote:
+                yield _montar_lote(buffer, colunas, inicio)
+                inicio += len(buffer)
+                buffer = []
+
+        if buffer:
+            yield _montar_lote(buffer, colunas, inicio)
+    finally:
+        wb.close()
+
+def detectar_csv(caminho):
+    """
+    Descobre a codificação (UTF-8 ou Latin-1/Windows-1252) e o separador do CSV
+    olhando só o começo do arquivo. Retorna (encoding, separador).
+    """
+    with open(caminho, 'rb') as f:
+        inicio = f.read(64 * 1024)
+    # Corta no último fim de linha para não quebrar um caractere UTF-8 no meio
+    if b'\n' in inicio:
+        inicio = inicio[:inicio.rfind(b'\n')]
+
+    for encoding in ('utf-8-sig', 'cp1252', 'latin-1'):
+        try:
+            texto = inicio.decode(encoding)
+            break
+        except UnicodeDecodeError:
+            continue
+
+    try:
+        separador = csv.Sniffer().sniff(texto, delimiters=';,\t|').delimiter
+    except csv.Error:
+        # Sem padrão claro: o mais frequente na linha de cabeçalho (';' é o padrão do Excel brasileiro)
+        cabecalho = texto.splitlines()[0] if texto else ''
+        separador = max(';,\t|', key=cabecalho.count) if cabecalho else ';'
+    return encoding, separador
+
+def _cabecalho_csv(caminho, encoding, separador):
+    with open(caminho, 'r', encoding=encoding, newline='') as f:
+        return next(csv.reader(f, delimiter=separador), [])
+
+def _ler_csv_em_lotes(caminho, tamanho_lote):
+    encoding, separador = detectar_csv(caminho)
+    print(f"CSV: codificação {encoding}, separador '{separador}'")
+
+    if pa_csv is None:
+        # O índice dos chunks do read_csv já é contínuo entre lotes
+        yield from pd.read_csv(caminho, sep=separador, encoding=encoding, dtype=str, chunksize=tamanho_lote)
+        return
+
+    # pyarrow: leitura e conversão em várias threads, em blocos
+    colunas = _nomes_colunas(_cabecalho_csv(caminho, encoding, separador))
+    internas = [f"c{i}" for i in range(len(colunas))]  # Nomes únicos (o cabeçalho pode ter repetidos)
+    leitor = pa_csv.open_csv(
+        caminho,
+        read_options=pa_csv.ReadOptions(encoding=encoding, column_names=internas, skip_rows=1),
+        parse_options=pa_csv.ParseOptions(delimiter=separador),
+        convert_options=pa_csv.ConvertOptions(column_types={c: pa.string() for c in internas}, strings_can_be_null=True),
+    )
+
+    inicio = 0
+    pendentes = []
+    qtd_pendentes = 0
+    def montar(tabela):
+        df = cache_planilha.tabela_para_texto(tabela)
+        df.columns = colunas
+        df.index = pd.RangeIndex(inicio, inicio + len(df))
+        return df
+
+    for batch in leitor:
+        pendentes.append(batch)
+        qtd_pendentes += batch.num_rows
+        while qtd_pendentes >= tamanho_lote:
+            tabela = pa.Table.from_batches(pendentes)
+            yield montar(tabela.slice(0, tamanho_lote))
+            inicio += tamanho_lote
+            resto = tabela.slice(tamanho_lote)
+            pendentes = resto.to_batches()
+            qtd_pendentes = resto.num_rows
+    if qtd_pendentes:
+        yield montar(pa.Table.from_batches(pendentes))
+
+def _ler_parquet_em_lotes(caminho, tamanho_lote):
+    if pq is None:
+        raise ImportError("Leitura de Parquet exige o pacote pyarrow.")
+    inicio = 0
+    for batch in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_lote):
+        df = batch.to_pandas()
+        # Tudo como texto, igual à leitura do Excel
+        df = pd.DataFrame({c: _texto_serie(df[c]) for c in df.columns})
+        # Índice = linha no arquivo (depois de montar: o batch do pyarrow sempre começa em 0)
+        df.index = pd.RangeIndex(inicio, inicio + len(df))
+        df = utils.compactar_texto(df)
+        inicio += len(df)
+        yield df
+
+def contar_linhas(caminho_excel, aba=0):
+    """
+    Total aproximado de linhas de dados (sem o cabeçalho), para a barra de progresso.
+    Vem do cache ou da dimensão gravada no .xlsx, sem ler a aba; None se não der para saber.
+    """
+    formato = _formato(caminho_excel)
+    if formato == 'parquet' and pq is not None:
+        return pq.ParquetFile(caminho_excel).metadata.num_rows
+    if formato == 'csv':
+        return None
+
+    if cache_planilha.disponivel():
+        total = cache_planilha.contar_linhas(caminho_excel, aba)
+        if total is not None:
+            return total
+    if str(caminho_excel).lower().endswith('.xls'):
+        return None
+
+    wb = load_workbook(caminho_excel, read_only=True)
+    try:
+        ws = wb.worksheets[aba] if isinstance(aba, int) else wb[aba]
+        return max(ws.max_row - 1, 0) if ws.max_row else None
+    finally:
+        wb.close()
+
+def listar_abas(caminho_excel):
+    """Nomes das abas da pasta de trabalho, na ordem do arquivo"""
+    if _formato(caminho_excel) in ('csv', 'parquet'):
+        return [0]  # Uma "aba" só
+    if str(caminho_excel).lower().endswith('.xls'):
+        with pd.ExcelFile(caminho_excel) as xls:
+            return list(xls.sheet_names)
+    wb = load_workbook(caminho_excel, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+def ler_cabecalho(caminho_excel, aba=0, linhas_amostra=0):
+    """
+    Lê só o cabeçalho e, se pedido, as primeiras 'linhas_amostra' linhas (como texto).
+    No .xlsx para de ler a aba logo depois delas, então o tempo não cresce com o arquivo.
+    Retorna (colunas, df_amostra).
+    """
+    formato = _formato(caminho_excel)
+    if formato == 'csv':
+        encoding, separador = detectar_csv(caminho_excel)
+        df = pd.read_csv(caminho_excel, sep=separador, encoding=encoding, dtype=str, nrows=linhas_amostra)
+        return list(df.columns), df
+    if formato == 'parquet':
+        lote = next(_ler_parquet_em_lotes(caminho_excel, max(linhas_amostra, 1)), None)
+        if lote is None:
+            colunas = pq.ParquetFile(caminho_excel).schema_arrow.names
+            return colunas, pd.DataFrame(columns=colunas)
+        return list(lote.columns), lote.iloc[:linhas_amostra]
+    if str(caminho_excel).lower().endswith('.xls'):
+        df = pd.read_excel(caminho_excel, sheet_name=aba, dtype=str, nrows=linhas_amostra)
+        return list(df.columns), df
+
+    wb = load_workbook(caminho_excel, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[aba] if isinstance(aba, int) else wb[aba]
+        linhas = ws.iter_rows(values_only=True, max_row=1 + linhas_amostra)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return [], pd.DataFrame()
+        colunas = _nomes_colunas(cabecalho)
+        qtd_colunas = len(colunas)
+
+        amostra = []
+        for linha in linhas:
+            valores = [_valor_texto(v) for v in linha[:qtd_colunas]]
+            valores += [np.nan] * (qtd_colunas - len(valores))
+            amostra.append(valores)
+        return colunas, _montar_lote(amostra, colunas, 0)
+    finally:
+        wb.close()
@@ -9,6 +9,9 @@ import database as db
 import import_produtos
 import import_clientes
 import import_financeiro
+import leitura
+import mapeamento
+import perfil
 
 def selecionar_arquivo_gui():
     """Abre a janela nativa do Windows para escolher o arquivo"""
@@ -21,13 +24,27 @@ def selecionar_arquivo_gui():
 
     caminho = filedialog.askopenfilename(
         title="Selecione a Planilha de Importação (MaxData)",
+        filetypes=leitura.TIPOS_ARQUIVO
+    )
+    
+    root.destroy() # Destrói a instância do Tkinter após o uso
+    return caminho
+
+def selecionar_mapa_gui():
+    """Escolhe o mapeamento salvo pela tela de mapeamento (botão Exportar)"""
+    root = tk.Tk()
+    root.withdraw()
+    root.attributes('-topmost', True)
+
+    caminho = filedialog.askopenfilename(
+        title="Selecione o Mapeamento de Colunas (JSON)",
         filetypes=[
-            ("Arquivos Excel", "*.xlsx *.xls"),
+            ("Mapeamento (JSON)", "*.json"),
             ("Todos os arquivos", "*.*")
         ]
     )
-    
-    root.destroy() # Destrói a instância do Tkinter após o uso
+
+    root.destroy()
     return caminho
 
 def menu():
@@ -71,38 +88,57 @@ def main():
                 config.ARQUIVO_SELECIONADO = novo_arquivo
             continue # Volta para o menu com o novo arquivo
 
-        # Preparação global de segurança
+        tipos = {'1': 'produtos', '2': 'clientes', '3': 'fornecedores', '4': 'financeiro'}
+        if opcao not in tipos:
+            print("Opção inválida!")
+            continue
+
+        # Usa sempre a variável config.ARQUIVO_SELECIONADO que veio da GUI
+        arquivo_atual = config.ARQUIVO_SELECIONADO
+
+        # Produtos e Clientes dependem do mapeamento de colunas
+        mapa = None
+        if opcao in ('1', '2'):
+            print("Selecione o mapeamento de colunas salvo (JSON)...")
+            caminho_mapa = selecionar_mapa_gui()
+            if not caminho_mapa:
+                print("Nenhum mapeamento selecionado. Importação cancelada.")
+                continue
+            try:
+                mapa = mapeamento.carregar_mapa(caminho_mapa)
+            except Exception as e:
+                print(f"Erro ao ler o mapeamento: {e}")
+                continue
+
+        limpar = False
+        if opcao == '1':
+            limpar = input("Deseja limpar a base de PRODUTOS antes? (s/n): ").lower() == 's'
+        elif opcao == '2':
+            limpar = input("Deseja limpar a base de CLIENTES antes? (s/n): ").lower() == 's'
+        elif opcao == '4':
+            print("--- ATENÇÃO ---")
+            limpar = input("Tem certeza que deseja limpar a tabela FINANCEIRO antes? (s/n): ").lower() == 's'
+
+        # Preparação de segurança: só as tabelas desta importação ficam sem FKs/gatilhos
         try:
-            db.toggle_constraints(False) 
-            
-            # Usa sempre a variável config.ARQUIVO_SELECIONADO que veio da GUI
-            arquivo_atual = config.ARQUIVO_SELECIONADO
-
-            if opcao == '1':
-                limpar = input("Deseja limpar a base de PRODUTOS antes? (s/n): ").lower() == 's'
-                import_produtos.executar_importacao(arquivo_atual, limpar_base=limpar)
-                
-            elif opcao == '2':
-                limpar = input("Deseja limpar a base de CLIENTES antes? (s/n): ").lower() == 's'
-                import_clientes.executar_importacao(arquivo_atual, is_fornecedor=False, limpar_base=limpar)
-                
-            elif opcao == '3':
-                print("Importando Fornecedores...")
-                import_clientes.executar_importacao(arquivo_atual, is_fornecedor=True, limpar_base=False)
-
-            elif opcao == '4':
-                print("--- ATENÇÃO ---")
-                limpar = input("Tem certeza que deseja limpar a tabela FINANCEIRO antes? (s/n): ").lower() == 's'
-                import_financeiro.executar_importacao(arquivo_atual, limpar_base=limpar)
-
-            else:
-                print("Opção inválida!")
+            with perfil.execucao(tipos[opcao], arquivo_atual), db.constraints_desativadas(db.TABELAS_POR_IMPORTACAO[tipos[opcao]], incluir_dependentes=limpar):
+                if opcao == '1':
+                    import_produtos.executar_importacao(arquivo_atual, mapa, limpar_base=limpar)
+                    
+                elif opcao == '2':
+                    import_clientes.executar_importacao(arquivo_atual, mapa_colunas=mapa, is_fornecedor=False, limpar_base=limpar)
+                    
+                elif opcao == '3':
+                    print("Importando Fornecedores...")
+                    import_clientes.executar_importacao(arquivo_atual, is_fornecedor=True, limpar_base=False)
+
+                elif opcao == '4':
+                    import_financeiro.executar_importacao(arquivo_atual, limpar_base=limpar)
 
         except Exception as e:
             print(f"\n❌ ERRO CRÍTICO: {e}")
             
         finally:
-            db.toggle_constraints(True)
             print("\n✅ Processo finalizado.")
 
 if __name__ == "__main__":
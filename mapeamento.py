@@ -0,0 +1,27 @@
+# mapeamento.py
+"""
+Mapeamentos de colunas salvos em JSON (exportados pela tela de mapeamento),
+para repetir a mesma importação sem interface (cli.py, importacao_multipla.py).
+
+Formato: {"tipo": "PRODUTO", "mapa": {"campo_do_banco": "coluna do Excel", ...}}
+Um JSON só com o dicionário do mapa também é aceito.
+"""
+import json
+
+def salvar_mapa(caminho, mapa, tipo=None):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'tipo': tipo, 'mapa': mapa}, f, ensure_ascii=False, indent=2)
+
+def carregar_mapa(caminho):
+    """Lê o mapa salvo; ValueError se o arquivo não tiver um mapeamento válido"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        dados = json.load(f)
+    mapa = dados.get('mapa', dados) if isinstance(dados, dict) else None
+    if not isinstance(mapa, dict) or not mapa:
+        raise ValueError(f"Arquivo de mapeamento inválido ou vazio: {caminho}")
+    return mapa
+
+def colunas_ausentes(mapa, colunas_excel):
+    """Colunas do mapa que não existem na planilha (ex: mapa salvo de outro layout)"""
+    existentes = set(colunas_excel) | {str(c) for c in colunas_excel}
+    return [coluna for coluna in mapa.values() if coluna not in existentes]
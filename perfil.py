@@ -0,0 +1,176 @@
+# perfil.py
+"""
+Instrumentação das importações: tempo, linhas, idas ao banco e pico de memória por etapa.
+Cada execução grava um relatório JSON em config.DIRETORIO_PERFIL (e, com
+config.PERFIL_CPROFILE, o cProfile da etapa de tratamento ao lado).
+
+Etapas aninhadas aparecem com o caminho completo (ex: 'carga/ncm'); o tempo da etapa
+de fora inclui o das de dentro.
+"""
+import contextlib
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import types
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import config
+
+try:
+    import resource  # Linux / macOS
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Uma importação por vez: o perfil da execução atual fica no módulo
+_ativo = None
+_lock = threading.Lock()
+# Etapas abertas em cada thread (leitura/tratamento e carga rodam em threads diferentes)
+_local = threading.local()
+
+def _memoria_pico_mb():
+    """Maior uso de memória do processo até agora (None se não houver como medir)"""
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss vem em KB no Linux e em bytes no macOS
+        return round(pico / 1024 ** (2 if sys.platform == 'darwin' else 1), 1)
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / 1024 ** 2, 1)
+    return None
+
+def _pilha():
+    if not hasattr(_local, 'pilha'):
+        _local.pilha = []
+    return _local.pilha
+
+class PerfilExecucao:
+    def __init__(self, tipo, arquivo):
+        self.tipo = tipo
+        self.arquivo = os.path.abspath(arquivo) if arquivo else None
+        self.inicio = datetime.datetime.now()
+        self.relogio = time.perf_counter()
+        self.etapas = {}
+        self.profiler = cProfile.Profile() if config.PERFIL_CPROFILE else None
+
+    def somar(self, nome, segundos=0.0, linhas=0, chamadas=0, idas_banco=0):
+        with _lock:
+            etapa = self.etapas.setdefault(nome, {'segundos': 0.0, 'chamadas': 0, 'linhas': 0, 'idas_banco': 0, 'memoria_pico_mb': None})
+            etapa['segundos'] += segundos
+            etapa['chamadas'] += chamadas
+            etapa['linhas'] += linhas
+            etapa['idas_banco'] += idas_banco
+            if chamadas:
+                etapa['memoria_pico_mb'] = _memoria_pico_mb()
+
+    def relatorio(self):
+        etapas = {}
+        with _lock:
+            for nome, dados in self.etapas.items():
+                etapa = dict(dados, segundos=round(dados['segundos'], 3))
+                if dados['linhas'] and dados['segundos'] > 0:
+                    etapa['linhas_por_segundo'] = round(dados['linhas'] / dados['segundos'], 1)
+                etapas[nome] = etapa
+        return {
+            'tipo': self.tipo,
+            'arquivo': self.arquivo,
+            'inicio': self.inicio.isoformat(timespec='seconds'),
+            'duracao_s': round(time.perf_counter() - self.relogio, 3),
+            'memoria_pico_mb': _memoria_pico_mb(),
+            'etapas': etapas,
+        }
+
+    def salvar(self):
+        os.makedirs(config.DIRETORIO_PERFIL, exist_ok=True)
+        base = os.path.join(config.DIRETORIO_PERFIL, f"{self.inicio:%Y%m%d_%H%M%S}_{self.tipo}")
+        relatorio = self.relatorio()
+        if self.profiler is not None:
+            self.profiler.dump_stats(base + '.prof')
+            with open(base + '_tratamento.txt', 'w', encoding='utf-8') as f:
+                pstats.Stats(self.profiler, stream=f).sort_stats('cumulative').print_stats(40)
+            relatorio['cprofile'] = base + '.prof'
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+        return base + '.json'
+
+@contextlib.contextmanager
+def execucao(tipo, arquivo=None):
+    """
+    Abre o perfil de uma importação e grava o relatório no fim.
+    Chamadas aninhadas (ex: app -> executar_importacao) usam o perfil já aberto.
+    """
+    global _ativo
+    if _ativo is not None or not config.PERFIL_ATIVO:
+        yield _ativo
+        return
+    _ativo = PerfilExecucao(tipo, arquivo)
+    try:
+        yield _ativo
+    finally:
+        perfil, _ativo = _ativo, None
+        try:
+            print(f"Relatório de desempenho: {perfil.salvar()}")
+        except Exception as e:
+            print(f"Aviso: não foi possível gravar o relatório de desempenho: {e}")
+
+@contextlib.contextmanager
+def etapa(nome, linhas=0):
+    """Mede o bloco como a etapa 'nome'; as linhas podem ser informadas depois em medida.linhas"""
+    medida = types.SimpleNamespace(linhas=linhas)
+    perfil = _ativo
+    if perfil is None:
+        yield medida
+        return
+    pilha = _pilha()
+    pilha.append(nome)
+    chave = '/'.join(pilha)
+    inicio = time.perf_counter()
+    try:
+        yield medida
+    finally:
+        pilha.pop()
+        perfil.somar(chave, time.perf_counter() - inicio, medida.linhas, chamadas=1)
+
+_FIM = object()
+
+def medir_lotes(lotes):
+    """Repassa os lotes medindo o tempo gasto para ler cada um (etapa 'leitura')"""
+    iterador = iter(lotes)
+    while True:
+        with etapa('leitura') as medida:
+            lote = next(iterador, _FIM)
+            if lote is not _FIM:
+                medida.linhas = len(lote)
+        if lote is _FIM:
+            return
+        yield lote
+
+def medir(nome, funcao, cprofile=False):
+    """Embrulha a função de um lote (tratamento/carga) medindo tempo e linhas recebidas"""
+    def medida(df):
+        with etapa(nome, linhas=len(df)):
+            perfil = _ativo
+            if cprofile and perfil is not None and perfil.profiler is not None:
+                return perfil.profiler.runcall(funcao, df)
+            return funcao(df)
+    return medida
+
+def contar_ida_banco(quantidade=1):
+    """Soma idas ao banco na etapa aberta nesta thread (cursores crus do pyodbc chamam direto)"""
+    perfil = _ativo
+    if perfil is not None:
+        perfil.somar('/'.join(_pilha()) or 'fora_de_etapa', idas_banco=quantidade)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _antes_de_executar(conn, cursor, statement, parameters, context, executemany):
+    contar_ida_banco()
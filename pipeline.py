@@ -0,0 +1,180 @@
+# pipeline.py
+import contextlib
+import io
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import config
+
+# Marcador de fim da fila
+_FIM = object()
+
+def _tratar_faixa(funcao, df):
+    """Executado no processo filho: trata a faixa e devolve também o que foi impresso (avisos)"""
+    saida = io.StringIO()
+    with contextlib.redirect_stdout(saida):
+        resultado = funcao(df)
+    return saida.getvalue(), resultado
+
+def _concatenar(partes):
+    df = pd.concat(partes)
+    # Faixas com categorias diferentes voltam como object no concat: refaz a categoria
+    for col in partes[0].columns:
+        if isinstance(partes[0][col].dtype, pd.CategoricalDtype) and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+    return df
+
+class TransformacaoParalela:
+    """
+    Trata cada lote dividido em faixas de linhas, uma por processo (config.PROCESSOS_TRANSFORMACAO),
+    e junta os resultados na ordem original: a saída é a mesma do tratamento num processo só.
+
+    'funcao' roda nos processos filhos, então precisa ser de módulo (ou functools.partial dela),
+    sem depender de estado da importação; o que depende (data atual, por exemplo) vai como argumento.
+    Os avisos impressos nos filhos são repassados aqui, na ordem das faixas.
+    Com 1 processo (ou lote pequeno) chama a função direto, sem pool.
+
+        with pipeline.TransformacaoParalela(functools.partial(transformar_lote, mapa_colunas=mapa)) as transformar:
+            df_tratado = transformar(lote)
+    """
+    def __init__(self, funcao, processos=None):
+        self.funcao = funcao
+        processos = processos if processos is not None else config.PROCESSOS_TRANSFORMACAO
+        self.processos = processos or os.cpu_count() or 1
+        self.executor = None
+
+    def __enter__(self):
+        if self.processos > 1:
+            # spawn também no Linux: fork copiaria as threads e conexões abertas da importação
+            self.executor = ProcessPoolExecutor(max_workers=self.processos,
+                                                mp_context=multiprocessing.get_context('spawn'))
+            print(f"Tratamento em {self.processos} processos.")
+        return self
+
+    def __exit__(self, *exc):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def __call__(self, df):
+        faixas = min(self.processos, len(df) // config.LINHAS_MINIMAS_POR_PROCESSO)
+        if self.executor is None or faixas < 2:
+            return self.funcao(df)
+
+        limites = [len(df) * i // faixas for i in range(faixas + 1)]
+        futuros = [self.executor.submit(_tratar_faixa, self.funcao, df.iloc[inicio:fim])
+                   for inicio, fim in zip(limites, limites[1:])]
+        partes = []
+        for futuro in futuros:
+            saida, resultado = futuro.result()
+            print(saida, end='')
+            partes.append(resultado)
+        if any(parte is None for parte in partes):
+            return None
+        return _concatenar(partes)
+
+def _pular_concluidas(lotes, ja_gravadas):
+    """Descarta as linhas que já foram gravadas numa execução anterior"""
+    for lote in lotes:
+        if len(lote) == 0 or lote.index[-1] < ja_gravadas:
+            continue
+        yield lote[lote.index >= ja_gravadas] if lote.index[0] < ja_gravadas else lote
+
+def executar_em_pipeline(lotes, transformar, carregar, tamanho_fila=None, jornal=None, retomar=False, progresso=None):
+    """
+    Sobrepõe leitura/tratamento e inserção:
+    esta thread lê e transforma o próximo lote enquanto uma thread de carga
+    (com sua própria conexão do pool) grava o lote anterior no banco.
+
+    A fila é limitada: se o banco estiver mais lento, a leitura espera (backpressure),
+    então no máximo 'tamanho_fila' lotes prontos ficam em memória.
+    Se 'transformar' devolver None, a leitura é interrompida (ex: mapeamento inválido).
+    Erros da carga são relançados aqui, depois que a thread termina.
+
+    Com um 'jornal' (jornal.JornalImportacao), cada lote carregado tem sua última linha
+    registrada; com retomar=True as linhas já registradas são puladas.
+    Os lotes precisam ter o índice contínuo da planilha (como os do leitura.py).
+
+    Com um 'progresso' (progresso.Medidor) cada etapa é avisada; as linhas contadas
+    são as da planilha já gravadas no banco.
+    """
+    if jornal is not None and retomar:
+        ja_gravadas = jornal.ultima_linha()
+        if ja_gravadas:
+            print(f"Retomando importação a partir da linha {ja_gravadas} (já gravadas antes).")
+            lotes = _pular_concluidas(lotes, ja_gravadas)
+            if progresso:
+                progresso.definir_inicio(ja_gravadas)
+
+    def avisar(etapa, feitos=None):
+        if progresso:
+            progresso(etapa, feitos)
+
+    def preparar(lote):
+        avisar('tratamento')
+        dados = transformar(lote)
+        if dados is None:
+            return None
+        return (lote.index[-1] + 1, dados)
+
+    def gravar(item):
+        fim, dados = item
+        avisar('insercao')
+        carregar(dados)
+        if jornal is not None:
+            jornal.registrar(fim)
+        avisar('insercao', fim)
+
+    avisar('leitura')
+
+    if not config.PIPELINE_ATIVO:
+        for lote in lotes:
+            item = preparar(lote)
+            if item is None:
+                break
+            gravar(item)
+        avisar('concluido')
+        return
+
+    fila = queue.Queue(maxsize=tamanho_fila or config.TAMANHO_FILA_PIPELINE)
+    erros = []
+    cancelado = threading.Event()
+
+    def consumidor():
+        while True:
+            item = fila.get()
+            if item is _FIM:
+                return
+            # Depois de um erro só drena a fila, para a leitura não ficar presa no put()
+            if erros or cancelado.is_set():
+                continue
+            try:
+                gravar(item)
+            except Exception as e:
+                erros.append(e)
+
+    thread_carga = threading.Thread(target=consumidor, name="pipeline-carga", daemon=True)
+    thread_carga.start()
+    try:
+        for lote in lotes:
+            if erros:
+                break
+            item = preparar(lote)
+            if item is None:
+                break
+            fila.put(item)
+    except Exception:
+        cancelado.set()
+        raise
+    finally:
+        fila.put(_FIM)
+        thread_carga.join()
+
+    if erros:
+        raise erros[0]
+    avisar('concluido')
@@ -0,0 +1,83 @@
+# progresso.py
+"""
+Acompanhamento das importações: etapa atual, linhas gravadas / total, linhas por segundo e ETA.
+Quem chama passa um callback que recebe um InfoProgresso (barra do app, log em intervalos, etc.).
+"""
+import collections
+import time
+
+import config
+
+InfoProgresso = collections.namedtuple('InfoProgresso', 'etapa feitos total linhas_por_segundo eta')
+
+# Nomes das etapas exibidos para o usuário
+ETAPAS = {
+    'leitura': "Lendo planilha",
+    'tratamento': "Tratando dados",
+    'ncm': "Sincronizando NCMs",
+    'insercao': "Gravando no banco",
+    'concluido': "Concluído",
+}
+
+class Medidor:
+    """
+    Recebe os avisos (etapa, linhas feitas) e repassa ao callback com vazão e ETA calculados.
+    Sem 'feitos' mantém a contagem anterior (só muda a etapa).
+    """
+    def __init__(self, callback, total=None):
+        self.callback = callback
+        self.total = total
+        self.feitos = 0
+        self.feitos_iniciais = 0
+        self.inicio = time.perf_counter()
+
+    def definir_inicio(self, feitos):
+        """Linhas já gravadas antes desta execução (retomada): contam no total, não na vazão"""
+        self.feitos = self.feitos_iniciais = feitos
+
+    def somar(self, etapa, linhas):
+        """Avanço parcial (ex: cada chunk do database.inserir_bulk): soma às linhas já feitas"""
+        self(etapa, self.feitos + linhas)
+
+    def __call__(self, etapa, feitos=None, total=None):
+        if total is not None:
+            self.total = total
+        if feitos is not None:
+            self.feitos = feitos
+        decorrido = time.perf_counter() - self.inicio
+        vazao = (self.feitos - self.feitos_iniciais) / decorrido if decorrido > 0 else 0.0
+        eta = None
+        if self.total and vazao > 0:
+            eta = max(self.total - self.feitos, 0) / vazao
+        try:
+            self.callback(InfoProgresso(etapa, self.feitos, self.total, vazao, eta))
+        except Exception as e:
+            # Problema na exibição não pode derrubar a importação
+            print(f"Aviso: erro ao exibir progresso: {e}")
+
+def formatar(info):
+    """Texto de uma linha: 'Gravando no banco: 12.000/50.000 (24%) | 3.100 linhas/s | ETA 00:12'"""
+    texto = f"{ETAPAS.get(info.etapa, info.etapa)}: {info.feitos:,}".replace(',', '.')
+    if info.total:
+        texto += f"/{info.total:,}".replace(',', '.') + f" ({min(info.feitos / info.total, 1):.0%})"
+    texto += f" | {info.linhas_por_segundo:,.0f} linhas/s".replace(',', '.')
+    if info.eta is not None:
+        minutos, segundos = divmod(int(info.eta), 60)
+        texto += f" | ETA {minutos:02d}:{segundos:02d}"
+    return texto
+
+class LogPorIntervalo:
+    """Callback para execuções sem interface: imprime o progresso no máximo a cada 'intervalo' segundos"""
+    def __init__(self, intervalo=None):
+        self.intervalo = intervalo if intervalo is not None else config.INTERVALO_LOG_PROGRESSO
+        self.ultimo = 0.0
+
+    def __call__(self, info):
+        agora = time.perf_counter()
+        if info.etapa == 'concluido' or agora - self.ultimo >= self.intervalo:
+            self.ultimo = agora
+            print(formatar(info))
+
+def criar_medidor(progresso=None, total=None):
+    """Medidor com o callback informado ou, sem callback, com o log em intervalos"""
+    return Medidor(progresso or LogPorIntervalo(), total)
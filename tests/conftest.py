@@ -0,0 +1,6 @@
+# conftest.py
+# Os módulos do projeto ficam na raiz (sem pacote): deixa importáveis nos testes
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
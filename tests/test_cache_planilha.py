@@ -0,0 +1,44 @@
+# test_cache_planilha.py
+import datetime
+import os
+
+import pytest
+from openpyxl import Workbook
+
+import cache_planilha
+import config
+import leitura
+
+CABECALHO = ['codigo', datetime.datetime(2024, 1, 1), datetime.datetime(2024, 2, 1)]
+
+@pytest.fixture
+def planilha(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'DIRETORIO_CACHE', str(tmp_path / 'cache'))
+    monkeypatch.setattr(config, 'CACHE_ATIVO', True)
+    wb = Workbook()
+    ws = wb.active
+    ws.append(CABECALHO)
+    for i in range(10):
+        ws.append([i, i * 1.5, i * 2.5])
+    caminho = str(tmp_path / 'meses.xlsx')
+    wb.save(caminho)
+    return caminho
+
+def _ler(caminho):
+    return list(leitura.ler_planilha_em_lotes(caminho, tamanho_lote=4))
+
+def test_cabecalho_com_data_volta_igual_do_cache(planilha):
+    direto = _ler(planilha)
+    assert cache_planilha.ler_lotes(planilha) is not None
+    do_cache = _ler(planilha)
+    assert [list(df.columns) for df in do_cache] == [list(df.columns) for df in direto]
+    assert list(do_cache[0].columns) == leitura._nomes_colunas(CABECALHO)
+    assert sum(len(df) for df in do_cache) == 10
+
+def test_falha_ao_gravar_cache_nao_interrompe_a_leitura(planilha, monkeypatch):
+    def falhar(*args, **kwargs):
+        raise OSError("disco cheio")
+    monkeypatch.setattr(cache_planilha.pq, 'ParquetWriter', falhar)
+    assert sum(len(df) for df in _ler(planilha)) == 10
+    assert cache_planilha.ler_lotes(planilha) is None
+    assert not os.listdir(config.DIRETORIO_CACHE)
@@ -0,0 +1,35 @@
+# test_documentos.py
+import numpy as np
+import pandas as pd
+
+import documentos
+
+def test_normalizar_mantem_coluna_so_com_digitos_e_repoe_zeros():
+    # CPF 012.345.678-90 salvo como número no Excel perde o zero à esquerda
+    serie = pd.Series(['52998224725', '1234567890', '11222333000181', None, ''], index=[10, 11, 12, 13, 14])
+    normalizados = documentos.normalizar_serie(serie)
+    assert normalizados.tolist() == ['52998224725', '01234567890', '11222333000181', '', '']
+    assert list(normalizados.index) == [10, 11, 12, 13, 14]
+
+def test_normalizar_coluna_formatada_e_alfanumerica():
+    serie = pd.Series(['529.982.247-25', '12.ABC.345/01DE-35', 'ISENTO', '11.222.333/0001-81'])
+    assert documentos.normalizar_serie(serie).tolist() == ['52998224725', '12ABC34501DE35', '', '11222333000181']
+
+def test_validar():
+    serie = pd.Series(['52998224725', '52998224726', '11111111111', '12ABC34501DE35', '', '123'])
+    assert documentos.validar_serie(serie).tolist() == [True, False, False, True, False, False]
+
+def test_indice_repetidos_entre_lotes_e_ja_cadastrados():
+    indice = documentos.IndiceDocumentos(pd.Series(['529.982.247-25', '12ABC34501DE35']))
+    repetido, cadastrado = indice.verificar(pd.Series(['52998224725', '11222333000181', '11222333000181', '']))
+    assert repetido.tolist() == [False, False, True, False]
+    assert cadastrado.tolist() == [True, False, False, False]
+    # '0123' e '123' são documentos diferentes
+    repetido, cadastrado = indice.verificar(pd.Series(['11222333000181', '12ABC34501DE35', '0123', '123', '']))
+    assert repetido.tolist() == [True, False, False, False, False]
+    assert cadastrado.tolist() == [False, True, False, False, False]
+
+def test_indice_modo_delta_ignora_o_proprio_cadastro():
+    indice = documentos.IndiceDocumentos(pd.Series(['52998224725', '11222333000181']), np.array([5, 6]))
+    _, cadastrado = indice.verificar(pd.Series(['52998224725', '11222333000181']), pd.Series([5, 7]))
+    assert cadastrado.tolist() == [False, True]
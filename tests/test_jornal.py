@@ -0,0 +1,19 @@
+# test_jornal.py
+import os
+
+import config
+import jornal
+
+def test_retomada_vale_so_para_o_mesmo_arquivo(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'ARQUIVO_JORNAL', str(tmp_path / 'jornal.json'))
+    planilha = tmp_path / 'dados.csv'
+    planilha.write_text('a;b\n1;2\n')
+
+    jornal.JornalImportacao(str(planilha), 'produtos', {'proNome': 'a'}).registrar(1000)
+    assert jornal.JornalImportacao(str(planilha), 'produtos', {'proNome': 'a'}).ultima_linha() == 1000
+    assert jornal.JornalImportacao(str(planilha), 'produtos', {'proNome': 'b'}).ultima_linha() == 0
+
+    # Arquivo alterado depois da interrupção: começa do zero
+    planilha.write_text('a;b\n1;2\n3;4\n')
+    os.utime(planilha, ns=(0, 10 ** 9))
+    assert jornal.JornalImportacao(str(planilha), 'produtos', {'proNome': 'a'}).ultima_linha() == 0
@@ -0,0 +1,24 @@
+# test_leitura.py
+import pandas as pd
+import pytest
+
+import leitura
+
+def test_parquet_em_varios_lotes_mantem_os_valores(tmp_path):
+    pytest.importorskip('pyarrow')
+    origem = pd.DataFrame({
+        'codigo': range(1, 11),
+        'nome': [f"PRODUTO {i}" for i in range(1, 11)],
+        'preco': [i * 1.5 for i in range(1, 11)],
+    })
+    caminho = str(tmp_path / 'produtos.parquet')
+    origem.to_parquet(caminho, index=False)
+
+    lotes = list(leitura.ler_planilha_em_lotes(caminho, tamanho_lote=4))
+    assert [len(df) for df in lotes] == [4, 4, 2]
+    df = pd.concat(lotes)
+    assert list(df.index) == list(range(10))
+    assert df['codigo'].tolist() == [str(i) for i in range(1, 11)]
+    assert df['nome'].tolist() == origem['nome'].tolist()
+    # Inteiro guardado como float vira '3', como na leitura do Excel
+    assert df['preco'].tolist() == [leitura._valor_texto(i * 1.5) for i in range(1, 11)]
@@ -0,0 +1,15 @@
+# test_progresso.py
+import progresso
+
+def test_chunks_da_insercao_somam_sobre_o_total_da_planilha():
+    avisos = []
+    medidor = progresso.Medidor(avisos.append, total=1000)
+    # Lote 1 (linhas 0-499) gravado em chunks de 200, depois o pipeline confirma a linha final
+    for linhas in (200, 200, 100):
+        medidor.somar('insercao', linhas)
+    medidor('insercao', 500)
+    # Lote 2: os chunks continuam de onde o lote 1 parou
+    medidor.somar('insercao', 200)
+    assert [a.feitos for a in avisos] == [200, 400, 500, 500, 700]
+    assert all(a.total == 1000 for a in avisos)
+    assert avisos[-1].eta is not None
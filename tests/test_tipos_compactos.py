@@ -0,0 +1,50 @@
+# test_tipos_compactos.py
+import numpy as np
+import pandas as pd
+import pytest
+
+import config
+import utils
+
+pytestmark = pytest.mark.skipif(utils.TEXTO_ARROW is None, reason="tipos compactos precisam do pyarrow")
+
+LINHAS = 20000
+
+def _mb(df):
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+@pytest.fixture
+def lote_lido():
+    # Como o lote chega da leitura: tudo texto (objetos Python), com nulos
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'codigo': rng.integers(1, 10 ** 6, LINHAS).astype(str),
+        'nome': [f"CLIENTE {i} DA SILVA" for i in range(LINHAS)],
+        'uf': rng.choice(['SP', 'RJ', 'MG', 'PR', None], LINHAS),
+        'valor': [f"{v:.2f}".replace('.', ',') for v in rng.uniform(0, 10000, LINHAS)],
+    }, dtype=object)
+
+def test_lote_lido_compacto_usa_menos_memoria(lote_lido, monkeypatch):
+    monkeypatch.setattr(config, 'TIPOS_COMPACTOS', True)
+    compacto = utils.compactar_texto(lote_lido)
+    assert _mb(compacto) < _mb(lote_lido) / 2
+    # Mesmos valores, nulos incluídos
+    pd.testing.assert_frame_equal(compacto.astype(object).where(compacto.notna(), None),
+                                  lote_lido.where(lote_lido.notna(), None))
+
+@pytest.mark.parametrize('tipo', ['clientes', 'produtos', 'financeiro'])
+def test_lote_tratado_compacto_usa_menos_memoria(tipo, monkeypatch):
+    # Saída real do transformar_lote de cada importação (os módulos importam o database)
+    pytest.importorskip('pyodbc', exc_type=ImportError)
+    import benchmark
+    lido = benchmark.gerar_dados_planilha(tipo, LINHAS, seed=0).astype(object)
+    lido = lido.where(lido != '', np.nan)
+    tratados = {}
+    for compactos in (False, True):
+        monkeypatch.setattr(config, 'TIPOS_COMPACTOS', compactos)
+        tratados[compactos] = benchmark.TRANSFORMAR[tipo](utils.compactar_texto(lido.copy()))
+    original, compacto = tratados[False], tratados[True]
+    assert _mb(compacto) < _mb(original) / 2
+    # Mesmos valores (menos as datas de cadastro, que são o momento do tratamento)
+    compacto, original = (df.select_dtypes(exclude='datetime').astype(object) for df in (compacto, original))
+    pd.testing.assert_frame_equal(compacto.where(compacto.notna(), None), original.where(original.notna(), None))
@@ -0,0 +1,28 @@
+# test_utils.py
+import pandas as pd
+
+import utils
+
+def test_data_iso_fora_do_formato_dominante_nao_troca_dia_e_mes():
+    # Coluna dd/mm/aaaa com algumas datas ISO no meio: as ISO não podem virar 2 de Jan
+    serie = pd.Series(['01/02/2023'] * 5 + ['2023-02-01T10:00:00', '2023-02-01 10:00', '2023/02/01',
+                                            '2023-02-01T10:00:00.250'])
+    datas, invalidos = utils.converter_data_serie(serie)
+    assert invalidos == []
+    assert (datas.dt.normalize() == pd.Timestamp('2023-02-01')).all()
+    assert datas.iloc[6] == pd.Timestamp('2023-02-01 10:00')
+    assert datas.iloc[8] == pd.Timestamp('2023-02-01 10:00:00.250')
+
+def test_data_com_fuso_vira_utc_sem_fuso():
+    # Offsets diferentes não podem derrubar a importação nem mudar o tipo da coluna
+    serie = pd.Series(['05/03/2023', '2023-02-01T10:00:00-03:00', '2023-02-01T10:00:00+05:00', '2023-02-01T10:00:00Z'])
+    datas, invalidos = utils.converter_data_serie(serie)
+    assert invalidos == []
+    assert datas.dtype == 'datetime64[ns]'
+    assert datas.tolist() == [pd.Timestamp('2023-03-05'), pd.Timestamp('2023-02-01 13:00'),
+                              pd.Timestamp('2023-02-01 05:00'), pd.Timestamp('2023-02-01 10:00')]
+
+def test_data_invalida_e_vazia():
+    datas, invalidos = utils.converter_data_serie(pd.Series(['01/02/2023', 'lixo', '', None]))
+    assert datas.iloc[1:].isna().all()
+    assert invalidos == [1]
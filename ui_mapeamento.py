@@ -1,16 +1,23 @@
 # ui_mapeamento.py
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import messagebox
+from tkinter import filedialog, messagebox
+
+import mapeamento
 
 class DialogoMapeamento(ttk.Toplevel):
-    def __init__(self, parent, colunas_excel, tipo_importacao="PRODUTO"):
+    def __init__(self, parent, colunas_excel, tipo_importacao="PRODUTO", amostra=None):
         super().__init__(parent)
         self.title(f"Mapeamento Inteligente - {tipo_importacao}")
-        self.geometry("950x780")
+        self.tipo_importacao = tipo_importacao
+        self.geometry("1150x780")
         self.place_window_center()
         self.resultado = None 
         
+        # Primeiras linhas da planilha, para mostrar exemplos ao lado de cada campo
+        self.amostra = amostra
+        self.nomes_colunas = {str(c): c for c in colunas_excel}
+        
         # --- HEADER ---
         header_frame = ttk.Frame(self, padding=20, bootstyle="secondary")
         header_frame.pack(fill=X)
@@ -94,13 +101,16 @@ class DialogoMapeamento(ttk.Toplevel):
         # --- CABEÇALHO DA LISTA ---
         # Usando Frames coloridos para cabeçalho
         head_grid = ttk.Frame(self.scrollable_frame, padding=5)
-        head_grid.grid(row=0, column=0, columnspan=2, sticky=EW, pady=(0,10))
+        head_grid.grid(row=0, column=0, columnspan=3, sticky=EW, pady=(0,10))
         
         lbl_dest = ttk.Label(head_grid, text="  CAMPO NO BANCO DE DADOS", font=("Segoe UI", 9, "bold"), bootstyle="inverse-info", width=40, anchor=W)
         lbl_dest.pack(side=LEFT, fill=X, expand=True, padx=1)
         
         lbl_orig = ttk.Label(head_grid, text="  COLUNA NA SUA PLANILHA", font=("Segoe UI", 9, "bold"), bootstyle="inverse-warning", width=40, anchor=W)
         lbl_orig.pack(side=LEFT, fill=X, expand=True, padx=1)
+        
+        lbl_exemplo = ttk.Label(head_grid, text="  EXEMPLOS", font=("Segoe UI", 9, "bold"), bootstyle="inverse-secondary", width=30, anchor=W)
+        lbl_exemplo.pack(side=LEFT, fill=X, expand=True, padx=1)
 
         row = 1
         for campo_db, label_amigavel in self.campos_sistema.items():
@@ -154,8 +164,14 @@ class DialogoMapeamento(ttk.Toplevel):
                     cbox.set(col_excel)
                     break
             
+            # Exemplos da coluna escolhida (atualiza quando troca a seleção)
+            lbl_valores = ttk.Label(self.scrollable_frame, text="", font=("Consolas", 8), bootstyle="secondary", width=40, anchor=W)
+            lbl_valores.grid(row=row, column=2, sticky=W, padx=5, pady=8)
+            cbox.bind("<<ComboboxSelected>>", lambda e, c=cbox, l=lbl_valores: self._atualizar_exemplos(c, l))
+            self._atualizar_exemplos(cbox, lbl_valores)
+            
             # Separador sutil
-            ttk.Separator(self.scrollable_frame, bootstyle="secondary").grid(row=row+1, column=0, columnspan=2, sticky=EW, padx=10, pady=0)
+            ttk.Separator(self.scrollable_frame, bootstyle="secondary").grid(row=row+1, column=0, columnspan=3, sticky=EW, padx=10, pady=0)
             
             row += 2
 
@@ -163,21 +179,52 @@ class DialogoMapeamento(ttk.Toplevel):
         btn_frame = ttk.Frame(self, padding=20, bootstyle="light")
         btn_frame.pack(fill=X, side=BOTTOM)
         
+        # Salva o mapeamento para repetir a importação pela linha de comando (cli.py)
+        btn_exportar = ttk.Button(btn_frame, text="💾 EXPORTAR MAPEAMENTO", bootstyle="info-outline", command=self.exportar)
+        btn_exportar.pack(fill=X, ipady=5, pady=(0, 10))
+
         btn_confirmar = ttk.Button(btn_frame, text="✅ CONFIRMAR E IMPORTAR", bootstyle="success", command=self.confirmar)
         btn_confirmar.pack(fill=X, ipady=10)
         
         # Habilitar scroll com mousewheel
         self.canvas.bind_all("<MouseWheel>", self._on_mousewheel)
 
+    def _atualizar_exemplos(self, cbox, label):
+        coluna = self.nomes_colunas.get(cbox.get())
+        if self.amostra is None or coluna is None or coluna not in self.amostra.columns:
+            label.configure(text="")
+            return
+        valores = self.amostra[coluna].dropna().astype(str).head(3)
+        label.configure(text=" | ".join(v[:20] for v in valores))
+
     def _on_mousewheel(self, event):
         self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
 
-    def confirmar(self):
+    def montar_mapa(self):
         mapa = {}
         for campo_db, cbox in self.combos.items():
             valor = cbox.get()
             if valor and valor != "(Ignorar / Não Importar)":
-                mapa[campo_db] = valor
-        
-        self.resultado = mapa
+                # Devolve o nome original da coluna (o Combobox sempre entrega texto)
+                mapa[campo_db] = self.nomes_colunas.get(valor, valor)
+        return mapa
+
+    def exportar(self):
+        caminho = filedialog.asksaveasfilename(
+            parent=self,
+            title="Salvar Mapeamento",
+            defaultextension=".json",
+            initialfile=f"mapa_{self.tipo_importacao.lower()}.json",
+            filetypes=[("Mapeamento (JSON)", "*.json")]
+        )
+        if not caminho:
+            return
+        try:
+            mapeamento.salvar_mapa(caminho, self.montar_mapa(), self.tipo_importacao)
+            messagebox.showinfo("Mapeamento", f"Mapeamento salvo em:\n{caminho}", parent=self)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Não foi possível salvar o mapeamento: {e}", parent=self)
+
+    def confirmar(self):
+        self.resultado = self.montar_mapa()
         self.destroy()
\ No newline at end of file
@@ -1,6 +1,57 @@
 # utils.py
+import functools
+import os
 import re
+import numpy as np
 import pandas as pd
+import config
+
+# Compilado uma vez só, usado pelas versões vetorizadas
+_RE_NAO_DIGITO = re.compile(r'[^0-9]')
+
+def _tipo_texto_arrow():
+    """Texto guardado em Arrow com NaN como nulo (igual ao object nos isna/fillna); None sem pyarrow"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    try:
+        return pd.StringDtype('pyarrow', na_value=np.nan)
+    except TypeError:  # pandas < 2.3
+        return pd.StringDtype('pyarrow_numpy')
+
+TEXTO_ARROW = _tipo_texto_arrow()
+
+def _texto_arrow(serie):
+    return TEXTO_ARROW is not None and serie.dtype == TEXTO_ARROW
+
+def compactar_texto(df):
+    """Lote lido (tudo texto) com as colunas em Arrow em vez de objetos Python (config.TIPOS_COMPACTOS)"""
+    if not config.TIPOS_COMPACTOS or TEXTO_ARROW is None:
+        return df
+    return df.astype(TEXTO_ARROW)
+
+def compactar_tipos(df, categorias=()):
+    """
+    Lote tratado com tipos menores: inteiros no menor tipo que cabe, as 'categorias'
+    (colunas com poucos valores distintos: UF, unidade, S/N...) como category e o
+    resto do texto em Arrow. Moeda continua float64 (float32 perde centavos).
+    """
+    if not config.TIPOS_COMPACTOS:
+        return df
+    tipos = {}
+    for col in df.columns:
+        serie = df[col]
+        if col in categorias:
+            tipos[col] = 'category'
+        elif serie.dtype.kind == 'i' and len(serie):
+            menor, maior = serie.min(), serie.max()
+            tipos[col] = next(t for t in (np.int8, np.int16, np.int32, np.int64)
+                              if np.iinfo(t).min <= menor and maior <= np.iinfo(t).max)
+        elif (serie.dtype == object and TEXTO_ARROW is not None
+              and pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty')):
+            tipos[col] = TEXTO_ARROW
+    return df.astype(tipos) if tipos else df
 
 def remove_char(texto):
     """Remove tudo que não é número (para CNPJ, CPF, Telefone)"""
@@ -14,6 +65,27 @@ def tratar_string(texto, tamanho_max):
     s = str(texto).strip()
     return s[:tamanho_max]
 
+def remove_char_serie(serie):
+    """Versão vetorizada do remove_char: mantém só os dígitos da coluna inteira (Nulos viram '')"""
+    if _texto_arrow(serie):
+        return serie.str.replace(_RE_NAO_DIGITO.pattern, '', regex=True).fillna('')
+    nulos = serie.isna()
+    s = serie.astype(str).str.replace(_RE_NAO_DIGITO, '', regex=True)
+    return s.mask(nulos, '')
+
+def tratar_string_serie(serie, tamanho_max):
+    """Versão vetorizada do tratar_string: strip + corte no tamanho do campo (Nulos viram '')"""
+    if _texto_arrow(serie):
+        return serie.str.strip().str.slice(0, tamanho_max).fillna('')
+    nulos = serie.isna()
+    s = serie.astype(str).str.strip().str[:tamanho_max]
+    return s.mask(nulos, '')
+
+def converter_inteiro_serie(serie, padrao):
+    """Converte para int o que for só dígitos; o resto vira 'padrao'"""
+    s = serie.fillna('') if _texto_arrow(serie) else serie.astype(str)
+    return pd.to_numeric(s.where(s.str.isdigit()), errors='coerce').fillna(padrao).astype(int)
+
 def tratar_moeda(valor):
     """
     Converte valores monetários para float de forma inteligente.
@@ -60,4 +132,170 @@ def tratar_moeda(valor):
     except Exception as e:
         # Se falhar, imprime no log para ajudar a debugar
         print(f"Erro ao converter valor '{valor}': {e}")
-        return 0.0
\ No newline at end of file
+        return 0.0
+
+def tratar_moeda_serie(serie):
+    """
+    Versão vetorizada do tratar_moeda: aplica as mesmas regras de formato na coluna inteira.
+    Retorna (valores, indices_invalidos), onde indices_invalidos lista o índice das
+    células que não puderam ser convertidas (essas ficam com 0.0).
+    """
+    vazios = serie.isna() | (serie.astype(str) == '')
+
+    # Remove símbolos de moeda e espaços extras
+    s = serie.astype(str).str.strip()
+    s = s.str.replace('R$', '', regex=False).str.replace('r$', '', regex=False).str.strip()
+
+    tem_ponto = s.str.contains('.', regex=False)
+    tem_virgula = s.str.contains(',', regex=False)
+
+    # Caso 1: Formato Brasileiro Completo (ex: 1.500,50) -> remove milhar, vírgula vira ponto
+    caso1 = tem_ponto & tem_virgula
+    if caso1.any():
+        s.loc[caso1] = s[caso1].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+
+    # Caso 2: Apenas Vírgula (ex: 15,83 ou 1500,00)
+    caso2 = tem_virgula & ~tem_ponto
+    if caso2.any():
+        s.loc[caso2] = s[caso2].str.replace(',', '.', regex=False)
+
+    # Caso 3: Apenas Ponto. Um ponto só é decimal (15.830 -> 15.83); vários pontos são milhar (1.000.000)
+    caso3 = tem_ponto & ~tem_virgula & (s.str.count(r'\.') > 1)
+    if caso3.any():
+        s.loc[caso3] = s[caso3].str.replace('.', '', regex=False)
+
+    valores = pd.to_numeric(s.mask(vazios), errors='coerce')
+    invalidos = valores.isna() & ~vazios
+    return valores.fillna(0.0).astype(float), list(serie.index[invalidos])
+
+def avisar_invalidos(campo, indices_invalidos, limite=10, destino='convertidos para 0'):
+    """Imprime um único aviso por coluna em vez de uma linha por célula inválida"""
+    if not indices_invalidos:
+        return
+    amostra = ', '.join(str(i) for i in indices_invalidos[:limite])
+    sufixo = '...' if len(indices_invalidos) > limite else ''
+    print(f"AVISO: {len(indices_invalidos)} valor(es) inválido(s) em '{campo}' {destino} (índices: {amostra}{sufixo})")
+
+def contidos_em(valores, ordenados):
+    """Máscara de quais 'valores' existem no array 'ordenados' (busca binária, sem montar set)"""
+    valores = np.asarray(valores)
+    if len(ordenados) == 0:
+        return np.zeros(len(valores), dtype=bool)
+    posicoes = np.searchsorted(ordenados, valores).clip(max=len(ordenados) - 1)
+    return ordenados[posicoes] == valores
+
+def gravar_rejeitados(df, caminho):
+    """Acrescenta as linhas ao CSV de rejeitados (cabeçalho só na criação; ';' e BOM para abrir no Excel)"""
+    if df.empty: return
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    novo = not os.path.exists(caminho)
+    df.to_csv(caminho, mode='a', header=novo, index=False, sep=';', encoding='utf-8-sig' if novo else 'utf-8')
+
+# Formatos de data aceitos, na ordem de preferência em caso de empate na amostra.
+# '%Y-%m-%d %H:%M:%S' é como as células de data do Excel chegam lidas como texto;
+# as variantes ISO (com 'T', sem segundos, com fração) vêm de CSV/Parquet exportados de outros sistemas.
+FORMATOS_DATA = [
+    '%d/%m/%Y', '%d/%m/%y', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d',
+    '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M', '%d-%m-%Y', '%d.%m.%Y',
+    '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M', '%Y/%m/%d',
+    '%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S.%f',
+]
+FORMATO_SERIAL_EXCEL = 'serial'  # Número de dias desde 30/12/1899 (data do Excel salva como número)
+_INICIO_EXCEL = pd.Timestamp('1899-12-30')
+_RE_SERIAL = re.compile(r'\d{1,7}(\.\d+)?')
+_RE_ANO_PRIMEIRO = re.compile(r'\d{4}\D')  # 2023-02-01, 2023/02/01...: nunca dia primeiro
+
+def _serial_excel_serie(texto):
+    numeros = pd.to_numeric(texto.where(texto.str.fullmatch(_RE_SERIAL)), errors='coerce')
+    # 1 = 01/01/1900 ... 2958465 = 31/12/9999
+    numeros = numeros.where((numeros >= 1) & (numeros <= 2958465))
+    return _INICIO_EXCEL + pd.to_timedelta(numeros, unit='D')
+
+def detectar_formato_data(texto, tamanho_amostra=500):
+    """Formato que converte mais valores de uma amostra da coluna (None se nenhum serve)"""
+    texto = texto[texto != '']
+    if texto.empty:
+        return None
+    amostra = texto.sample(min(tamanho_amostra, len(texto)), random_state=0)
+
+    melhor, acertos = None, 0
+    for formato in FORMATOS_DATA + [FORMATO_SERIAL_EXCEL]:
+        if formato == FORMATO_SERIAL_EXCEL:
+            convertidos = _serial_excel_serie(amostra)
+        else:
+            convertidos = pd.to_datetime(amostra, format=formato, errors='coerce')
+        qtd = int(convertidos.notna().sum())
+        if qtd > acertos:
+            melhor, acertos = formato, qtd
+    return melhor
+
+@functools.lru_cache(maxsize=65536)
+def _converter_data_unica(valor):
+    """Valor fora do formato dominante: tenta os outros formatos e, por último, a inferência do pandas"""
+    if _RE_SERIAL.fullmatch(valor):
+        return _serial_excel_serie(pd.Series([valor])).iloc[0]
+    for formato in FORMATOS_DATA:
+        data = pd.to_datetime(valor, format=formato, errors='coerce')
+        if pd.notna(data):
+            return data
+    # dayfirst só para o que não começa pelo ano ('2023-02-01T10:00' não pode virar 2 de Jan).
+    # Fuso horário vira UTC sem fuso: a coluna continua datetime64 mesmo com offsets diferentes
+    data = pd.to_datetime(valor, dayfirst=not _RE_ANO_PRIMEIRO.match(valor), utc=True, errors='coerce')
+    return data.tz_localize(None) if pd.notna(data) else pd.NaT
+
+def converter_data_serie(serie, formato=None):
+    """
+    Converte uma coluna de datas em texto num passe vetorizado, com o formato fixo
+    mais comum na coluna (detectado numa amostra, se não for informado).
+    Os valores que sobram em outro formato são convertidos um a um, mas cada valor
+    distinto só uma vez (cache). Retorna (datas, indices_invalidos); vazios viram NaT
+    sem contar como inválidos.
+    """
+    # Colunas de data repetem muito o mesmo valor: converte só os valores distintos
+    codigos, distintos = pd.factorize(serie.astype(object).where(serie.notna(), ''))
+    texto = pd.Series(distintos, dtype=object).astype(str).str.strip()
+    vazios = texto == ''
+
+    formato = formato or detectar_formato_data(texto[~vazios])
+    if formato == FORMATO_SERIAL_EXCEL:
+        datas = _serial_excel_serie(texto)
+    elif formato:
+        datas = pd.to_datetime(texto.mask(vazios), format=formato, errors='coerce')
+    else:
+        datas = pd.Series(pd.NaT, index=texto.index, dtype='datetime64[ns]')
+
+    sobras = datas.isna() & ~vazios
+    if sobras.any():
+        datas = datas.copy()
+        datas[sobras] = pd.to_datetime(texto[sobras].map(_converter_data_unica))
+
+    resultado = pd.Series(datas.to_numpy()[codigos], index=serie.index)
+    invalidos = resultado.isna() & ~vazios.to_numpy()[codigos]
+    return resultado, list(serie.index[invalidos])
+
+def hash_linhas(df, colunas, numericas=()):
+    """
+    Hash (uint64) de cada linha, com os valores normalizados para comparar Excel x banco:
+    colunas numéricas viram float arredondado; o resto vira texto sem espaços nas pontas.
+    """
+    normalizado = pd.DataFrame(index=df.index)
+    for c in colunas:
+        if c in numericas:
+            normalizado[c] = pd.to_numeric(df[c], errors='coerce').astype(float).round(4)
+        else:
+            # object antes do fillna: categorias e texto Arrow têm de gerar o mesmo hash do texto lido do banco
+            normalizado[c] = df[c].astype(object).fillna('').astype(str).str.strip()
+    return pd.util.hash_pandas_object(normalizado, index=False).to_numpy()
+
+def filtrar_alterados(df_novo, df_atual, chaves, colunas):
+    """Devolve só as linhas de df_novo que não existem em df_atual (pelas chaves) ou que mudaram"""
+    if df_novo.empty or df_atual.empty:
+        return df_novo
+    chaves_novo = [df_novo[k].to_numpy() for k in chaves]
+    chaves_atual = [df_atual[k].to_numpy() for k in chaves]
+    if colunas:
+        numericas = [c for c in colunas if pd.api.types.is_numeric_dtype(df_novo[c])]
+        chaves_novo.append(hash_linhas(df_novo, colunas, numericas))
+        chaves_atual.append(hash_linhas(df_atual, colunas, numericas))
+    iguais = pd.MultiIndex.from_arrays(chaves_novo).isin(pd.MultiIndex.from_arrays(chaves_atual))
+    return df_novo[~iguais]